@@ -0,0 +1,149 @@
+"""Memory used per question, by the old object-per-question layout and by
+the compact tables.
+
+QUESTIONS quiz questions and as many alignment questions, each with
+OPTIONS options drawn from a pool of common answers (as real quizzes reuse
+"True", "None of the above" and the like). The options go through
+`json.loads`, like content files do, so repeated texts are separate
+strings until something interns them. "before" is a plain class with a
+__dict__ and lists of options per question, as the content model used to
+be; "after" is `Quiz`/`AlignmentTest` with their QuizTable/AlignmentTable.
+
+Run from the project folder with `python -m benchmarks.content_memory`
+"""
+import gc
+import json
+import random
+import tracemalloc
+
+from data.consts import AlignmentField
+from data.structs import Quiz, QuizQuestion, AlignmentTest, AlignmentQuestion
+
+QUESTIONS = 50_000
+OPTIONS = 5
+# distinct option texts to pick from
+COMMON_OPTIONS = 400
+
+
+class OldQuizQuestion:
+    def __init__(self, question_text, options, correct_option_index):
+        self.text = question_text
+        self.options = options
+        self.correct = correct_option_index
+
+
+class OldAlignmentQuestion:
+    def __init__(self, question_text, options):
+        self.text = question_text
+        self.options = options
+
+
+def make_raw(rng: random.Random) -> list:
+    """Questions as they come out of a content file"""
+    pool = [f"Common answer number {number}" for number in range(COMMON_OPTIONS)]
+    fields = [field.name for field in AlignmentField]
+    raw = [
+        {
+            "text": f"Question {number}: which of these is right?",
+            "options": [
+                [rng.choice(pool), rng.choice(fields), rng.randint(-20, 20)]
+                for _ in range(OPTIONS)
+            ],
+            "correct": rng.randrange(OPTIONS),
+        }
+        for number in range(QUESTIONS)
+    ]
+    return json.loads(json.dumps(raw))
+
+
+def old_quiz(raw: list) -> list:
+    return [
+        OldQuizQuestion(
+            question["text"],
+            [option[0] for option in question["options"]],
+            question["correct"],
+        )
+        for question in raw
+    ]
+
+
+def new_quiz(raw: list) -> Quiz:
+    return Quiz(
+        "Benchmark",
+        (
+            QuizQuestion(
+                question["text"],
+                [option[0] for option in question["options"]],
+                question["correct"],
+            )
+            for question in raw
+        ),
+    )
+
+
+def old_alignment(raw: list) -> list:
+    return [
+        OldAlignmentQuestion(
+            question["text"],
+            [
+                (label, AlignmentField[field], shift)
+                for label, field, shift in question["options"]
+            ],
+        )
+        for question in raw
+    ]
+
+
+def new_alignment(raw: list) -> AlignmentTest:
+    return AlignmentTest(
+        "Benchmark",
+        (
+            AlignmentQuestion(
+                question["text"],
+                [
+                    (label, AlignmentField[field], shift)
+                    for label, field, shift in question["options"]
+                ],
+            )
+            for question in raw
+        ),
+        (("",) * 3,) * 3,
+    )
+
+
+def measure(build, raw: list) -> float:
+    """Bytes per question kept by whatever `build` makes from `raw`"""
+    text = json.dumps(raw)
+    gc.collect()
+    tracemalloc.start()
+    # each build gets its own copy, so no strings are shared with the last;
+    # made while tracing, so strings kept from it count
+    raw = json.loads(text)
+    built = build(raw)
+    # only what's kept counts, not the raw questions it was made from
+    del raw
+    gc.collect()
+    kept, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del built
+    return kept / QUESTIONS
+
+
+def main():
+    rng = random.Random(0)
+    raw = make_raw(rng)
+    print(f"{QUESTIONS} questions with {OPTIONS} options each, bytes per question:")
+    for name, old, new in (
+        ("quiz", old_quiz, new_quiz),
+        ("alignment", old_alignment, new_alignment),
+    ):
+        before = measure(old, raw)
+        after = measure(new, raw)
+        print(
+            f"  {name:<10} before {before:>7.0f}   after {after:>7.0f}"
+            f"   ({before / after:.1f}x smaller)"
+        )
+
+
+if __name__ == "__main__":
+    main()
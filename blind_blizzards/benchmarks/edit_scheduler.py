@@ -0,0 +1,119 @@
+"""Edits against a fake Discord client with per-channel 429 buckets.
+
+Each channel has a user flipping help pages every 20ms (cosmetic edits)
+and a quiz moving on every 250ms (feedback edits). "direct" makes every
+edit as it happens, like calling `Message.edit` from each click;
+"scheduled" goes through `lib.edits.EditScheduler`.
+
+Run from the project folder with `python -m benchmarks.edit_scheduler`
+"""
+import asyncio
+import statistics
+import time
+from types import SimpleNamespace
+
+from lib.edits import EditScheduler, FEEDBACK, COSMETIC
+
+CHANNELS = 20
+FLIPS = 100
+FLIP_INTERVAL = 0.02
+QUESTIONS = 8
+QUESTION_INTERVAL = 0.25
+# Discord allows 5 message edits per 5 seconds per channel; scaled down
+BUCKET_SIZE = 5
+BUCKET_WINDOW = 0.5
+# the default of 2.5s per 5s window, scaled down the same way
+COSMETIC_INTERVAL = BUCKET_WINDOW * 2.5 / 5
+# how long a successful request takes
+LATENCY = 0.01
+
+
+class FakeClient:
+    """Edits messages, enforcing a per-channel bucket. Like discord.py,
+    a 429 makes the request sleep until the bucket resets and retry"""
+
+    def __init__(self):
+        self.buckets = {}
+        self.requests = 0
+        self.rate_limited = 0
+        # message ID -> (time, fields) of each edit that went through
+        self.shown = {}
+
+    async def edit(self, message, fields: dict):
+        while True:
+            now = time.monotonic()
+            reset, remaining = self.buckets.get(message.channel.id, (0.0, BUCKET_SIZE))
+            if now >= reset:
+                reset, remaining = now + BUCKET_WINDOW, BUCKET_SIZE
+            self.requests += 1
+            if remaining:
+                self.buckets[message.channel.id] = (reset, remaining - 1)
+                await asyncio.sleep(LATENCY)
+                self.shown.setdefault(message.id, []).append((time.monotonic(), fields))
+                return
+            self.buckets[message.channel.id] = (reset, remaining)
+            self.rate_limited += 1
+            await asyncio.sleep(reset - now)
+
+
+def make_message(message_id: int, channel_id: int):
+    return SimpleNamespace(id=message_id, channel=SimpleNamespace(id=channel_id))
+
+
+async def run(scheduled: bool):
+    client = FakeClient()
+    scheduler = EditScheduler(
+        client.edit, cosmetic_interval=COSMETIC_INTERVAL, busy_window=BUCKET_WINDOW
+    )
+    feedback_latency = []
+    tasks = []
+
+    def edit(message, priority, fields):
+        if scheduled:
+            return scheduler.submit(message, priority, **fields)
+        return asyncio.ensure_future(client.edit(message, fields))
+
+    async def flipper(message):
+        for page in range(FLIPS):
+            tasks.append(edit(message, COSMETIC, {"content": f"page {page}"}))
+            await asyncio.sleep(FLIP_INTERVAL)
+
+    async def quiz(message):
+        for question in range(QUESTIONS):
+            asked = time.monotonic()
+            await edit(message, FEEDBACK, {"content": f"question {question}"})
+            feedback_latency.append(time.monotonic() - asked)
+            await asyncio.sleep(QUESTION_INTERVAL)
+
+    start = time.monotonic()
+    sessions = []
+    for channel in range(CHANNELS):
+        sessions.append(flipper(make_message(channel * 2, channel)))
+        sessions.append(quiz(make_message(channel * 2 + 1, channel)))
+    await asyncio.gather(*sessions)
+    await asyncio.gather(*tasks)
+
+    # when each paginator's last page actually showed
+    final_page = [
+        client.shown[channel * 2][-1][0] - start for channel in range(CHANNELS)
+    ]
+    return {
+        "requests": client.requests,
+        "429s": client.rate_limited,
+        "edits shown": sum(len(shown) for shown in client.shown.values()),
+        "feedback median (ms)": statistics.median(feedback_latency) * 1e3,
+        "feedback max (ms)": max(feedback_latency) * 1e3,
+        "last page shown at (s)": max(final_page),
+    }
+
+
+def main():
+    direct = asyncio.run(run(scheduled=False))
+    scheduled = asyncio.run(run(scheduled=True))
+    print(f"{'':>24} {'direct':>10} {'scheduled':>10}")
+    for key in direct:
+        print(f"{key:>24} {direct[key]:>10.1f} {scheduled[key]:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
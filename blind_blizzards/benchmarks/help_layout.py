@@ -0,0 +1,130 @@
+"""Working out help pages for a bot with COGS cogs of COMMANDS commands.
+
+Every command has a check to await, as the real ones do: some are
+owner-only (`lib.checks`), some need Manage Messages, and the rest
+pass. "uncached" filters and splits the commands for every request, as
+the help command used to; "cached" goes through the Help cog's layout
+cache, with requests coming from USERS users across GUILDS guilds.
+
+Needs a config.py, like the bot. Run from the project folder with
+`python -m benchmarks.help_layout`
+"""
+import asyncio
+import random
+import statistics
+import time
+from types import SimpleNamespace
+
+import discord
+from discord.ext import commands
+
+from cogs.help.cog import Help
+from lib.checks import _check
+
+COGS = 25
+COMMANDS = 50
+GUILDS = 10
+USERS = 1000
+REQUESTS = 2000
+
+
+async def anyone(ctx: commands.Context) -> bool:
+    return True
+
+
+def make_cog(number: int) -> commands.Cog:
+    """A cog with COMMANDS commands, each with a check"""
+    attributes = {}
+    for index in range(COMMANDS):
+
+        async def callback(self, ctx: commands.Context):
+            """Does something useful"""
+
+        if index % 10 == 0:
+            check = _check()
+        elif index % 10 == 1:
+            check = commands.has_permissions(manage_messages=True)
+        else:
+            check = commands.check(anyone)
+        attributes[f"command_{number}_{index}"] = check(
+            commands.command(name=f"command{number}x{index}")(callback)
+        )
+    return type(f"Cog{number}", (commands.Cog,), attributes)()
+
+
+def make_context(bot: commands.Bot, rng: random.Random) -> commands.Context:
+    """A context for a help request from a random user in a random guild"""
+    guild = SimpleNamespace(id=rng.randrange(GUILDS))
+    # a few users are moderators
+    moderator = rng.random() < 0.1
+    permissions = discord.Permissions(manage_messages=moderator)
+    channel = SimpleNamespace(id=guild.id, permissions_for=lambda member: permissions)
+    # everyone has the @everyone role, whose ID is the guild's; moderators
+    # have a role for it too
+    roles = [SimpleNamespace(id=guild.id)]
+    if moderator:
+        roles.append(SimpleNamespace(id=GUILDS + guild.id))
+    author = SimpleNamespace(id=rng.randrange(USERS), roles=roles)
+    message = SimpleNamespace(guild=guild, channel=channel, author=author, _state=None)
+    return commands.Context(message=message, bot=bot, prefix="$")
+
+
+async def request(bot: commands.Bot, ctx: commands.Context, cached: bool):
+    """Work out the pages for `$help`, as send_bot_help does"""
+    help_command = bot.help_command.copy()
+    help_command.context = ctx
+    mapping = help_command.get_bot_mapping()
+    if cached:
+        return await help_command.layout(
+            ("bot",), lambda: help_command.bot_pages(mapping)
+        )
+    return await help_command.bot_pages(mapping)
+
+
+async def run(bot: commands.Bot, cached: bool) -> list:
+    rng = random.Random(0)
+    times = []
+    for _ in range(REQUESTS):
+        ctx = make_context(bot, rng)
+        before = time.perf_counter()
+        await request(bot, ctx, cached)
+        times.append(time.perf_counter() - before)
+    return times
+
+
+async def main():
+    # so is_owner needn't ask Discord who the owner is; it's nobody who
+    # asks for help here (user IDs go up to USERS - 1)
+    bot = commands.Bot(command_prefix="$", owner_id=USERS)
+    for number in range(COGS):
+        bot.add_cog(make_cog(number))
+    help_cog = Help(bot)
+    bot.add_cog(help_cog)
+    # a plain Bot doesn't count its changes; bot.Bot does
+    bot.commands_version = 0
+    print(
+        f"{len(bot.commands)} commands, {REQUESTS} requests"
+        f" from {USERS} users in {GUILDS} guilds"
+    )
+
+    for name, cached in (("uncached", False), ("cached", True)):
+        times = sorted(await run(bot, cached))
+        print(
+            f"{name:>8}: median {statistics.median(times) * 1000:7.3f}ms,"
+            f" p99 {times[int(len(times) * 0.99)] * 1000:7.3f}ms,"
+            f" total {sum(times):.2f}s"
+        )
+    print(f"{len(help_cog.layouts)} layouts cached")
+
+    # loading an extension throws the layouts away
+    bot.commands_version += 1
+    ctx = make_context(bot, random.Random(1))
+    before = time.perf_counter()
+    await request(bot, ctx, cached=True)
+    print(
+        f"first request after a change: {(time.perf_counter() - before) * 1000:.3f}ms"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,117 @@
+"""Leaderboard queries with ATTEMPTS recorded quiz attempts by USERS users.
+
+"scan" answers each query from the results table, as a GROUP BY over
+every attempt; "board" uses `lib.leaderboards`, which is loaded from the
+same table once and then kept up to date attempt by attempt.
+
+Run from the project folder with `python -m benchmarks.leaderboard`
+"""
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from lib.leaderboards import Leaderboards
+from lib.results import ResultStore, Result
+
+ATTEMPTS = 1_000_000
+USERS = 200_000
+GUILDS = 20
+QUESTIONS = 20
+QUERIES = 200
+TITLE = "An example quiz to demonstrate how they work"
+
+SCAN_TOP = """
+SELECT user_id, MAX(CAST(score AS REAL)) AS best FROM results
+WHERE kind = 'quiz' AND outcome = 'finished' AND title = ?
+GROUP BY user_id ORDER BY best DESC LIMIT 10
+"""
+SCAN_RANK = """
+SELECT COUNT(*) + 1 FROM (
+    SELECT MAX(CAST(score AS REAL)) AS best FROM results
+    WHERE kind = 'quiz' AND outcome = 'finished' AND title = ?
+    GROUP BY user_id
+) WHERE best > (
+    SELECT MAX(CAST(score AS REAL)) FROM results
+    WHERE kind = 'quiz' AND outcome = 'finished' AND title = ? AND user_id = ?
+)
+"""
+
+
+def make_result(rng: random.Random, when: float) -> Result:
+    return Result(
+        "quiz",
+        TITLE,
+        rng.randrange(USERS),
+        rng.randrange(GUILDS),
+        "finished",
+        rng.randrange(QUESTIONS + 1),
+        [],
+        0.0,
+        0,
+        when,
+    )
+
+
+def timed(func, *args, repeat: int = QUERIES) -> float:
+    """Microseconds per call, the median of `repeat` calls"""
+    times = []
+    for _ in range(repeat):
+        before = time.perf_counter()
+        # fetch everything, in case it's a cursor
+        list(func(*args) or ())
+        times.append(time.perf_counter() - before)
+    return statistics.median(times) * 1e6
+
+
+async def main():
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "results.sqlite3")
+        store = ResultStore(path, batch_size=10_000, max_pending=ATTEMPTS)
+        await store.start()
+        for when in range(ATTEMPTS):
+            store.record(make_result(rng, when))
+            if not when % 10_000:
+                # let the writer keep up
+                await asyncio.sleep(0)
+        await store.close()
+        print(f"{ATTEMPTS:,} attempts by up to {USERS:,} users in {GUILDS} guilds")
+
+        boards = Leaderboards()
+        before = time.perf_counter()
+        await boards.load(path)
+        board = boards.board(TITLE)
+        print(
+            f"streaming load: {time.perf_counter() - before:.2f}s"
+            f" for {len(board):,} users' bests"
+        )
+
+        connection = sqlite3.connect(path)
+        user_id = board.top(500)[-1][0]
+        # the scans are slow, so only run them a few times
+        scan_top = timed(connection.execute, SCAN_TOP, (TITLE,), repeat=3)
+        scan_rank = timed(
+            connection.execute, SCAN_RANK, (TITLE, TITLE, user_id), repeat=3
+        )
+        connection.close()
+
+        board_top = timed(board.top, 10)
+        board_rank = timed(board.rank, user_id)
+        print(f"top 10:  scan {scan_top:>12,.1f}us, board {board_top:>6.2f}us")
+        print(f"my rank: scan {scan_rank:>12,.1f}us, board {board_rank:>6.2f}us")
+
+        # keep going: new attempts update the boards as they finish
+        results = [make_result(rng, ATTEMPTS + when) for when in range(QUERIES * 50)]
+        before = time.perf_counter()
+        for result in results:
+            boards.add(result)
+        update = (time.perf_counter() - before) / len(results) * 1e6
+        print(f"update:  {update:.2f}us per attempt (overall and guild boards)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""Event loop lag while sessions look up titles, with the fuzzy matching on
+the loop and through the Offloader.
+
+Each lookup scores up to 64 candidates from 100k titles, which is what
+`take_quiz`/`take_test` do with a mistyped name. The lag is how late the
+watchdog's heartbeat runs, i.e. how long a reaction would wait.
+
+Run from the project folder with `python -m benchmarks.loop_lag`
+"""
+import asyncio
+import random
+import statistics
+import time
+
+from lib.offload import Offloader
+from lib.search import TitleIndex
+from lib.watchdog import LoopWatchdog
+
+from benchmarks.title_index import make_titles, make_queries
+
+# lookups running at once, and how many each does
+SESSIONS = 20
+LOOKUPS = 10
+
+
+async def session(queries: list, lookup):
+    for query in queries:
+        await lookup(query)
+        await asyncio.sleep(0)
+
+
+async def measure(index: TitleIndex, queries: list, lookup) -> list:
+    lags = []
+    watchdog = LoopWatchdog(
+        asyncio.get_event_loop(), interval=0.01, threshold=0.2, on_lag=lags.append
+    )
+    watchdog.start()
+    index.lookup.cache_clear()
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(session(queries[i::SESSIONS][:LOOKUPS], lookup) for i in range(SESSIONS))
+    )
+    took = time.perf_counter() - start
+    watchdog.stop()
+    lags.sort()
+    print(
+        f"  {took:.2f}s for {SESSIONS * LOOKUPS} lookups;"
+        f" heartbeat lag median {statistics.median(lags) * 1e3:.1f} ms,"
+        f" max {lags[-1] * 1e3:.1f} ms; {len(watchdog.stalls)} stalls"
+    )
+    return lags
+
+
+async def main():
+    rng = random.Random(0)
+    titles = make_titles(rng)
+    queries = make_queries(rng, titles)
+    while len(queries) < SESSIONS * LOOKUPS:
+        queries += queries
+    index = TitleIndex(titles)
+
+    async def inline(query):
+        return index.best(query)
+
+    offloader = Offloader(threads=4)
+
+    async def offloaded(query):
+        return await offloader.run(index.best, query)
+
+    print("on the loop:")
+    await measure(index, queries, inline)
+    print("through the Offloader:")
+    await measure(index, queries, offloaded)
+    offloader.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
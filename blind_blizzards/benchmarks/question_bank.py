@@ -0,0 +1,86 @@
+"""Loading a large quiz from JSON and from a compiled bank file.
+
+One quiz of QUESTIONS questions is written as a JSON content file and as
+a bank (see data.bank). Loading the JSON parses and keeps every question;
+loading the bank maps the file and keeps nothing but the directory, so
+what's measured is how long loading takes, the Python memory it keeps
+(with tracemalloc) and how long LOOKUPS random questions take to build.
+
+Run from the project folder with `python -m benchmarks.question_bank`
+"""
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from data.bank import Bank, compile_bank
+from data.content import parse_file
+
+QUESTIONS = 200_000
+OPTIONS = 5
+LOOKUPS = 100_000
+# distinct option texts to pick from
+COMMON_OPTIONS = 400
+
+
+def make_quiz(rng: random.Random) -> dict:
+    pool = [f"Common answer number {number}" for number in range(COMMON_OPTIONS)]
+    return {
+        "type": "quiz",
+        "title": "Benchmark",
+        "questions": [
+            {
+                "text": f"Question {number}: which of these is right?",
+                "options": [rng.choice(pool) for _ in range(OPTIONS)],
+                "correct": rng.randrange(OPTIONS),
+            }
+            for number in range(QUESTIONS)
+        ],
+    }
+
+
+def measure(name: str, load, rng: random.Random):
+    start = time.perf_counter()
+    quiz = load()
+    took = time.perf_counter() - start
+    del quiz
+    # again, as tracing slows loading down
+    tracemalloc.start()
+    quiz = load()
+    kept, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    indexes = [rng.randrange(len(quiz.questions)) for _ in range(LOOKUPS)]
+    start = time.perf_counter()
+    for index in indexes:
+        quiz.questions[index]
+    lookup = (time.perf_counter() - start) / LOOKUPS
+    print(
+        f"  {name:<5} load {took:>7.3f}s, keeps {kept / 2 ** 20:>7.1f} MiB,"
+        f" {lookup * 1e6:.1f} µs per question"
+    )
+
+
+def main():
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "quiz.json")
+        bank_path = os.path.join(directory, "quiz.bank")
+        with open(json_path, "w") as file:
+            json.dump(make_quiz(rng), file)
+        with open(json_path, "rb") as file:
+            raw = file.read()
+        compile_bank(parse_file(json_path, raw), bank_path)
+        print(
+            f"{QUESTIONS} questions; JSON {len(raw) / 2 ** 20:.1f} MiB,"
+            f" bank {os.path.getsize(bank_path) / 2 ** 20:.1f} MiB"
+        )
+
+        measure("JSON", lambda: parse_file(json_path, raw)[0], rng)
+        measure("bank", lambda: Bank(bank_path).items[0], rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Picking QUESTIONS_ASKED questions from quizzes of various sizes.
+
+"copy+shuffle" copies every question index and shuffles the copy, then
+takes the first few, which is what asking a random handful would cost
+without sampling. The others are the `take_quiz` samplings: uniform
+(a lazy Fisher-Yates), stratified over TAGS precomputed tag arrays, and
+weighted with an alias table; building that table is timed separately,
+as it's cached and only rebuilt every few minutes.
+
+Run from the project folder with `python -m benchmarks.quiz_sampling`
+"""
+import random
+import time
+from array import array
+
+from lib.sampling import AliasTable, uniform, stratified, weighted
+
+SIZES = (1_000, 50_000, 1_000_000)
+QUESTIONS_ASKED = 20
+TAGS = 8
+# picks timed per size
+REPEATS = 20
+
+
+def timed(pick) -> float:
+    """Microseconds per pick"""
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        pick()
+    return (time.perf_counter() - start) / REPEATS * 1e6
+
+
+def main():
+    rng = random.Random(0)
+    print(f"microseconds to pick {QUESTIONS_ASKED} questions:")
+    print(
+        f"{'questions':>10} {'copy+shuffle':>13} {'uniform':>8}"
+        f" {'stratified':>11} {'weighted':>9} {'alias build ms':>15}"
+    )
+    for size in SIZES:
+        strata = {tag: array("I") for tag in range(TAGS)}
+        for index in range(size):
+            strata[rng.randrange(TAGS)].append(index)
+        weights = [rng.random() for _ in range(size)]
+
+        def copy_and_shuffle():
+            indexes = list(range(size))
+            rng.shuffle(indexes)
+            return indexes[:QUESTIONS_ASKED]
+
+        start = time.perf_counter()
+        table = AliasTable(weights)
+        build = (time.perf_counter() - start) * 1e3
+
+        print(
+            f"{size:>10}"
+            f" {timed(copy_and_shuffle):>13.1f}"
+            f" {timed(lambda: uniform(size, QUESTIONS_ASKED, rng)):>8.1f}"
+            f" {timed(lambda: stratified(strata, QUESTIONS_ASKED, rng)):>11.1f}"
+            f" {timed(lambda: weighted(table, QUESTIONS_ASKED, rng)):>9.1f}"
+            f" {build:>15.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
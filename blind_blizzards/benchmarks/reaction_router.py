@@ -0,0 +1,88 @@
+"""Per-event cost of routing reactions as the number of live sessions grows.
+
+Compares `lib.reactions.ReactionRouter` against what `Bot.wait_for` does:
+run every pending check on every event.
+
+Run from the project folder with `python -m benchmarks.reaction_router`
+"""
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+
+from data.consts import ALL_EMOJI
+from lib.reactions import ReactionRouter
+
+SESSION_COUNTS = [10, 100, 1_000, 10_000, 100_000]
+EVENTS = 20_000
+
+
+def make_events(sessions: int, events: int) -> list:
+    """Reactions from randomly chosen sessions, seeded so both styles match"""
+    rng = random.Random(0)
+    return [make_event(rng.randrange(sessions)) for _ in range(events)]
+
+
+def make_event(session: int):
+    """A stand-in for the (reaction, user) pair discord.py dispatches"""
+    message = SimpleNamespace(id=session)
+    return (
+        SimpleNamespace(message=message, emoji=ALL_EMOJI[0]),
+        SimpleNamespace(id=session),
+    )
+
+
+def wait_for_style(sessions: int, events: int = EVENTS) -> float:
+    """Emulate discord.py's listener list: one check per pending waiter"""
+
+    def get_check(message_id, user_id):
+        def check(reaction, user):
+            valid_emoji = reaction.emoji in ALL_EMOJI
+            valid_user = user.id == user_id
+            valid_message = reaction.message.id == message_id
+            return all([valid_emoji, valid_user, valid_message])
+
+        return check
+
+    listeners = [get_check(i, i) for i in range(sessions)]
+    pending = make_events(sessions, events)
+    start = time.perf_counter()
+    for reaction, user in pending:
+        for check in listeners:
+            if check(reaction, user):
+                break
+    return (time.perf_counter() - start) / events
+
+
+def router_style(sessions: int) -> float:
+    """Deliver the same events through the router"""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    router = ReactionRouter()
+    listeners = [router.listen(i, i, ALL_EMOJI) for i in range(sessions)]
+    for listener in listeners:
+        listener.future = loop.create_future()
+    events = make_events(sessions, EVENTS)
+    start = time.perf_counter()
+    for reaction, user in events:
+        listener = router.listeners[reaction.message.id, user.id]
+        if listener.future.done():
+            # re-arm, as a session would between questions
+            listener.future = loop.create_future()
+        router.dispatch(reaction, user)
+    elapsed = (time.perf_counter() - start) / EVENTS
+    loop.close()
+    return elapsed
+
+
+def main():
+    print(f"{'sessions':>10} {'wait_for (us/event)':>22} {'router (us/event)':>20}")
+    for sessions in SESSION_COUNTS:
+        # the linear scan gets slow; use fewer events at the top end
+        scan = wait_for_style(sessions, min(EVENTS, 10_000_000 // sessions))
+        routed = router_style(sessions)
+        print(f"{sessions:>10} {scan * 1e6:>22.2f} {routed * 1e6:>20.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Saving session results under sustained load.
+
+SESSIONS fake sessions each finish a result every ~0.1s (about 10,000
+results per second in all) for DURATION seconds, while a ticker measures
+how late the event loop runs. "direct" inserts and commits each result on
+the event loop as it comes in; "batched" goes through
+`lib.results.ResultStore`.
+
+Run from the project folder with `python -m benchmarks.result_store`
+"""
+import asyncio
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from lib.results import ResultStore, Result, SCHEMA, INSERT
+
+SESSIONS = 1000
+FINISH_INTERVAL = 0.1
+DURATION = 5.0
+TICK = 0.001
+
+
+def make_result(rng: random.Random, user_id: int) -> Result:
+    answers = [
+        {"question": index, "correct": rng.random() < 0.5, "seconds": rng.random() * 10}
+        for index in range(10)
+    ]
+    return Result(
+        "quiz",
+        "An example quiz to demonstrate how they work",
+        user_id,
+        rng.randrange(100),
+        "finished",
+        sum(answer["correct"] for answer in answers),
+        answers,
+        rng.random() * 100,
+        rng.getrandbits(64),
+        time.time(),
+    )
+
+
+class Direct:
+    """Insert and commit every result on the event loop"""
+
+    def __init__(self, path: str):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.written = 0
+
+    async def start(self):
+        pass
+
+    def record(self, result: Result):
+        with self.connection:
+            self.connection.execute(INSERT, result.row())
+        self.written += 1
+
+    async def close(self):
+        self.connection.close()
+
+    def stats(self):
+        return {"written": self.written}
+
+
+async def session(store, user_id: int, stop: float):
+    rng = random.Random(user_id)
+    await asyncio.sleep(rng.random() * FINISH_INTERVAL)
+    while time.monotonic() < stop:
+        store.record(make_result(rng, user_id))
+        await asyncio.sleep(FINISH_INTERVAL * (0.5 + rng.random()))
+
+
+async def ticker(lags: list, stop: float):
+    while time.monotonic() < stop:
+        before = time.monotonic()
+        await asyncio.sleep(TICK)
+        lags.append(time.monotonic() - before - TICK)
+
+
+async def run(name: str, store_class):
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "results.sqlite3")
+        store = store_class(path)
+        await store.start()
+
+        lags = []
+        began = time.monotonic()
+        stop = began + DURATION
+        await asyncio.gather(
+            ticker(lags, stop),
+            *(session(store, user_id, stop) for user_id in range(SESSIONS)),
+        )
+        await store.close()
+        elapsed = time.monotonic() - began
+        stats = store.stats()
+
+        lags.sort()
+        print(
+            f"{name:>8}: {stats['written'] / elapsed * 60:>9,.0f} results/min,"
+            f" loop lag median {statistics.median(lags) * 1000:.2f}ms,"
+            f" p99 {lags[int(len(lags) * 0.99)] * 1000:.2f}ms,"
+            f" max {lags[-1] * 1000:.2f}ms"
+        )
+        if "batches" in stats:
+            print(
+                f"{'':>8}  {stats['mean_batch']:.1f} results per transaction,"
+                f" write latency median {stats['latency_median'] * 1000:.2f}ms,"
+                f" p95 {stats['latency_p95'] * 1000:.2f}ms,"
+                f" max {stats['latency_max'] * 1000:.2f}ms, {stats['dropped']} dropped"
+            )
+
+
+async def main():
+    print(
+        f"{SESSIONS} sessions finishing every ~{FINISH_INTERVAL}s for {DURATION}s"
+        f" (~{SESSIONS / FINISH_INTERVAL * 60:,.0f} results/min offered)"
+    )
+    await run("direct", Direct)
+    await run("batched", ResultStore)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+"""Fuzzy title lookup over 100k titles: TitleIndex against a full extractOne scan.
+
+Run from the project folder with `python -m benchmarks.title_index`
+"""
+import random
+import time
+
+from fuzzywuzzy import process
+
+from lib.search import TitleIndex
+
+TITLES = 100_000
+QUERIES = 200
+# the full scan takes seconds per query, so only time a few
+SCAN_QUERIES = 3
+
+WORDS = (
+    "climate carbon ocean arctic glacier solar wind energy forest rain heat "
+    "weather storm flood drought ice sea level emissions fossil fuel coal "
+    "renewable recycling plastic methane ozone species habitat coral reef "
+    "quiz test trivia basics advanced history science policy future"
+).split()
+
+
+def make_titles(rng: random.Random) -> list:
+    titles = set()
+    while len(titles) < TITLES:
+        titles.add(" ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 6))))
+    return sorted(titles)
+
+
+def make_queries(rng: random.Random, titles: list) -> list:
+    """Mistyped titles: a couple of characters dropped from a real one"""
+    queries = []
+    for _ in range(QUERIES):
+        title = list(rng.choice(titles))
+        for _ in range(2):
+            del title[rng.randrange(len(title))]
+        queries.append("".join(title))
+    return queries
+
+
+def main():
+    rng = random.Random(0)
+    titles = make_titles(rng)
+    queries = make_queries(rng, titles)
+
+    start = time.perf_counter()
+    index = TitleIndex(titles)
+    print(f"built index over {len(index)} titles in {time.perf_counter() - start:.2f}s")
+
+    start = time.perf_counter()
+    for query in queries:
+        index.best(query)
+    cold = (time.perf_counter() - start) / QUERIES
+    print(f"TitleIndex.best, uncached: {cold * 1e3:.2f} ms/query")
+
+    start = time.perf_counter()
+    for query in queries:
+        index.best(query)
+    warm = (time.perf_counter() - start) / QUERIES
+    print(f"TitleIndex.best, cached:   {warm * 1e6:.2f} us/query")
+
+    agree = 0
+    start = time.perf_counter()
+    for query in queries[:SCAN_QUERIES]:
+        title, score = process.extractOne(query, titles)
+        agree += index.best(query)[1] >= score
+    scan = (time.perf_counter() - start) / SCAN_QUERIES
+    print(f"process.extractOne scan:   {scan * 1e3:.2f} ms/query")
+    print(f"index matched the scan's best score on {agree}/{SCAN_QUERIES} queries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Mapping VALUES numbers with `value_map` one at a time, and with
+`value_map_batch` in one call, from a few kinds of input.
+
+Run from the project folder with `python -m benchmarks.value_map`
+"""
+import array
+import random
+import time
+
+import numpy
+
+from lib.utils import value_map, value_map_batch
+
+VALUES = 1_000_000
+# alignment binning: a score in ±24 onto 3 cells
+INT_BOUNDS = (-24, 25, 0, 3)
+FLOAT_BOUNDS = (-1.5, 2.25, 0.0, 255.0)
+
+
+def timed(func, *args) -> float:
+    """Seconds for the best of three calls"""
+    best = float("inf")
+    for _ in range(3):
+        before = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - before)
+    return best
+
+
+def scalar(values, bounds):
+    return [value_map(value, *bounds) for value in values]
+
+
+def main():
+    rng = random.Random(0)
+    ints = [rng.randrange(-24, 25) for _ in range(VALUES)]
+    floats = [rng.uniform(-1.5, 2.25) for _ in range(VALUES)]
+    print(f"{VALUES:,} values")
+
+    for name, values, bounds, inputs in (
+        (
+            "int",
+            ints,
+            INT_BOUNDS,
+            (("numpy", numpy.array(ints)), ("array", array.array("b", ints))),
+        ),
+        (
+            "float",
+            floats,
+            FLOAT_BOUNDS,
+            (("numpy", numpy.array(floats)), ("array", array.array("d", floats))),
+        ),
+    ):
+        expected = scalar(values, bounds)
+        scalar_time = timed(scalar, values, bounds)
+        print(f"{name:>5} scalar:       {scalar_time * 1000:8.1f}ms")
+        for kind, batch_input in inputs:
+            assert value_map_batch(batch_input, *bounds).tolist() == expected
+            batch_time = timed(value_map_batch, batch_input, *bounds)
+            print(
+                f"{name:>5} batch ({kind}): {batch_time * 1000:8.1f}ms"
+                f" ({scalar_time / batch_time:.0f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
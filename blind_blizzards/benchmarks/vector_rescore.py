@@ -0,0 +1,95 @@
+"""Rescoring saved vector test sessions after a content change.
+
+SESSIONS saved answer sets for a test with QUESTIONS questions, AXES axes
+and ARCHETYPES archetypes. "loop" scores one session at a time in plain
+Python, like the old nested list lookups would; "vectorised" uses
+`VectorTest.classify` on all of them at once.
+
+Run from the project folder with `python -m benchmarks.vector_rescore`
+"""
+import random
+import time
+
+import numpy
+
+from data.vectors import VectorTest, VectorQuestion
+from lib import nearest
+
+SESSIONS = 1_000_000
+QUESTIONS = 20
+AXES = 8
+ARCHETYPES = 1000
+OPTIONS = 5
+# the plain Python loop is slow, so it only scores this many
+LOOP_SESSIONS = 5_000
+
+
+def make_test(rng: random.Random) -> VectorTest:
+    questions = [
+        VectorQuestion(
+            f"Question {number}",
+            [
+                (f"Option {option}", [rng.choice((-1, 0, 1)) for _ in range(AXES)])
+                for option in range(OPTIONS)
+            ],
+        )
+        for number in range(QUESTIONS)
+    ]
+    archetypes = {
+        f"Archetype {number}": [rng.uniform(-1, 1) for _ in range(AXES)]
+        for number in range(ARCHETYPES)
+    }
+    return VectorTest(
+        "Benchmark", [f"axis {axis}" for axis in range(AXES)], questions, archetypes
+    )
+
+
+def loop_score(test: VectorTest, answers: list) -> int:
+    position = [0.0] * AXES
+    for question, option in answers:
+        for axis, shift in enumerate(test.questions[question].options[option][1]):
+            position[axis] += shift
+    position = [value / reach for value, reach in zip(position, test.reach)]
+    best, best_distance = 0, float("inf")
+    for index, centroid in enumerate(test.archetypes.values()):
+        distance = sum((a - b) ** 2 for a, b in zip(position, centroid))
+        if distance < best_distance:
+            best, best_distance = index, distance
+    return best
+
+
+def main():
+    rng = random.Random(0)
+    test = make_test(rng).compile()
+    print(
+        f"{SESSIONS:,} sessions, {QUESTIONS} questions, {AXES} axes,"
+        f" {ARCHETYPES} archetypes (k-d tree: {test.nearest.tree is not None})"
+    )
+
+    generator = numpy.random.default_rng(0)
+    options = generator.integers(0, OPTIONS, size=(SESSIONS, QUESTIONS))
+    indexes = test.offsets[None, :] + options
+
+    sample = [list(enumerate(row)) for row in options[:LOOP_SESSIONS].tolist()]
+    before = time.perf_counter()
+    expected = [loop_score(test, answers) for answers in sample]
+    loop = (time.perf_counter() - before) / LOOP_SESSIONS
+
+    before = time.perf_counter()
+    found = test.classify(indexes)
+    vectorised = (time.perf_counter() - before) / SESSIONS
+
+    assert found[:LOOP_SESSIONS].tolist() == expected
+    print(
+        f"      loop: {loop * 1e6:9.2f}us per session"
+        f" ({loop * SESSIONS:,.0f}s for all of them)"
+    )
+    print(
+        f"vectorised: {vectorised * 1e6:9.2f}us per session"
+        f" ({vectorised * SESSIONS:,.1f}s for all of them)"
+    )
+    print(f"brute force chunk size: {nearest.CHUNK_SIZE}")
+
+
+if __name__ == "__main__":
+    main()
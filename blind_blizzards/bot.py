@@ -1,30 +1,263 @@
 # -*- coding: utf-8 -*-
 
+# first, so the startup timings include the imports below
+from lib.startup import StartupTimer
+
+import argparse
+import asyncio
+import importlib
+import io
+import logging
+import time
+
+import discord
 from discord.ext import commands
 
-# import discord # uncomment when used
 import config
 
+from lib import metrics
+from lib.checks import _check
+from lib.offload import Offloader
+from lib.registry import RegistryClient
+from lib.watchdog import LoopWatchdog, Stall
+
 
 class Bot(commands.Bot):
-    def __init__(self, **kwargs):
+    def __init__(self, registry: RegistryClient = None, **kwargs):
         super().__init__(command_prefix=commands.when_mentioned_or("$"), **kwargs)
-        for cog in config.cogs:
-            try:
-                self.load_extension(cog)
-            except Exception as exc:
-                print(
-                    "Could not load extension {0} due to {1.__class__.__name__}: {1}".format(
-                        cog, exc
+        self.startup = StartupTimer()
+        self.startup.record("import", self.startup.origin)
+        # set before the cogs load, as they check for it
+        self.registry = registry
+        if registry is not None:
+            registry.start(self.loop)
+        for command in general_commands:
+            self.add_command(command)
+
+        self.metrics = metrics.get_metrics(self)
+        metrics.instrument_http(self.http, self.metrics)
+        logging.getLogger("discord.http").addHandler(
+            metrics.RateLimitCounter(self.metrics)
+        )
+        self.metrics_server = None
+        port = getattr(config, "METRICS_PORT", None)
+        if port is not None:
+            # each shard gets its own port, counting up from METRICS_PORT
+            self.loop.create_task(self.serve_metrics(port + (self.shard_id or 0)))
+
+        # CPU-heavy work goes through here rather than running on the loop.
+        # It's the loop's default executor as well, so there's one pool to size
+        self.offloader = Offloader(
+            getattr(config, "OFFLOAD_THREADS", 4),
+            getattr(config, "OFFLOAD_PROCESSES", 0),
+        )
+        self.loop.set_default_executor(self.offloader.threads)
+        # measures the loop's lag, and reports what held it up when it stalls
+        self.watchdog = LoopWatchdog(
+            self.loop,
+            getattr(config, "WATCHDOG_INTERVAL", 0.1),
+            getattr(config, "WATCHDOG_THRESHOLD", 0.25),
+            on_lag=self.metrics.loop_lag.observe,
+            on_stall=self.on_stall,
+        )
+        self.watchdog.start()
+
+        # the extensions load alongside connecting to the gateway, not before it
+        self.extensions_loaded = asyncio.Event()
+        self.loop.create_task(self.load_extensions())
+
+    async def load_extensions(self):
+        """Load every extension in config.cogs"""
+        with self.startup.phase("extension load"):
+            for cog in config.cogs:
+                try:
+                    # importing what the extension needs is the slow part, and
+                    # can happen off the event loop; loading it is then quick
+                    await self.loop.run_in_executor(None, importlib.import_module, cog)
+                    self.load_extension(cog)
+                except Exception as exc:
+                    print(
+                        "Could not load extension {0} due to {1.__class__.__name__}: {1}".format(
+                            cog, exc
+                        )
                     )
-                )
+        self.extensions_loaded.set()
+
+    async def serve_metrics(self, port: int):
+        host = getattr(config, "METRICS_HOST", "127.0.0.1")
+        try:
+            self.metrics_server = await metrics.serve(self.metrics, host, port)
+        except OSError as exc:
+            print(f"Could not serve metrics on {host}:{port}: {exc}")
+
+    # bumped whenever a command is added or removed, e.g. by (un)loading an
+    # extension, so anything built from the command list knows to rebuild
+    commands_version = 0
+
+    def add_command(self, command: commands.Command):
+        super().add_command(command)
+        self.commands_version += 1
+
+    def remove_command(self, name: str) -> commands.Command:
+        command = super().remove_command(name)
+        if command is not None:
+            self.commands_version += 1
+        return command
 
     async def on_ready(self):
         print("Logged on as {0} (ID: {0.id})".format(self.user))
+        self.mark_ready()
+
+    def mark_ready(self):
+        """Note when the bot first became ready, and report on startup"""
+        # on_ready comes again after reconnecting
+        if not any(phase == "ready" for phase, _start, _took in self.startup.phases):
+            self.startup.mark("ready")
+            self.loop.create_task(self.report_startup())
+
+    async def report_startup(self):
+        """Print the startup timings once everything in the background is done"""
+        await self.extensions_loaded.wait()
+        await self.startup.settled()
+        print("Startup:\n" + self.startup.format())
+
+    def on_stall(self, stall: Stall):
+        self.metrics.loop_stalls.inc()
+        print(
+            f"The event loop was blocked for {stall.seconds:.3f}s in:\n{stall.stack}",
+            flush=True,
+        )
+
+    async def close(self):
+        await super().close()
+        self.watchdog.stop()
+        self.offloader.shutdown(wait=False)
+
+    async def on_command(self, ctx: commands.Context):
+        ctx.metrics_started = time.perf_counter()
+
+    async def on_command_completion(self, ctx: commands.Context):
+        self.metrics.command_finished(ctx, "ok")
 
+    async def on_command_error(self, ctx: commands.Context, error: Exception):
+        self.metrics.command_finished(
+            ctx, type(getattr(error, "original", error)).__name__
+        )
+        if (
+            isinstance(error, commands.CommandNotFound)
+            and not self.extensions_loaded.is_set()
+        ):
+            # it may well exist once its extension has loaded
+            await ctx.send("Still warming up; try again in a few seconds.")
+            return
+        await super().on_command_error(ctx, error)
 
-bot = Bot()
 
 # write general commands here
 
-bot.run(config.token)
+
+@commands.command(aliases=["startup"])
+@_check()
+async def startup_report(ctx: commands.Context):
+    """Shows how long each part of startup took"""
+    await ctx.send(f"```\n{ctx.bot.startup.format()}\n```")
+
+
+@commands.command(name="metrics")
+@_check()
+async def show_metrics(ctx: commands.Context, search: str = ""):
+    """Shows the bot's metrics, or just those with `search` in their name"""
+    text = ctx.bot.metrics.render(search)
+    if len(text) < 1900:
+        await ctx.send(f"```\n{text}```")
+    else:
+        await ctx.send(file=discord.File(io.BytesIO(text.encode()), "metrics.txt"))
+
+
+@commands.command(aliases=["stalls"])
+@_check()
+async def loop_stalls(ctx: commands.Context):
+    """Shows what blocked the event loop most recently"""
+    text = ctx.bot.watchdog.format()
+    if len(text) < 1900:
+        await ctx.send(f"```\n{text}\n```")
+    else:
+        await ctx.send(file=discord.File(io.BytesIO(text.encode()), "stalls.txt"))
+
+
+general_commands = [startup_report, show_metrics, loop_stalls]
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Run the bot. launcher.py runs several of these as shards"
+    )
+    parser.add_argument("--shard-id", type=int, help="which shard this is")
+    parser.add_argument("--shard-count", type=int, help="how many shards there are")
+    parser.add_argument(
+        "--registry", help="where the launcher's shared registry is listening"
+    )
+    parser.add_argument(
+        "--fake-gateway",
+        action="store_true",
+        help="run made-up sessions instead of connecting to Discord (see lib.fakegateway)",
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=60.0,
+        help="with --fake-gateway, how many seconds to run for",
+    )
+    parser.add_argument(
+        "--crash-after",
+        type=float,
+        help="with --fake-gateway, crash after this many seconds",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    sharding = {}
+    if args.shard_count is not None:
+        sharding = {"shard_id": args.shard_id, "shard_count": args.shard_count}
+    registry = RegistryClient(args.registry) if args.registry else None
+    bot = Bot(registry, **sharding)
+
+    if not args.fake_gateway:
+        bot.run(config.token)
+        return
+
+    # only needed here, and it imports all of the quiz structures
+    from lib import fakegateway
+
+    async def fake():
+        # there's no gateway to wait for
+        bot.mark_ready()
+        await bot.extensions_loaded.wait()
+        if registry is not None:
+            # give it a moment to connect, so the shared limits apply from the start
+            for _ in range(50):
+                if registry.connected:
+                    break
+                await asyncio.sleep(0.1)
+        await fakegateway.run(
+            bot,
+            args.shard_id or 0,
+            args.shard_count or 1,
+            args.duration,
+            args.crash_after,
+        )
+        bot.watchdog.stop()
+        bot.offloader.shutdown()
+        if registry is not None:
+            await registry.close()
+        store = getattr(bot, "result_store", None)
+        if store is not None:
+            await store.close()
+
+    bot.loop.run_until_complete(fake())
+
+
+if __name__ == "__main__":
+    main()
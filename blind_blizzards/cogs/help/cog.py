@@ -1,18 +1,85 @@
+import collections
+import typing
+
 from discord.ext import commands
 
+import config
+
 from .help import CustomHelpCommand
+from data.typing import PagesTyping, CommandsByCog
+from lib.checks import permission_class
 
 
 class Help(commands.Cog):
-    """The cog containing the help command."""
+    """The cog containing the help command.
+
+    It also keeps the page layouts the help command has worked out, per
+    target and permission class, so repeated help requests don't filter
+    and split every command again. They're dropped whenever a command is
+    added or removed, e.g. by (un)loading an extension.
+    """
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.bot.help_command = CustomHelpCommand()
         self.bot.help_command.cog = self
 
+        # (target, permission class) -> pages
+        self.layouts: typing.MutableMapping[tuple, PagesTyping] = (
+            collections.OrderedDict()
+        )
+        self.layouts_version: typing.Optional[int] = None
+        self.max_layouts = getattr(config, "HELP_LAYOUT_CACHE_SIZE", 1024)
+        # every cog's commands, which doesn't depend on who's asking
+        self.mapping: typing.Optional[CommandsByCog] = None
+
     def cog_unload(self):
         """When the cog is unloaded."""
 
         # set back to default
         self.bot.help_command = commands.HelpCommand()
+
+    def cacheable(self) -> bool:
+        """Whether layouts can be cached, dropping any that are out of date"""
+
+        # bumped by the bot whenever its commands change; bots without it
+        # don't get caching
+        version = getattr(self.bot, "commands_version", None)
+        if version is None:
+            return False
+        if version != self.layouts_version:
+            self.layouts.clear()
+            self.mapping = None
+            self.layouts_version = version
+        return True
+
+    def bot_mapping(self, build: typing.Callable[[], CommandsByCog]) -> CommandsByCog:
+        """Get the cached mapping of cogs to commands, or build it"""
+
+        if not self.cacheable():
+            return build()
+        if self.mapping is None:
+            self.mapping = build()
+        return self.mapping
+
+    async def layout(
+        self,
+        ctx: commands.Context,
+        target: tuple,
+        build: typing.Callable[[], typing.Awaitable[PagesTyping]],
+    ) -> PagesTyping:
+        """Get cached pages for `target` as seen by `ctx.author`, or build them"""
+
+        if not self.cacheable():
+            return await build()
+
+        key = (target, await permission_class(ctx))
+        pages = self.layouts.get(key)
+        if pages is not None:
+            self.layouts.move_to_end(key)
+            return pages
+
+        pages = self.layouts[key] = await build()
+        if len(self.layouts) > self.max_layouts:
+            self.layouts.popitem(last=False)
+        return pages
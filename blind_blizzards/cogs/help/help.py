@@ -5,7 +5,7 @@ from discord.ext import commands
 import config
 
 from .paginator import BotOrCogHelp, GroupHelp, CommandHelp
-from data.typing import CommandsByCog
+from data.typing import CommandsByCog, PagesTyping
 
 
 per_page = getattr(config, "COMMANDS_PER_HELP_PAGE", 10)
@@ -17,6 +17,32 @@ class CustomHelpCommand(commands.HelpCommand):
     def __init__(self):
         super().__init__()
 
+    def get_bot_mapping(self) -> CommandsByCog:
+        """The mapping of every cog to its commands, cached on the Help cog"""
+
+        if self.cog is None:
+            return super().get_bot_mapping()
+        return self.cog.bot_mapping(super().get_bot_mapping)
+
+    async def layout(
+        self, target: tuple, build: typing.Callable[[], typing.Awaitable[PagesTyping]]
+    ) -> PagesTyping:
+        """Get the pages for `target` from the Help cog's cache, building them
+        with `build` if they aren't there. Help command instances are copied
+        for every invocation, so the cache lives on the cog.
+
+        Parameters
+        ----------
+        target: tuple
+            What the help is for, e.g. `("cog", "Quizzes")`
+        build: typing.Callable[[], typing.Awaitable[PagesTyping]]
+            Filters the commands and splits them into pages
+        """
+
+        if self.cog is None:
+            return await build()
+        return await self.cog.layout(self.context, target, build)
+
     async def send_command_help(self, command: commands.Command):
         """The coroutine to run when requested help for a single command.
         
@@ -40,6 +66,22 @@ class CustomHelpCommand(commands.HelpCommand):
             The group requested
         """
 
+        pages = await self.layout(
+            ("group", group.qualified_name), lambda: self.group_pages(group)
+        )
+        paginator = GroupHelp(self, self.context.bot, self.context, pages)
+
+        await paginator.paginate()
+
+    async def group_pages(self, group: commands.Group) -> PagesTyping:
+        """Splits the subcommands of a group the author can use into pages.
+
+        Parameters
+        ----------
+        group: discord.ext.commands.Group
+            The group requested
+        """
+
         cmds = group.commands
 
         # filter commands for the ones that pass all checks
@@ -59,9 +101,7 @@ class CustomHelpCommand(commands.HelpCommand):
         else:
             current_page.append((group, cmds))
             pages.append(current_page)
-        paginator = GroupHelp(self, self.context.bot, self.context, pages)
-
-        await paginator.paginate()
+        return pages
 
     async def send_cog_help(self, cog: commands.Cog):
         """The coroutine to run when requested help for a Cog
@@ -72,6 +112,22 @@ class CustomHelpCommand(commands.HelpCommand):
             The cog requested
         """
 
+        pages = await self.layout(
+            ("cog", cog.qualified_name), lambda: self.cog_pages(cog)
+        )
+        paginator = BotOrCogHelp(self, self.context.bot, self.context, pages)
+
+        await paginator.paginate()
+
+    async def cog_pages(self, cog: commands.Cog) -> PagesTyping:
+        """Splits the commands of a cog the author can use into pages.
+
+        Parameters
+        ----------
+        cog: discord.ext.commands.Cog
+            The cog requested
+        """
+
         cmds = cog.get_commands()
 
         # filter commands for the ones that pass all checks
@@ -86,14 +142,12 @@ class CustomHelpCommand(commands.HelpCommand):
                 end_index = i + per_page
                 current_page.append((cog, cmds[i:end_index]))
                 pages.append(current_page)
+                current_page = []
 
         else:
             current_page.append((cog, cmds))
             pages.append(current_page)
-
-        paginator = BotOrCogHelp(self, self.context.bot, self.context, pages)
-
-        await paginator.paginate()
+        return pages
 
     async def send_bot_help(self, mapping: CommandsByCog):
         """The coroutine to run when requested generic helo for the entire bot
@@ -105,6 +159,21 @@ class CustomHelpCommand(commands.HelpCommand):
             together with the key being `None`
         """
 
+        pages = await self.layout(("bot",), lambda: self.bot_pages(mapping))
+        paginator = BotOrCogHelp(self, self.context.bot, self.context, pages)
+
+        await paginator.paginate()
+
+    async def bot_pages(self, mapping: CommandsByCog) -> PagesTyping:
+        """Splits every command the author can use into pages, keeping each
+        cog's commands together where they fit.
+
+        Parameters
+        ----------
+        mapping: Mapping[Optional[discord.ext.commands.Cog], List[discord.ext.commands.Command]]
+            As for `send_bot_help`
+        """
+
         # filter commands
         mapping = {
             cog: await self.filter_commands(cmds, sort=True)
@@ -158,7 +227,4 @@ class CustomHelpCommand(commands.HelpCommand):
         # add the last page if it isn't empty
         if current_page:
             pages.append(current_page)
-
-        paginator = BotOrCogHelp(self, self.context.bot, self.context, pages)
-
-        await paginator.paginate()
+        return pages
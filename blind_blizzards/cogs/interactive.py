@@ -4,94 +4,555 @@
 from discord.ext import commands
 import discord
 
-# quiz data
-from data import interactive
-
-# reload quiz data
-from importlib import reload
+# quiz/test/game files
+from data.content import ContentStore, Catalogue
+from data.render import embed_cache
+import config
 
 # determining the user's selection
-from fuzzywuzzy import process
+from lib.search import TitleIndex
+
+# listing titles
+from lib.paginator import TitleList
 
 # if they didn't select
 import random
 
+# for type hints and work off the event loop
+import typing
+import asyncio
+import importlib
+
+# logging errors the way discord.py would
+import sys
+import traceback
+
 # for creating admin-only commands
 from lib.checks import _check
 
+# ready-made session messages
+from lib.pool import MessagePool
+from data.consts import ALL_EMOJI
+
+# keeping track of running sessions
+from lib.sessions import SessionManager, SessionLimitReached
+
+# saving results
+from lib.results import ResultStore
+from lib.leaderboards import Leaderboards
+
+# picking some of a quiz's questions
+from lib.sampling import AnswerStats, sampling_options
+
+# loading content in the background
+from lib.startup import get_startup_timer
+
+# keeping fuzzy matching and indexing off the event loop
+from lib.offload import get_offloader
+
+# the kinds of session this cog runs, so it only ends its own when unloaded
+SESSION_KINDS = ("quiz", "test", "game", TitleList.session_kind)
+
+# how close (out of 100) a title has to be to a request to be picked
+match_threshold = getattr(config, "TITLE_MATCH_THRESHOLD", 50)
+# how many titles go on each page of a listing
+listing_page_size = getattr(config, "LISTING_PAGE_SIZE", 15)
+
+
+class WarmingUp(commands.CommandError):
+    """Raised when a command needs content that hasn't loaded yet"""
+
+
+class LoadFailed(commands.CommandError):
+    """Raised when a command needs content that couldn't be loaded"""
+
+
+def needs_content(func: typing.Callable) -> typing.Callable:
+    """Mark a command as needing the content, so it answers that the bot
+    is warming up until the content has loaded"""
+    func.needs_content = True
+    return func
+
 
 class Quizzes(commands.Cog):
     """The cog that handles quizzes"""
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        # a list of quiz/test titles to their quizzes/tests
-        self.quizzes_by_name = {quiz.title: quiz for quiz in interactive.quizzes}
-        self.tests_by_name = {test.title: test for test in interactive.tests}
+        # the content from data.interactive plus the content directory, which
+        # is loaded in the background; until then there's no catalogue
+        self.content: typing.Optional[ContentStore] = None
+        self.catalogue: typing.Optional[Catalogue] = None
+        # why the content couldn't be loaded, until it can be
+        self.load_error: typing.Optional[str] = None
+        self.offload = get_offloader(bot)
+        self.loading = get_startup_timer(bot).begin("content compile")
+        self.load_task = bot.loop.create_task(self.load_on_startup())
+        # how many rendered question/node embeds to keep around
+        embed_cache.max_size = getattr(config, "EMBED_CACHE_SIZE", embed_cache.max_size)
+
+        # when this is one shard of several, the launcher's registry keeps
+        # the limits, results and leaderboards every shard shares
+        self.registry = getattr(bot, "registry", None)
+
+        # limit and time out sessions
+        self.sessions = bot.session_manager = SessionManager(
+            idle_timeout=getattr(config, "SESSION_IDLE_TIMEOUT", 300.0),
+            per_user=getattr(config, "MAX_SESSIONS_PER_USER", 2),
+            per_guild=getattr(config, "MAX_SESSIONS_PER_GUILD", 50),
+            total=getattr(config, "MAX_SESSIONS", 1000),
+            queue_timeout=getattr(config, "SESSION_QUEUE_TIMEOUT", 10.0),
+            registry=self.registry,
+        )
+
+        # save results in the background; set RESULTS_DATABASE to None to turn off
+        results_path = getattr(config, "RESULTS_DATABASE", "results.sqlite3")
+        if self.registry is not None:
+            # the launcher saves results and keeps the leaderboards
+            results_path = None
+        elif results_path:
+            bot.result_store = ResultStore(
+                results_path, getattr(config, "RESULTS_BATCH_SIZE", 500)
+            )
+            bot.loop.create_task(bot.result_store.start())
+
+        # best quiz scores, rebuilt from the saved results
+        if self.registry is None:
+            bot.leaderboards = Leaderboards()
+        if results_path:
+            bot.loop.create_task(bot.leaderboards.load(results_path))
+
+        # how often each question is answered wrong, for weighted quizzes;
+        # as one shard of several, only this shard's answers since it started
+        bot.answer_stats = AnswerStats(getattr(config, "ANSWER_WEIGHTS_MAX_AGE", 300.0))
+        if results_path:
+            bot.loop.create_task(bot.answer_stats.load(results_path))
+
+        # optionally keep messages with the session reactions already added
+        pool_size = getattr(config, "WARM_POOL_SIZE", 0)
+        if pool_size:
+            bot.message_pool = MessagePool(
+                ALL_EMOJI,
+                pool_size,
+                getattr(config, "WARM_POOL_RATE", 1.0),
+                max_age=getattr(config, "WARM_POOL_MAX_AGE", 600.0),
+            )
+            bot.message_pool.start()
+
+    def cog_unload(self):
+        """When the cog is unloaded."""
+
+        # end this cog's sessions (not help menus, say); each one removes
+        # its own listeners
+        self.sessions.cancel_all(SESSION_KINDS)
+
+        pool = getattr(self.bot, "message_pool", None)
+        if pool is not None:
+            pool.stop()
+            del self.bot.message_pool
+
+        store = getattr(self.bot, "result_store", None)
+        if store is not None:
+            # write whatever is still queued, then close the database
+            self.bot.loop.create_task(store.close())
+            del self.bot.result_store
+
+    async def load_on_startup(self):
+        try:
+            await self.load_content()
+        finally:
+            get_startup_timer(self.bot).end(self.loading)
+
+    async def load_content(self):
+        """Build and compile the content off the event loop, then serve it.
+        If that fails, the error is logged and kept for commands to report,
+        and `reload_quizzes` tries again"""
+        try:
+            # data.interactive builds all of its quizzes and tests as it's imported
+            interactive = await self.offload.run(
+                importlib.import_module, "data.interactive"
+            )
+            self.content = ContentStore(
+                getattr(config, "CONTENT_DIRECTORY", "content"),
+                interactive.quizzes,
+                interactive.tests,
+                # files are parsed in worker processes, if there are any
+                parse_pool=self.offload.processes,
+            )
+            catalogue = await self.offload.run(self.content.load)
+            indexes = await self.offload.run(self.build_indexes, catalogue)
+            self.use_catalogue(catalogue, indexes)
+            self.load_error = None
+        except Exception as exc:
+            print("Couldn't load the content:", file=sys.stderr)
+            traceback.print_exc()
+            self.load_error = f"{exc.__class__.__name__}: {exc}"
+
+    async def cog_before_invoke(self, ctx: commands.Context):
+        """Hold off commands that need the content until it has loaded"""
+        if self.catalogue is None and getattr(
+            ctx.command.callback, "needs_content", False
+        ):
+            if self.load_error is not None:
+                raise LoadFailed(
+                    f"The quizzes couldn't be loaded ({self.load_error});"
+                    " an owner can try again with `reload_quizzes`."
+                )
+            raise WarmingUp("Still warming up; try again in a few seconds.")
+
+    def build_indexes(
+        self, catalogue: Catalogue = None
+    ) -> typing.Tuple[TitleIndex, TitleIndex, TitleIndex]:
+        """Build the quiz, test and game title indexes for a catalogue"""
+        catalogue = catalogue or self.content.catalogue
+        return tuple(
+            TitleIndex(items, tags={title: item.tags for title, item in items.items()})
+            for items in (catalogue.quizzes, catalogue.tests, catalogue.games)
+        )
+
+    def use_catalogue(
+        self,
+        catalogue: Catalogue,
+        indexes: typing.Tuple[TitleIndex, TitleIndex, TitleIndex],
+    ):
+        """Start serving a catalogue along with its indexes"""
+        # only ever called on the event loop, so commands always see a
+        # catalogue and indexes that match
+        self.catalogue = catalogue
+        self.quiz_index, self.test_index, self.game_index = indexes
+
+    async def find_title(
+        self, ctx: commands.Context, index: TitleIndex, name: str, kind: str
+    ) -> typing.Optional[str]:
+        """Find the title closest to `name`, or suggest some if none are close"""
+        # scoring a large catalogue takes long enough to hold up other sessions
+        match = await self.offload.run(index.best, name)
+        if match is not None and match[1] >= match_threshold:
+            return match[0]
+
+        # nothing close enough; offer the nearest titles we have instead
+        suggestions = await self.offload.run(index.did_you_mean, name)
+        message = f"Couldn't find a {kind} called {name!r}."
+        if suggestions:
+            message += " Did you mean:\n" + "\n".join(suggestions)
+        await ctx.send(message)
+        return None
+
+    async def list_titles(
+        self, ctx: commands.Context, index: TitleIndex, search: str, heading: str
+    ):
+        """Page through the titles in an index. `search` is the start of the
+        titles to list, and may include a `tag:<tag>` to only list those"""
+        tag = None
+        words = []
+        for word in search.split():
+            if word.lower().startswith("tag:"):
+                tag = word[4:]
+            else:
+                words.append(word)
+        pages = index.listing(" ".join(words), tag, listing_page_size)
+        await TitleList(self.bot, ctx, pages, heading).paginate()
+
+    # the current catalogue's quiz/test/game titles to their quizzes/tests/games.
+    # sessions hold on to what they looked up, so reloading never affects them
+
+    @property
+    def quizzes_by_name(self):
+        return self.catalogue.quizzes
+
+    @property
+    def tests_by_name(self):
+        return self.catalogue.tests
+
+    @property
+    def games_by_name(self):
+        return self.catalogue.games
 
     @commands.command()
     @_check()
     async def reload_quizzes(self, ctx: commands.Context):
-        """Reloads the list of available quizzes"""
-        # reload cogs.data.quizzes
-        reload(interactive)
-        # construct quizzes_by_name/tests_by_name again
-        self.quizzes_by_name = {quiz.title: quiz for quiz in interactive.quizzes}
-        self.tests_by_name = {test.title: test for test in interactive.tests}
+        """Reloads the quizzes and tests in data/interactive.py and the
+        content directory. If loading them failed, tries again"""
+        if self.catalogue is None:
+            # nothing to reload yet; wait for the load that's running, or
+            # start another if that failed
+            if self.load_task.done():
+                self.load_task = self.bot.loop.create_task(self.load_content())
+            await asyncio.shield(self.load_task)
+            if self.catalogue is None:
+                await ctx.send(
+                    f"The quizzes still couldn't be loaded: {self.load_error}"
+                )
+                return
+
+        # rerun data.interactive, which builds its quizzes and tests as
+        # it's imported; if it's broken, keep what it made last time
+        module = importlib.import_module("data.interactive")
+        try:
+            interactive = await self.offload.run(importlib.reload, module)
+        except Exception as exc:
+            await ctx.send(
+                f"Could not reload data/interactive.py, so its quizzes and tests"
+                f" are unchanged: {exc.__class__.__name__}: {exc}"
+            )
+            interactive = None
+
+        # only changed files are parsed, and not on the event loop
+        if interactive is None:
+            reloaded = self.content.reload()
+        else:
+            reloaded = self.content.reload(interactive.quizzes, interactive.tests)
+        catalogue, parsed, removed = await reloaded
+        # indexing a large catalogue takes a while, so that's off the loop too
+        indexes = await self.offload.run(self.build_indexes, catalogue)
+        self.use_catalogue(catalogue, indexes)
         # send back a nice little message
+        message = (
+            f"Reloaded {len(self.quizzes_by_name)} quizzes, {len(self.tests_by_name)} tests"
+            f" and {len(self.games_by_name)} games"
+            f" ({parsed} files parsed, {removed} removed)"
+        )
+        # point out anything that didn't parse
+        for path, error in self.content.errors.items():
+            message += f"\nCould not load {path}: {error}"
+        await ctx.send(message)
+
+    async def cog_command_error(self, ctx: commands.Context, error: Exception):
+        """Tell the user when a session couldn't be started, the content
+        is still loading, the shared state couldn't be reached or the
+        command was used wrongly. Anything else is a bug: it's logged, as
+        the bot's own handling skips cogs that handle their errors"""
+        if isinstance(error, (SessionLimitReached, WarmingUp, LoadFailed)):
+            message = str(error)
+        elif isinstance(error, commands.CommandInvokeError) and isinstance(
+            error.original, (ConnectionError, asyncio.TimeoutError)
+        ):
+            # the launcher's registry is down or restarting
+            message = "That isn't available right now; try again in a bit."
+        elif isinstance(error, commands.UserInputError):
+            # a missing or mistyped argument
+            message = (
+                f"{error}\nUsage: `{ctx.prefix}{ctx.command.qualified_name}"
+                f" {ctx.command.signature}`"
+            )
+        elif isinstance(error, commands.CheckFailure):
+            message = "You can't use that command."
+        else:
+            print(f"Ignoring exception in command {ctx.command}:", file=sys.stderr)
+            traceback.print_exception(
+                type(error), error, error.__traceback__, file=sys.stderr
+            )
+            message = "Sorry, something went wrong running that command."
+        try:
+            await ctx.send(message)
+        except discord.HTTPException:
+            # e.g. the channel's gone, which may be what went wrong
+            pass
+
+    @commands.command(aliases=["sessioncounts"])
+    @_check()
+    async def session_counts(self, ctx: commands.Context):
+        """Shows how many sessions are running"""
+        counts = self.sessions.counts()
+        message = "\n".join(
+            f"{kind}: {count}" for kind, count in sorted(counts.items())
+        )
+        if self.registry is not None and self.registry.connected:
+            # the registry only sees capped sessions, but sees every shard's
+            counts = await self.registry.call("counts")
+            message = "This shard:\n" + message + "\nCapped, across all shards:\n"
+            message += "\n".join(
+                f"{kind}: {count}" for kind, count in sorted(counts.items())
+            )
+        await ctx.send(message)
+
+    @commands.command(aliases=["resultstats"])
+    @_check()
+    async def result_stats(self, ctx: commands.Context):
+        """Shows how the results database is keeping up"""
+        if self.registry is not None:
+            # the launcher saves every shard's results
+            stats = await self.registry.call("result_stats")
+        else:
+            store = getattr(self.bot, "result_store", None)
+            stats = None if store is None else store.stats()
+        if stats is None:
+            await ctx.send("Results aren't being saved (see RESULTS_DATABASE)")
+            return
         await ctx.send(
-            f"Reloaded {len(self.quizzes_by_name)} quizzes and {len(self.tests_by_name)} tests"
+            f"{stats['written']} results saved in {stats['batches']} batches"
+            f" ({stats['mean_batch']:.1f} per batch), {stats['pending']} waiting,"
+            f" {stats['dropped']} dropped\n"
+            f"Write latency: {stats['latency_median'] * 1000:.1f}ms median,"
+            f" {stats['latency_p95'] * 1000:.1f}ms p95,"
+            f" {stats['latency_max'] * 1000:.1f}ms max"
+        )
+
+    @commands.command(aliases=["poolstats"])
+    @_check()
+    async def pool_stats(self, ctx: commands.Context):
+        """Shows how well the warm message pool is doing"""
+        pool = getattr(self.bot, "message_pool", None)
+        if pool is None:
+            await ctx.send("The warm message pool is turned off (see WARM_POOL_SIZE)")
+            return
+        stats = pool.stats()
+        await ctx.send(
+            f"Pool hit rate: {stats['hit_rate']:.0%} ({stats['hits']} hits,"
+            f" {stats['misses']} misses), {stats['pooled']} messages ready,"
+            f" {stats['expired']} thrown away for being too old\n"
+            f"Time to first question: {stats['first_question_median']:.2f}s median,"
+            f" {stats['first_question_p95']:.2f}s p95"
         )
 
     @commands.command(aliases=["takequiz", "quiz"])
-    async def take_quiz(self, ctx: commands.Context, *, quiz_name: str = None):
-        """Take a quiz. If none specified, one will be chosen at random"""
+    @needs_content
+    async def take_quiz(self, ctx: commands.Context, *, quiz_name: str = ""):
+        """Take a quiz. If none specified, one will be chosen at random.
+        Add `length:<number>` to only be asked that many questions, and
+        `sample:<way>` to pick them `uniform`ly (the default), `stratified`
+        (evenly across the quiz's question tags) or `weighted` (towards
+        questions people get wrong), e.g. `quiz Climate trivia length:20
+        sample:weighted`. Only runs through the whole quiz go on the leaderboard"""
+        quiz_name, length, sampling = sampling_options(quiz_name)
+
         # if no quiz specified, pick a random one
         if not quiz_name:
+            if not self.quizzes_by_name:
+                await ctx.send("There aren't any quizzes to pick from.")
+                return
             # random.choice doesn't like dict_keys
             quiz_name = random.choice([i for i in self.quizzes_by_name])
 
-        # find the closest match, no matter what it is and strip the accuracy
-        quiz_name = process.extractOne(quiz_name, self.quizzes_by_name.keys())[0]
+        # find the closest match, or give up with some suggestions
+        quiz_name = await self.find_title(ctx, self.quiz_index, quiz_name, "quiz")
+        if quiz_name is None:
+            return
 
         # get the object from the name
         quiz = self.quizzes_by_name[quiz_name]
 
+        weights = None
+        if length is not None and sampling == "weighted":
+            # cached, but O(questions) when it's rebuilt
+            weights = await self.offload.run(
+                self.bot.answer_stats.alias_table, quiz.title, len(quiz.questions)
+            )
+
         # do the quiz using Quiz.do_quiz
-        await quiz.do_quiz(ctx)
+        async with self.sessions.session(ctx, "quiz"):
+            await quiz.do_quiz(ctx, length=length, sampling=sampling, weights=weights)
+
+    @commands.command(aliases=["lb", "top"])
+    @needs_content
+    async def leaderboard(self, ctx: commands.Context, *, quiz_name: str):
+        """Shows the best scores for a quiz in this server, and your place"""
+        # find the closest match, or give up with some suggestions
+        quiz_name = await self.find_title(ctx, self.quiz_index, quiz_name, "quiz")
+        if quiz_name is None:
+            return
+
+        guild_id = ctx.guild.id if ctx.guild is not None else None
+        if self.registry is not None:
+            # every shard's results are on the launcher's leaderboards
+            standings = await self.registry.call(
+                "standings", title=quiz_name, guild_id=guild_id, user_id=ctx.author.id
+            )
+        else:
+            standings = self.bot.leaderboards.standings(
+                quiz_name, guild_id, ctx.author.id
+            )
+
+        embed = discord.Embed(
+            colour=self.quizzes_by_name[quiz_name].colour,
+            title=f"{quiz_name} - leaderboard",
+        )
+        # mentions in embeds don't ping anyone, and need no user lookups
+        embed.description = (
+            "\n".join(
+                f"**{place}.** <@{user_id}> - {score:g}"
+                for place, (user_id, score) in enumerate(standings["top"], 1)
+            )
+            or "Nobody has finished this quiz yet."
+        )
+
+        # where the author stands, here and everywhere
+        places = [
+            f"#{rank} of {size} {where} ({score:g})"
+            for where, rank, size, score in standings["places"]
+        ]
+        if places:
+            embed.set_footer(text="You: " + ", ".join(places))
+        await ctx.send(embed=embed)
 
     @commands.command(aliases=["quizzes", "listquizzes"])
-    async def list_quizzes(self, ctx: commands.Context):
-        """Shows the list of quizzes"""
-        # get the quizzes in a newline-separated format
-        quizzes = "\n".join(self.quizzes_by_name.keys())
-        # TODO: paginate
-        await ctx.send(quizzes)
+    @needs_content
+    async def list_quizzes(self, ctx: commands.Context, *, search: str = ""):
+        """Shows the list of quizzes. Give the start of a title to only list
+        those, and/or tag:<tag> to only list quizzes with that tag"""
+        await self.list_titles(ctx, self.quiz_index, search, "Quizzes")
 
     @commands.command(aliases=["taketest", "test"])
+    @needs_content
     async def take_test(self, ctx: commands.Context, *, test_name: str = None):
         """Take a test. If none specified, one will be chosen at random"""
         # if no test specified, pick a random one
         if not test_name:
+            if not self.tests_by_name:
+                await ctx.send("There aren't any tests to pick from.")
+                return
             # random.choice doesn't like dict_keys
             test_name = random.choice([i for i in self.tests_by_name])
 
-        # find the closest match, no matter what it is and strip the accuracy
-        test_name = process.extractOne(test_name, self.tests_by_name.keys())[0]
+        # find the closest match, or give up with some suggestions
+        test_name = await self.find_title(ctx, self.test_index, test_name, "test")
+        if test_name is None:
+            return
 
         # get the object from the name
         test = self.tests_by_name[test_name]
 
         # do the test using AlignmentTest.do_test
-        await test.do_test(ctx)
+        async with self.sessions.session(ctx, "test"):
+            await test.do_test(ctx)
 
     @commands.command(aliases=["tests", "listtests"])
-    async def list_tests(self, ctx: commands.Context):
-        """Shows the list of tests"""
-        # get the tests in a newline-separated format
-        tests = "\n".join(self.tests_by_name.keys())
-        # TODO: paginate
-        await ctx.send(tests)
+    @needs_content
+    async def list_tests(self, ctx: commands.Context, *, search: str = ""):
+        """Shows the list of tests. Give the start of a title to only list
+        those, and/or tag:<tag> to only list tests with that tag"""
+        await self.list_titles(ctx, self.test_index, search, "Tests")
+
+    @commands.command(aliases=["playgame", "game"])
+    @needs_content
+    async def play_game(self, ctx: commands.Context, *, game_name: str = None):
+        """Play a game. If none specified, one will be chosen at random"""
+        # if no game specified, pick a random one
+        if not game_name:
+            if not self.games_by_name:
+                await ctx.send("There aren't any games to pick from.")
+                return
+            # random.choice doesn't like dict_keys
+            game_name = random.choice([i for i in self.games_by_name])
+
+        # find the closest match, or give up with some suggestions
+        game_name = await self.find_title(ctx, self.game_index, game_name, "game")
+        if game_name is None:
+            return
+
+        # get the object from the name
+        game = self.games_by_name[game_name]
+
+        # play the game using CompiledGame.run
+        async with self.sessions.session(ctx, "game"):
+            await game.run(ctx, title=game_name)
+
+    @commands.command(aliases=["games", "listgames"])
+    @needs_content
+    async def list_games(self, ctx: commands.Context, *, search: str = ""):
+        """Shows the list of games. Give the start of a title to only list
+        those, and/or tag:<tag> to only list games with that tag"""
+        await self.list_titles(ctx, self.game_index, search, "Games")
 
 
 def setup(bot: commands.Bot):
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+
+# interaction with discord
+from discord.ext import commands
+
+import config
+
+# the profilers
+import cProfile
+import pstats
+import tracemalloc
+from lib.profiling import StackSampler, CommandTimings, memory_diff
+
+# for creating admin-only commands
+from lib.checks import _check
+
+# writing results without holding up the event loop
+from lib.offload import get_offloader
+
+# for type hints, waiting and naming files
+import typing
+import asyncio
+import collections
+import os
+import threading
+import time
+
+# where results are written
+profile_directory = getattr(config, "PROFILE_DIRECTORY", "profiles")
+
+
+class Profiling(commands.Cog):
+    """Owner-only commands for seeing where the running bot spends its time.
+
+    Each capture runs for a number of seconds (or until `profile stop`),
+    writes its results to a file in PROFILE_DIRECTORY and replies with a
+    summary. Nothing is measured while no capture is running.
+    """
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self.offload = get_offloader(bot)
+        # kind of capture -> set to end it early
+        self.running: typing.Dict[str, asyncio.Event] = {}
+
+    def cog_unload(self):
+        """When the cog is unloaded."""
+
+        # each capture cleans up after itself as it ends
+        for stop in self.running.values():
+            stop.set()
+
+    async def already_running(self, ctx: commands.Context, kind: str) -> bool:
+        if kind in self.running:
+            await ctx.send(f"A {kind} capture is already running.")
+            return True
+        return False
+
+    async def capture(self, ctx: commands.Context, kind: str, seconds: float):
+        """Wait out a capture of `kind`"""
+        stop = self.running[kind] = asyncio.Event()
+        await ctx.send(f"Capturing {kind} for {seconds:g}s...")
+        try:
+            await asyncio.wait_for(stop.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            del self.running[kind]
+
+    def result_path(self, kind: str, extension: str) -> str:
+        """e.g. profiles/cpu-20201017-142501.pstats"""
+        os.makedirs(profile_directory, exist_ok=True)
+        name = f"{kind}-{time.strftime('%Y%m%d-%H%M%S')}"
+        if self.bot.shard_id is not None:
+            name += f"-shard{self.bot.shard_id}"
+        return os.path.join(profile_directory, f"{name}.{extension}")
+
+    async def reply(self, ctx: commands.Context, path: str, summary: str):
+        # the whole result is in the file, so the summary can be cut short
+        if len(summary) > 1800:
+            summary = summary[:1800].rsplit("\n", 1)[0] + "\n..."
+        await ctx.send(f"Written to `{path}`\n```\n{summary}\n```")
+
+    @commands.group(invoke_without_command=True)
+    @_check()
+    async def profile(self, ctx: commands.Context):
+        """Profile the running bot. See the subcommands"""
+        running = ", ".join(sorted(self.running)) or "nothing"
+        await ctx.send(
+            f"Capturing {running}. Start a capture with `profile cpu`, `profile sample`,"
+            " `profile commands` or `profile memory`, followed by how many seconds"
+        )
+
+    @profile.command()
+    @_check()
+    async def stop(self, ctx: commands.Context):
+        """End every running capture now"""
+        if not self.running:
+            await ctx.send("Nothing is being captured.")
+            return
+        for stop in self.running.values():
+            stop.set()
+
+    @profile.command()
+    @_check()
+    async def cpu(self, ctx: commands.Context, seconds: float = 30.0):
+        """Run cProfile on the event loop. Slows the bot down while it runs;
+        `profile sample` doesn't"""
+        if await self.already_running(ctx, "cpu"):
+            return
+        profiler = cProfile.Profile()
+        # the profiler only sees the thread it's enabled in, which is the loop's
+        profiler.enable()
+        try:
+            await self.capture(ctx, "cpu", seconds)
+        finally:
+            profiler.disable()
+        path = self.result_path("cpu", "pstats")
+        summary = await self.offload.run(self.write_cpu_profile, profiler, path)
+        await self.reply(ctx, path, summary)
+
+    @staticmethod
+    def write_cpu_profile(profiler: cProfile.Profile, path: str) -> str:
+        """Save the stats for pstats/snakeviz, and sum up the slowest functions"""
+        stats = pstats.Stats(profiler)
+        stats.dump_stats(path)
+        lines = [f"{'own s':>8} {'total s':>8} {'calls':>8}  function"]
+        by_own_time = sorted(
+            stats.stats.items(), key=lambda item: item[1][2], reverse=True
+        )
+        for (
+            (filename, line, function),
+            (_prim, calls, own, total, _callers),
+        ) in by_own_time[:15]:
+            where = os.path.basename(filename)
+            lines.append(
+                f"{own:>8.3f} {total:>8.3f} {calls:>8}  {function} ({where}:{line})"
+            )
+        return "\n".join(lines)
+
+    @profile.command()
+    @_check()
+    async def sample(self, ctx: commands.Context, seconds: float = 30.0):
+        """Sample the event loop's stack every few milliseconds, for flame graphs"""
+        if await self.already_running(ctx, "sample"):
+            return
+        sampler = StackSampler(
+            threading.get_ident(), getattr(config, "PROFILE_SAMPLE_INTERVAL", 0.005)
+        )
+        sampler.start()
+        try:
+            await self.capture(ctx, "sample", seconds)
+        finally:
+            # joins the sampling thread, so not on the loop
+            await self.offload.run(sampler.stop)
+        path = self.result_path("samples", "collapsed")
+        summary = await self.offload.run(self.write_samples, sampler, path)
+        await self.reply(ctx, path, summary)
+
+    @staticmethod
+    def write_samples(sampler: StackSampler, path: str) -> str:
+        """Save the collapsed stacks, and sum up where the most samples landed"""
+        sampler.write(path)
+        # samples by innermost frame, i.e. where the loop actually was
+        innermost = collections.Counter()
+        for stack, count in sampler.counts.items():
+            innermost[stack.rsplit(";", 1)[-1]] += count
+        lines = [f"{sampler.samples} samples"]
+        for frame, count in innermost.most_common(15):
+            lines.append(f"{count / sampler.samples:>6.1%}  {frame}")
+        return "\n".join(lines)
+
+    @profile.command(name="commands")
+    @_check()
+    async def command_timings(self, ctx: commands.Context, seconds: float = 60.0):
+        """Time each command, and how long it kept the event loop busy"""
+        if await self.already_running(ctx, "commands"):
+            return
+        timings = CommandTimings(self.bot)
+        timings.install()
+        try:
+            await self.capture(ctx, "commands", seconds)
+        finally:
+            timings.uninstall()
+        path = self.result_path("commands", "txt")
+        summary = timings.format()
+        await self.offload.run(self.write_text, path, summary)
+        await self.reply(ctx, path, summary)
+
+    @profile.command()
+    @_check()
+    async def memory(self, ctx: commands.Context, seconds: float = 60.0):
+        """Show what allocated memory over the next few seconds"""
+        if await self.already_running(ctx, "memory"):
+            return
+        # if tracing was already on (e.g. PYTHONTRACEMALLOC), leave it on
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        try:
+            # snapshots copy every trace, so they're taken off the loop
+            before = await self.offload.run(tracemalloc.take_snapshot)
+            await self.capture(ctx, "memory", seconds)
+            after = await self.offload.run(tracemalloc.take_snapshot)
+        finally:
+            if started:
+                tracemalloc.stop()
+        path = self.result_path("memory", "txt")
+        summary = await self.offload.run(memory_diff, before, after, 100)
+        await self.offload.run(self.write_text, path, summary)
+        await self.reply(ctx, path, summary)
+
+    @staticmethod
+    def write_text(path: str, text: str):
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+
+
+def setup(bot: commands.Bot):
+    bot.add_cog(Profiling(bot))
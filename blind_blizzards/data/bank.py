@@ -0,0 +1,292 @@
+import argparse
+import collections.abc
+import json
+import mmap
+import os
+import struct
+import sys
+import typing
+from array import array
+
+import discord
+
+from .structs import Quiz, QuizTable, AlignmentTest, AlignmentTable, CompiledGame
+from .vectors import VectorTest
+
+# compiled banks are found alongside the JSON/TOML content files
+BANK_EXTENSION = ".bank"
+
+MAGIC = b"BLZBANK\x00"
+VERSION = 2
+# magic, version, then where the directory is and how long it is
+HEADER = struct.Struct("<8sIQQ")
+
+# where a column is: (array typecode, byte offset, byte length)
+ColumnSpec = typing.List[typing.Union[str, int]]
+
+
+def colour_value(colour) -> int:
+    # discord.Colour or a plain int
+    return getattr(colour, "value", colour)
+
+
+class StringColumn(collections.abc.Sequence):
+    """Strings stored as UTF-8 in one block, decoded only when indexed.
+
+    `spans` holds each string's start and end in `data`; a string that
+    turns up many times (like "True") is stored once, and each copy points
+    at the same bytes."""
+
+    __slots__ = ("spans", "data")
+
+    def __init__(self, spans: typing.Sequence[int], data: memoryview):
+        self.spans = spans
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.spans) // 2
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("string index out of range")
+        start, end = self.spans[2 * index], self.spans[2 * index + 1]
+        return str(self.data[start:end], "utf-8")
+
+
+class BankWriter:
+    """Writes the columns of a bank file, then its directory"""
+
+    def __init__(self, file: typing.BinaryIO):
+        self.file = file
+        # filled in by finish
+        file.write(HEADER.pack(MAGIC, VERSION, 0, 0))
+
+    def column(self, values: typing.Union[array, bytes], typecode: str) -> ColumnSpec:
+        # keep every column aligned for its type
+        self.file.write(bytes(-self.file.tell() % 8))
+        offset = self.file.tell()
+        self.file.write(values)
+        return [typecode, offset, self.file.tell() - offset]
+
+    def strings(self, strings: typing.Iterable[str]) -> dict:
+        data = bytearray()
+        spans = array("Q")
+        # text -> its span, so repeats share their bytes
+        seen: typing.Dict[str, typing.Tuple[int, int]] = {}
+        for string in strings:
+            span = seen.get(string)
+            if span is None:
+                start = len(data)
+                data += string.encode("utf-8")
+                span = seen[string] = start, len(data)
+            spans.extend(span)
+        return {"spans": self.column(spans, "Q"), "data": self.column(data, "B")}
+
+    def quiz(self, quiz: Quiz) -> dict:
+        table = quiz.questions
+        return {
+            "type": "quiz",
+            "title": quiz.title,
+            "colour": colour_value(quiz.colour),
+            "tags": sorted(quiz.tags),
+            "columns": {
+                "texts": self.strings(table.texts),
+                "labels": self.strings(table.labels),
+                "offsets": self.column(array("I", table.offsets), "I"),
+                "correct": self.column(array("B", table.correct), "B"),
+                "tags": self.column(array("H", table.tags), "H"),
+                "tag_names": self.strings(table.tag_names),
+            },
+            # the questions with each tag, so sampling needn't look for them
+            "strata": [
+                [tag, self.column(array("I", indexes), "I")]
+                for tag, indexes in table.strata.items()
+            ],
+        }
+
+    def test(self, test: AlignmentTest) -> dict:
+        # checks it, and works out the displacements stored with it
+        test.compile()
+        table = test.questions
+        return {
+            "type": "test",
+            "title": test.title,
+            "alignment_table": test.alignment_table,
+            "x": test.x,
+            "y": test.y,
+            "colour": colour_value(test.colour),
+            "as_images": test.images,
+            "tags": sorted(test.tags),
+            "columns": {
+                "texts": self.strings(table.texts),
+                "labels": self.strings(table.labels),
+                "offsets": self.column(array("I", table.offsets), "I"),
+                "fields": self.column(array("b", table.fields), "b"),
+                "shifts": self.column(array("b", table.shifts), "b"),
+            },
+        }
+
+    def game(self, title: str, game: CompiledGame) -> dict:
+        return {
+            "type": "game",
+            "title": title,
+            "tags": sorted(game.tags),
+            "columns": {
+                "as_option": self.strings(game.as_option),
+                "text": self.strings(game.text),
+                "colour": self.column(
+                    array("I", (colour_value(colour) for colour in game.colour)), "I"
+                ),
+                "is_end": self.column(array("B", game.is_end), "B"),
+                "is_image": self.column(array("B", game.is_image), "B"),
+                "child_offsets": self.column(array("I", game.child_offsets), "I"),
+                "child_ids": self.column(array("I", game.child_ids), "I"),
+            },
+        }
+
+    def item(self, item) -> dict:
+        if isinstance(item, Quiz):
+            return self.quiz(item)
+        if isinstance(item, AlignmentTest):
+            return self.test(item)
+        if isinstance(item, VectorTest):
+            raise ValueError(f"{item.title!r}: vector tests can't be put in a bank")
+        title, game = item
+        return self.game(title, game)
+
+    def finish(self, items: typing.List[dict]):
+        """Write the directory at the end, and point the header at it"""
+        directory = json.dumps({"byteorder": sys.byteorder, "items": items}).encode()
+        offset = self.file.tell()
+        self.file.write(directory)
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, VERSION, offset, len(directory)))
+
+
+def compile_bank(items: list, path: str):
+    """Write quizzes, alignment tests and games to a bank file at `path`.
+
+    The file is written next to it and then moved into place, so a bot
+    with the old file mapped keeps reading the old contents safely;
+    overwriting a mapped file in place would pull it out from under it."""
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as file:
+        writer = BankWriter(file)
+        writer.finish([writer.item(item) for item in items])
+    os.replace(temporary, path)
+
+
+class Bank:
+    """A bank file, mapped into memory rather than read.
+
+    The file holds columns like those of QuizTable, AlignmentTable and
+    CompiledGame, each at an aligned offset, and a JSON directory saying
+    which items there are and where their columns start. Loading only
+    reads the directory: the columns become memoryviews of the mapping,
+    which the usual Quiz, AlignmentTest and CompiledGame use as they are,
+    so a question or node is only read from the file when it's shown.
+
+    Parameters
+    ----------
+    path: str
+        The bank file, as written by `compile_bank`
+
+    Attributes
+    ----------
+    items: list
+        What's in the bank, like the result of `data.content.parse_file`
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            # the mapping stays open after the file is closed
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+        magic, version, offset, length = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} isn't a bank file")
+        if version != VERSION:
+            raise ValueError(f"{path} is a version {version} bank; recompile it")
+        end = offset + length
+        directory = json.loads(str(self.view[offset:end], "utf-8"))
+        # columns are stored in the byte order of the machine that wrote them
+        if directory["byteorder"] != sys.byteorder:
+            raise ValueError(
+                f"{path} was compiled on a {directory['byteorder']}-endian machine"
+            )
+        self.items = [getattr(self, item["type"])(item) for item in directory["items"]]
+
+    def column(self, spec: ColumnSpec) -> memoryview:
+        typecode, start, length = spec
+        end = start + length
+        return self.view[start:end].cast(typecode)
+
+    def columns(self, specs: dict) -> typing.Dict[str, typing.Sequence]:
+        return {
+            name: (
+                StringColumn(self.column(spec["spans"]), self.column(spec["data"]))
+                if isinstance(spec, dict)
+                else self.column(spec)
+            )
+            for name, spec in specs.items()
+        }
+
+    def quiz(self, item: dict) -> Quiz:
+        return Quiz(
+            item["title"],
+            QuizTable.from_columns(
+                strata={tag: self.column(spec) for tag, spec in item["strata"]},
+                **self.columns(item["columns"]),
+            ),
+            discord.Colour(item["colour"]),
+            item["tags"],
+        )
+
+    def test(self, item: dict) -> AlignmentTest:
+        test = AlignmentTest(
+            item["title"],
+            AlignmentTable.from_columns(**self.columns(item["columns"])),
+            item["alignment_table"],
+            item["x"],
+            item["y"],
+            discord.Colour(item["colour"]),
+            item["as_images"],
+            item["tags"],
+        )
+        # it was checked when the bank was compiled
+        return test.compile(check=False)
+
+    def game(self, item: dict) -> typing.Tuple[str, CompiledGame]:
+        game = CompiledGame(**self.columns(item["columns"]))
+        game.tags = frozenset(item["tags"])
+        return item["title"], game
+
+
+def main():
+    # content loads banks, so it can't be imported before this module is
+    from .content import parse_file
+
+    parser = argparse.ArgumentParser(
+        description="Compile content files into one bank file, which the bot maps"
+        " into memory instead of loading"
+    )
+    parser.add_argument(
+        "output", help=f"the bank file to write, ending {BANK_EXTENSION}"
+    )
+    parser.add_argument("inputs", nargs="+", help="JSON or TOML content files")
+    args = parser.parse_args()
+
+    items = []
+    for path in args.inputs:
+        with open(path, "rb") as file:
+            items.extend(parse_file(path, file.read()))
+    compile_bank(items, args.output)
+    print(f"Wrote {len(items)} items to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
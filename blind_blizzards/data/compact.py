@@ -0,0 +1,155 @@
+import collections.abc
+import sys
+import typing
+from array import array
+
+from .consts import AlignmentField
+
+
+# alignment fields as they're stored in an array("b")
+FIELD_CODES = {AlignmentField.X: 0, AlignmentField.Y: 1, AlignmentField.NONE: -1}
+FIELDS_BY_CODE = {code: field for field, code in FIELD_CODES.items()}
+
+
+def intern_all(strings: typing.Iterable[str]) -> typing.Tuple[str, ...]:
+    """The strings as a tuple, each interned. Option texts like "True" or
+    "None of the above" turn up in thousands of questions, and each file
+    parsed makes its own copies; interned, they're all one string"""
+    return tuple(sys.intern(string) for string in strings)
+
+
+def small_ints(typecode: str, values: typing.Iterable[int], what: str) -> array:
+    """An array of `values`, with a readable error if one doesn't fit"""
+    try:
+        return array(typecode, values)
+    except OverflowError:
+        # only for signed typecodes
+        bits = array(typecode).itemsize * 8
+        low, high = -(1 << (bits - 1)), (1 << (bits - 1)) - 1
+        raise ValueError(f"{what} must be between {low} and {high}") from None
+
+
+class Record:
+    """An immutable object whose fields are its __slots__ (and those of the
+    classes it inherits from).
+
+    Records compare and hash by value, so two equal questions, say from
+    different quizzes, or rebuilt from a table, share cached embeds."""
+
+    __slots__ = ()
+    # every slot, in order; worked out for each subclass
+    _fields: typing.Tuple[str, ...] = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._fields = tuple(
+            name
+            for klass in reversed(cls.__mro__)
+            for name in klass.__dict__.get("__slots__", ())
+        )
+
+    @classmethod
+    def _make(cls, *values: typing.Any) -> "Record":
+        """Build a record straight from its field values, skipping __init__"""
+        record = object.__new__(cls)
+        for name, value in zip(cls._fields, values):
+            object.__setattr__(record, name, value)
+        return record
+
+    def _set(self, **values: typing.Any):
+        """Set fields; only for __init__"""
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name: str, value: typing.Any):
+        raise AttributeError(f"{type(self).__name__} can't be changed")
+
+    def __delattr__(self, name: str):
+        raise AttributeError(f"{type(self).__name__} can't be changed")
+
+    def _key(self) -> tuple:
+        # arrays aren't hashable, but their bytes are
+        return tuple(
+            value.tobytes() if isinstance(value, (array, memoryview)) else value
+            for value in (getattr(self, name) for name in self._fields)
+        )
+
+    def __eq__(self, other: typing.Any) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash((type(self), self._key()))
+
+    def __getstate__(self) -> tuple:
+        return tuple(getattr(self, name) for name in self._fields)
+
+    def __setstate__(self, state: tuple):
+        for name, value in zip(self._fields, state):
+            object.__setattr__(self, name, value)
+
+
+class QuestionTable(collections.abc.Sequence):
+    """Questions stored column by column rather than as an object each.
+
+    A question is its index: `texts[i]` is its text, and its options'
+    texts are `labels[offsets[i]:offsets[i + 1]]`. Subclasses add a
+    column (or a column per option) for whatever else their questions
+    have, and build a question record from the columns when one is
+    indexed; records are small, short-lived and compare by value.
+    """
+
+    def __init__(self, questions: typing.Iterable = ()):
+        self.texts: typing.List[str] = []
+        # every question's option texts, one question after another
+        self.labels: typing.List[str] = []
+        self.offsets = array("I", [0])
+        self.extend(questions)
+
+    @classmethod
+    def from_columns(cls, **columns: typing.Sequence) -> "QuestionTable":
+        """A table over columns that already exist, e.g. ones mapped from a
+        bank file (see data.bank); they're used as they are, not copied"""
+        table = cls.__new__(cls)
+        table.__dict__.update(columns)
+        return table
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def span(self, index: int) -> typing.Tuple[int, int]:
+        """Where question `index`'s options are in the per-option columns"""
+        return self.offsets[index], self.offsets[index + 1]
+
+    def question_labels(self, index: int) -> typing.Tuple[str, ...]:
+        start, end = self.span(index)
+        return tuple(self.labels[start:end])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.make(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("question index out of range")
+        return self.make(index)
+
+    def make(self, index: int):
+        """Build the record for question `index`"""
+        raise NotImplementedError
+
+    def append(self, question):
+        """Add a question; its option texts should already be interned"""
+        self.texts.append(question.text)
+        self.labels.extend(question.labels)
+        self.offsets.append(len(self.labels))
+
+    def extend(self, questions: typing.Iterable):
+        for question in questions:
+            self.append(question)
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        # unpickled strings are new copies, e.g. when parsed in another process
+        self.labels = list(intern_all(self.labels))
@@ -26,3 +26,5 @@ OPTION_EMOJI = ["🇦", "🇧", "🇨", "🇩", "🇪"]
 EMOJI_TO_INT = {emoji: index for index, emoji in enumerate(OPTION_EMOJI)}
 # 5 options
 CANCEL = "❌"
+# every emoji a session listens for
+ALL_EMOJI = OPTION_EMOJI + [CANCEL]
@@ -0,0 +1,364 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import os
+import typing
+
+from .consts import MAGIC_EMBED_COLOUR, AlignmentField
+from .structs import (
+    Quiz,
+    QuizQuestion,
+    AlignmentTest,
+    AlignmentQuestion,
+    GameNode,
+    EndNode,
+    CompiledGame,
+)
+from .render import embed_cache
+from .bank import Bank, BANK_EXTENSION
+from .vectors import VectorTest, VectorQuestion
+
+# TOML is optional; without it only .json files are loaded
+try:
+    import toml
+except ImportError:
+    toml = None
+
+
+# the parsed contents of one file
+Items = typing.List[
+    typing.Union[Quiz, AlignmentTest, VectorTest, typing.Tuple[str, CompiledGame]]
+]
+
+
+def parse_quiz(data: dict) -> Quiz:
+    """Build a Quiz from its declarative form"""
+    return Quiz(
+        data["title"],
+        [
+            QuizQuestion(
+                question["text"],
+                question["options"],
+                question["correct"],
+                question.get("tag", ""),
+            )
+            for question in data["questions"]
+        ],
+        data.get("colour", MAGIC_EMBED_COLOUR),
+        data.get("tags", ()),
+    )
+
+
+def parse_test(data: dict) -> AlignmentTest:
+    """Build and compile an AlignmentTest from its declarative form.
+    Options are written as `[text, field, increment]`, with field one of X, Y or NONE.
+    The displacements may be left out, as they're worked out from the options"""
+    test = AlignmentTest(
+        data["title"],
+        [
+            AlignmentQuestion(
+                question["text"],
+                [
+                    (text, AlignmentField[field], increment)
+                    for text, field, increment in question["options"]
+                ],
+            )
+            for question in data["questions"]
+        ],
+        data["alignment_table"],
+        data.get("max_x_displacement"),
+        data.get("max_y_displacement"),
+        data.get("colour", MAGIC_EMBED_COLOUR),
+        data.get("as_images", False),
+        data.get("tags", ()),
+    )
+    # a mistake in the options shows up as this file failing to load
+    return test.compile()
+
+
+def parse_game(data: dict) -> typing.Tuple[str, CompiledGame]:
+    """Build and compile a game from its declarative form.
+    Nodes are named and refer to their children by name, so branches
+    can be shared and games can loop"""
+    colour = data.get("colour", MAGIC_EMBED_COLOUR)
+    nodes = {}
+    # create every node first so children can be linked in any order
+    for name, node in data["nodes"].items():
+        if node.get("end", False):
+            nodes[name] = EndNode(
+                node["option"],
+                node["text"],
+                [],
+                node.get("colour", colour),
+                node.get("image", False),
+            )
+        else:
+            nodes[name] = GameNode(
+                node["option"], node["text"], [], node.get("colour", colour)
+            )
+    for name, node in data["nodes"].items():
+        nodes[name].children.extend(nodes[child] for child in node.get("children", ()))
+    game = nodes[data["start"]].compile()
+    game.tags = frozenset(data.get("tags", ()))
+    return data["title"], game
+
+
+def parse_vector_test(data: dict) -> VectorTest:
+    """Build and compile a VectorTest from its declarative form.
+    Options are written as `[text, [displacement per axis...]]`, and
+    `archetypes` maps each result to its centroid"""
+    test = VectorTest(
+        data["title"],
+        data["axes"],
+        [
+            VectorQuestion(
+                question["text"],
+                [(text, displacements) for text, displacements in question["options"]],
+            )
+            for question in data["questions"]
+        ],
+        data["archetypes"],
+        data.get("colour", MAGIC_EMBED_COLOUR),
+        data.get("as_images", False),
+        data.get("tags", ()),
+    )
+    return test.compile()
+
+
+PARSERS = {
+    "quiz": parse_quiz,
+    "test": parse_test,
+    "vector_test": parse_vector_test,
+    "game": parse_game,
+}
+
+
+def parse_file(path: str, raw: bytes) -> Items:
+    """Parse a content file, which holds one item or a list of them"""
+    if path.endswith(".toml"):
+        data = toml.loads(raw.decode("utf-8"))
+        # TOML documents are tables; lists of items go under `items`
+        data = data.get("items", data)
+    else:
+        data = json.loads(raw.decode("utf-8"))
+    if isinstance(data, dict):
+        data = [data]
+    return [PARSERS[item["type"]](item) for item in data]
+
+
+class Catalogue:
+    """An immutable snapshot of all loaded content.
+
+    Reloading builds a new Catalogue rather than changing this one, so
+    sessions started from a snapshot keep using it until they end."""
+
+    __slots__ = ("quizzes", "tests", "games", "version")
+
+    def __init__(
+        self,
+        quizzes: typing.Dict[str, Quiz],
+        tests: typing.Dict[str, typing.Union[AlignmentTest, VectorTest]],
+        games: typing.Dict[str, CompiledGame],
+        version: int = 0,
+    ):
+        self.quizzes = quizzes
+        self.tests = tests
+        self.games = games
+        self.version = version
+
+
+class _FileEntry:
+    """What we know about a file from the last scan"""
+
+    __slots__ = ("mtime", "digest", "items")
+
+    def __init__(self, mtime: float, digest: str, items: Items):
+        self.mtime = mtime
+        self.digest = digest
+        self.items = items
+
+
+class ContentStore:
+    """Loads quizzes, tests and games from a directory of JSON/TOML files,
+    and bank files compiled from them (see data.bank).
+
+    Parameters
+    ----------
+    directory: str
+        The directory to scan (recursively) for content files
+    quizzes: typing.List[Quiz]
+        Quizzes defined in Python, always included in the catalogue
+    tests: typing.List[AlignmentTest]
+        Tests defined in Python, always included in the catalogue
+    parse_pool: typing.Optional[concurrent.futures.Executor]
+        Where to parse changed files, e.g. a process pool to parse several
+        at once; by default they're parsed one by one as they're found
+
+    Attributes
+    ----------
+    catalogue: Catalogue
+        The current snapshot; replaced wholesale by `load`/`reload`
+    errors: typing.Dict[str, str]
+        Files that failed to parse on the last scan, and why
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        quizzes: typing.List[Quiz] = (),
+        tests: typing.List[AlignmentTest] = (),
+        parse_pool: concurrent.futures.Executor = None,
+    ):
+        self.directory = directory
+        self.parse_pool = parse_pool
+        self.set_base(quizzes, tests)
+        self.files: typing.Dict[str, _FileEntry] = {}
+        # files that failed to parse on the last scan, with the reason
+        self.errors: typing.Dict[str, str] = {}
+        self.catalogue = Catalogue({}, {}, {})
+        self.lock = asyncio.Lock()
+
+    def set_base(self, quizzes: typing.List[Quiz], tests: typing.List[AlignmentTest]):
+        """Replace the content defined in Python, e.g. after reimporting it.
+        Blocking, as the tests are compiled; takes effect on the next build"""
+        tests = list(tests)
+        for test in tests:
+            test.compile()
+        self.base_quizzes = list(quizzes)
+        self.base_tests = tests
+
+    def content_files(self) -> typing.Iterator[str]:
+        """Yields the path of every loadable file in the directory"""
+        extensions = (".json", BANK_EXTENSION)
+        if toml is not None:
+            extensions += (".toml",)
+        for root, _dirs, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(extensions):
+                    yield os.path.join(root, name)
+
+    def scan(self) -> typing.Tuple[int, int]:
+        """Re-parse new or changed files and drop deleted ones.
+
+        A file is only re-read if its mtime changed, and only re-parsed
+        if its contents hash differently. Bank files are mapped again
+        whenever their mtime changes. Blocking; returns the number of
+        files parsed and the number removed."""
+        seen = set()
+        # path -> (mtime, digest, raw contents) of files to parse
+        changed: typing.Dict[str, typing.Tuple[float, str, bytes]] = {}
+        # path -> mtime of bank files to map
+        banks: typing.Dict[str, float] = {}
+        for path in self.content_files():
+            seen.add(path)
+            entry = self.files.get(path)
+            try:
+                mtime = os.stat(path).st_mtime
+                if entry is not None and entry.mtime == mtime:
+                    continue
+                if path.endswith(BANK_EXTENSION):
+                    # banks can be bigger than memory, so they aren't read to hash
+                    banks[path] = mtime
+                    continue
+                with open(path, "rb") as file:
+                    raw = file.read()
+            except FileNotFoundError:
+                # deleted since the directory was listed
+                seen.discard(path)
+                continue
+            except OSError as exc:
+                # e.g. not readable; keep serving the last good version
+                self.errors[path] = f"{exc.__class__.__name__}: {exc}"
+                continue
+            digest = hashlib.sha1(raw).hexdigest()
+            if entry is not None and entry.digest == digest:
+                # touched but not changed
+                entry.mtime = mtime
+                continue
+            changed[path] = mtime, digest, raw
+
+        if self.parse_pool is not None:
+            parses = {
+                path: self.parse_pool.submit(parse_file, path, raw)
+                for path, (_mtime, _digest, raw) in changed.items()
+            }
+        parsed = 0
+        for path, (mtime, digest, raw) in changed.items():
+            try:
+                if self.parse_pool is not None:
+                    items = parses[path].result()
+                else:
+                    items = parse_file(path, raw)
+            except Exception as exc:
+                # keep serving the last good version of the file
+                self.errors[path] = f"{exc.__class__.__name__}: {exc}"
+                continue
+            self.errors.pop(path, None)
+            self.files[path] = _FileEntry(mtime, digest, items)
+            parsed += 1
+        for path, mtime in banks.items():
+            try:
+                items = Bank(path).items
+            except Exception as exc:
+                self.errors[path] = f"{exc.__class__.__name__}: {exc}"
+                continue
+            self.errors.pop(path, None)
+            self.files[path] = _FileEntry(mtime, "", items)
+            parsed += 1
+
+        removed = [path for path in self.files if path not in seen]
+        for path in removed:
+            del self.files[path]
+        for path in [path for path in self.errors if path not in seen]:
+            del self.errors[path]
+        return parsed, len(removed)
+
+    def build_catalogue(self) -> Catalogue:
+        """Assemble a new snapshot from the Python content and every file"""
+        quizzes = {quiz.title: quiz for quiz in self.base_quizzes}
+        tests = {test.title: test for test in self.base_tests}
+        games = {}
+        # sort so that duplicate titles resolve the same way every time
+        for path in sorted(self.files):
+            for item in self.files[path].items:
+                if isinstance(item, Quiz):
+                    quizzes[item.title] = item
+                elif isinstance(item, (AlignmentTest, VectorTest)):
+                    tests[item.title] = item
+                else:
+                    title, game = item
+                    games[title] = game
+        return Catalogue(quizzes, tests, games, self.catalogue.version + 1)
+
+    def load(self) -> Catalogue:
+        """Scan and swap in a new catalogue, blocking. Used at startup"""
+        self.scan()
+        self.catalogue = self.build_catalogue()
+        return self.catalogue
+
+    async def reload(
+        self,
+        quizzes: typing.List[Quiz] = None,
+        tests: typing.List[AlignmentTest] = None,
+    ) -> typing.Tuple[Catalogue, int, int]:
+        """Scan in a worker thread, then swap in the new catalogue. Passing
+        `quizzes` and `tests` replaces the content defined in Python too.
+        Returns the catalogue, files parsed and files removed"""
+        # one scan at a time, as scans share self.files
+        async with self.lock:
+            loop = asyncio.get_event_loop()
+            if quizzes is not None or tests is not None:
+                await loop.run_in_executor(
+                    None,
+                    self.set_base,
+                    self.base_quizzes if quizzes is None else quizzes,
+                    self.base_tests if tests is None else tests,
+                )
+            parsed, removed = await loop.run_in_executor(None, self.scan)
+            catalogue = await loop.run_in_executor(None, self.build_catalogue)
+            # a single reference swap; readers never see a half-built catalogue
+            self.catalogue = catalogue
+            # drop embeds rendered from the old content
+            embed_cache.clear()
+        return catalogue, parsed, removed
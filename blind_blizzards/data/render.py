@@ -0,0 +1,90 @@
+import functools
+import typing
+from collections import OrderedDict
+
+import discord
+
+from .consts import MAGIC_EMBED_COLOUR
+from .typing import Colour
+
+
+def copy_payload(value: typing.Any) -> typing.Any:
+    """Copy an embed payload down to its leaves. `Embed.from_dict` keeps the
+    payload's fields, footer and so on as they are, so an embed made from
+    the cached payload itself would change it for everyone when edited"""
+    if isinstance(value, dict):
+        return {key: copy_payload(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [copy_payload(item) for item in value]
+    return value
+
+
+class EmbedCache:
+    """A bounded LRU cache of serialised embeds.
+
+    Questions and game nodes only have a handful of possible layouts
+    (one per order their options can be shown in), so each is built once
+    and later requests only copy the payload and patch in what changes.
+
+    Parameters
+    ----------
+    max_size: int
+        How many payloads to keep before evicting the least recently used
+    """
+
+    def __init__(self, max_size: int = 4096):
+        self.max_size = max_size
+        self.payloads: typing.MutableMapping[typing.Hashable, dict] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def payload(
+        self, key: typing.Hashable, build: typing.Callable[[], discord.Embed]
+    ) -> dict:
+        """Returns the cached payload for `key`, building it on a miss"""
+        payload = self.payloads.get(key)
+        if payload is not None:
+            self.hits += 1
+            self.payloads.move_to_end(key)
+            return payload
+
+        self.misses += 1
+        payload = self.payloads[key] = build().to_dict()
+        if len(self.payloads) > self.max_size:
+            self.payloads.popitem(last=False)
+        return payload
+
+    def render(
+        self,
+        key: typing.Hashable,
+        build: typing.Callable[[], discord.Embed],
+        **patch: typing.Any,
+    ) -> discord.Embed:
+        """Returns a fresh embed for `key`, with any top-level fields in `patch` replaced"""
+        payload = copy_payload(self.payload(key, build))
+        payload.update(patch)
+        return discord.Embed.from_dict(payload)
+
+    def clear(self):
+        """Forget everything, e.g. because the content was reloaded"""
+        self.payloads.clear()
+
+    def __len__(self) -> int:
+        return len(self.payloads)
+
+
+# shared by every question, node and result screen
+embed_cache = EmbedCache()
+
+
+def cached_by_colour(
+    factory: typing.Callable[[Colour], discord.Embed]
+) -> typing.Callable[[Colour], discord.Embed]:
+    """Decorator for embed factories whose only input is the colour,
+    so each embed is built once per colour rather than once per session"""
+
+    @functools.wraps(factory)
+    def wrapper(colour: Colour = MAGIC_EMBED_COLOUR) -> discord.Embed:
+        return embed_cache.render((factory, colour), lambda: factory(colour))
+
+    return wrapper
@@ -1,5 +1,8 @@
+import asyncio
+import sys
+import time
 import typing
-from random import shuffle
+from array import array
 from discord.ext import commands
 import discord
 from math import floor
@@ -10,11 +13,28 @@ from .consts import (
     OPTION_EMOJI,
     EMOJI_TO_INT,
     CANCEL,
+    ALL_EMOJI,
 )
 from lib.utils import value_map
-from .typing import Colour, Emoji
+from lib.reactions import get_router, ReactionListener
+from lib.edits import get_scheduler
+from lib.sessions import get_session_manager
+from lib.permutations import SessionShuffle
+from lib.sampling import AliasTable, uniform, stratified, weighted
+from lib.results import Result
+from .render import embed_cache, cached_by_colour
+from .compact import (
+    FIELD_CODES,
+    FIELDS_BY_CODE,
+    Record,
+    QuestionTable,
+    intern_all,
+    small_ints,
+)
+from .typing import Colour
 
 
+@cached_by_colour
 def get_cancelled_embed(colour: Colour = MAGIC_EMBED_COLOUR) -> discord.Embed:
     embed = discord.Embed(
         colour=colour, title="Cancelled Quiz", description="Ended the quiz prematurely."
@@ -23,6 +43,7 @@ def get_cancelled_embed(colour: Colour = MAGIC_EMBED_COLOUR) -> discord.Embed:
     return embed
 
 
+@cached_by_colour
 def alignment_cancelled_embed(colour: Colour = MAGIC_EMBED_COLOUR) -> discord.Embed:
     embed = discord.Embed(
         colour=colour,
@@ -33,6 +54,7 @@ def alignment_cancelled_embed(colour: Colour = MAGIC_EMBED_COLOUR) -> discord.Em
     return embed
 
 
+@cached_by_colour
 def game_cancelled_embed(colour: Colour = MAGIC_EMBED_COLOUR) -> discord.Embed:
     embed = discord.Embed(
         colour=colour,
@@ -43,6 +65,7 @@ def game_cancelled_embed(colour: Colour = MAGIC_EMBED_COLOUR) -> discord.Embed:
     return embed
 
 
+@cached_by_colour
 def get_finished_embed(colour: Colour = MAGIC_EMBED_COLOUR) -> discord.Embed:
     embed = discord.Embed(
         colour=colour, title="Finished Quiz", description="The quiz is over."
@@ -51,6 +74,7 @@ def get_finished_embed(colour: Colour = MAGIC_EMBED_COLOUR) -> discord.Embed:
     return embed
 
 
+@cached_by_colour
 def get_alignment_embed(colour: Colour = MAGIC_EMBED_COLOUR) -> discord.Embed:
     embed = discord.Embed(
         colour=colour, title="Finished Alignment Test", description="The test is over."
@@ -59,59 +83,178 @@ def get_alignment_embed(colour: Colour = MAGIC_EMBED_COLOUR) -> discord.Embed:
     return embed
 
 
-def get_check(
+# for shuffling outside of a session
+default_shuffle = SessionShuffle()
+
+
+async def get_session_message(
+    ctx: commands.Context, loading_text: str
+) -> discord.Message:
+    """Get a message carrying the option and cancel reactions for a session.
+    If the bot has a warm message pool, a ready-made one is used"""
+    pool = getattr(ctx.bot, "message_pool", None)
+    msg = pool.claim(ctx.channel) if pool is not None else None
+    if msg is None:
+        # initialise the message
+        msg = await ctx.send(loading_text)
+        # add option reactions, then the cancel reaction
+        for emoji in ALL_EMOJI:
+            await msg.add_reaction(emoji)
+    return msg
+
+
+async def show_question(
     ctx: commands.Context,
     msg: discord.Message,
-    allowed_emoji: typing.List[Emoji] = None,
-) -> typing.Callable[[discord.Reaction, discord.User], bool]:
-    """Generates the check for an option reaction on a message."""
-    if allowed_emoji is None:
-        allowed_emoji = OPTION_EMOJI + [CANCEL]
+    listener: ReactionListener,
+    first: bool,
+    **fields: typing.Any,
+) -> discord.Message:
+    """Edit the session message to show a question, returning the message.
+    A pooled message can be deleted while it waits, so if the first edit
+    finds it gone, the question goes in a new message and `listener`
+    follows it there"""
+    try:
+        await get_scheduler(ctx.bot).submit(msg, **fields)
+    except discord.NotFound:
+        if not first:
+            raise
+        msg = await ctx.send(**fields)
+        listener.move(msg.id)
+        for emoji in ALL_EMOJI:
+            await msg.add_reaction(emoji)
+    return msg
+
+
+async def next_reaction(ctx: commands.Context, listener: ReactionListener) -> str:
+    """Wait for the user's next reaction and return its emoji.
+    If they leave the session idle for too long, it's treated as cancelling"""
+    try:
+        reaction, _ = await listener.wait(get_session_manager(ctx.bot).idle_timeout)
+    except asyncio.TimeoutError:
+        return CANCEL
+    return reaction.emoji
+
+
+def record_first_question(ctx: commands.Context, started: float):
+    """Report how long a session took to show its first question"""
+    pool = getattr(ctx.bot, "message_pool", None)
+    if pool is not None:
+        pool.record_first_question(time.monotonic() - started)
+
+
+def record_result(
+    ctx: commands.Context,
+    kind: str,
+    title: str,
+    score: typing.Any,
+    answers: typing.List[dict],
+    started: float,
+    session: SessionShuffle,
+    length: int = None,
+    sampling: str = None,
+):
+    """Save a session's result and update the leaderboards and answer
+    stats, if the bot keeps them. A score of None means the session was cancelled.
+    `length` and `sampling` are for quizzes that only asked some of their questions"""
+    store = getattr(ctx.bot, "result_store", None)
+    boards = getattr(ctx.bot, "leaderboards", None)
+    stats = getattr(ctx.bot, "answer_stats", None)
+    # when running as one shard of several, the launcher saves and ranks
+    registry = getattr(ctx.bot, "registry", None)
+    if store is None and boards is None and stats is None and registry is None:
+        return
+    result = Result(
+        kind,
+        title,
+        ctx.author.id,
+        ctx.guild.id if ctx.guild is not None else None,
+        "cancelled" if score is None else "finished",
+        score,
+        answers,
+        time.monotonic() - started,
+        session.seed,
+        time.time(),
+        length,
+        sampling,
+    )
+    if store is not None:
+        store.record(result)
+    if boards is not None:
+        boards.add(result)
+    if stats is not None:
+        stats.add(result)
+    if registry is not None:
+        registry.record(result)
+
+
+class Question(Record):
+    """What every kind of question has: its text and its options' texts"""
+
+    __slots__ = ("text", "labels")
+
+    def __setstate__(self, state: tuple):
+        super().__setstate__(state)
+        # unpickled strings are new copies, e.g. when parsed in another process
+        object.__setattr__(self, "labels", intern_all(self.labels))
+
+    def shuffled_order(self, session: SessionShuffle = None) -> typing.Tuple[int, ...]:
+        """Returns a random order to show the options in, as option indexes"""
+        return (session or default_shuffle).order(len(self.labels))
+
+    def build_embed(
+        self, order: typing.Tuple[int, ...], colour: Colour = MAGIC_EMBED_COLOUR
+    ) -> discord.Embed:
+        """Builds the embed for this question with its options in `order`"""
+        # make a basic embed, honouring the customisation settings
+        embed = discord.Embed(colour=colour, description=self.text)
+        embed.set_thumbnail(url=EMBED_THUMBNAIL)
+
+        # for each option, add a field
+        for emoji, index in zip(OPTION_EMOJI, order):
+            embed.add_field(name=emoji, value=self.labels[index])
 
-    def check(reaction: discord.Reaction, user: discord.User):
-        valid_emoji = reaction.emoji in allowed_emoji
-        valid_user = user == ctx.author
-        # for some reason these aren't equating properly
-        valid_message = reaction.message.id == msg.id
-        return all([valid_emoji, valid_user, valid_message])
+        # tell the user what's going on
+        embed.set_footer(
+            text=f"React with your choice to answer, or with {CANCEL} to end:"
+        )
 
-    return check
+        return embed
 
 
-class QuizQuestion:
+class QuizQuestion(Question):
     """Structure used for holding multiple-choice quiz questions"""
 
+    __slots__ = ("correct", "tag")
+
     def __init__(
         self,
         question_text: str,
-        options: typing.Tuple[str, str, str, str, str],
+        options: typing.Sequence[str],
         correct_option_index: int,
+        # e.g. a topic or difficulty; stratified quizzes ask each tag's
+        # questions in proportion to how many it has
+        tag: str = "",
     ):
-        self.text: str = question_text
-        self.options: typing.Tuple[str, str, str, str, str] = options
-        self.correct: int = correct_option_index
+        self._set(
+            text=question_text,
+            labels=intern_all(options),
+            correct=correct_option_index,
+            tag=sys.intern(tag),
+        )
+
+    @property
+    def options(self) -> typing.Tuple[str, ...]:
+        return self.labels
 
     async def prepare_question(
-        self
-    ) -> typing.Tuple[str, typing.Tuple[str, str, str, str, str], int]:
+        self, session: SessionShuffle = None
+    ) -> typing.Tuple[str, typing.List[str], int]:
         """Called when generating a question during a quiz"""
-        # copy self.options and add index items
-        options = [[index, item] for index, item in enumerate(self.options)]
-
-        # shuffle it the mathematically best number of times
-        for _ in range(7):
-            shuffle(options)
-
-        # figure out which item is correct now
-        correct = [
-            index for index, item in enumerate(options) if item[0] == self.correct
-        ][0]
-
-        # strip the indexes from the options
-        options = [item for index, item in options]
+        order = self.shuffled_order(session)
 
         # return the question, shuffled options, and correct answer
-        return self.text, options, correct
+        return self.text, [self.labels[i] for i in order], order.index(self.correct)
 
     async def prepare_question_with_embed(
         self,
@@ -119,271 +262,525 @@ class QuizQuestion:
         question: int,
         max_question: int,
         colour: Colour = MAGIC_EMBED_COLOUR,
+        session: SessionShuffle = None,
     ) -> typing.Tuple[discord.Embed, int]:
         """Called immediately before display during a quiz, for formatting.
         Quizzes can customise the colour of the embed using the `colour` parameter"""
         # get question data
-        text, options, correct = await self.prepare_question()
+        order = self.shuffled_order(session)
 
-        # make a basic embed, honouring the customisation settings
-        embed = discord.Embed(
-            colour=colour,
+        # there are only so many orders, so each embed is built once and
+        # just gets its title patched in
+        embed = embed_cache.render(
+            (self, order, colour),
+            lambda: self.build_embed(order, colour),
             title=f"{quiz_name} - question {question} of {max_question}",
-            description=text,
         )
-        embed.set_thumbnail(url=EMBED_THUMBNAIL)
 
-        # for each option, add a field
-        for emoji, option in zip(OPTION_EMOJI, options):
-            embed.add_field(name=emoji, value=option)
-
-        # tell the user what's going on
-        embed.set_footer(
-            text=f"React with your choice to answer, or with {CANCEL} to end:"
+        # return the embed and correct answer
+        return embed, order.index(self.correct)
+
+
+class QuizTable(QuestionTable):
+    """A quiz's questions, stored by column (see QuestionTable)"""
+
+    def __init__(self, questions: typing.Iterable[QuizQuestion] = ()):
+        # which option is right, per question
+        self.correct = array("B")
+        # each question's tag, as an index into tag_names
+        self.tags = array("H")
+        self.tag_names: typing.List[str] = []
+        # tag -> the indexes of its questions, for stratified sampling
+        self.strata: typing.Dict[str, typing.Sequence[int]] = {}
+        super().__init__(questions)
+
+    def make(self, index: int) -> QuizQuestion:
+        return QuizQuestion._make(
+            self.texts[index],
+            self.question_labels(index),
+            self.correct[index],
+            self.tag_names[self.tags[index]],
         )
 
-        # return the embed and correct answer
-        return embed, correct
+    def append(self, question: QuizQuestion):
+        stratum = self.strata.get(question.tag)
+        if stratum is None:
+            stratum = self.strata[question.tag] = array("I")
+            self.tag_names.append(question.tag)
+        stratum.append(len(self))
+        # there are only ever a few tags
+        self.tags.append(self.tag_names.index(question.tag))
+        super().append(question)
+        self.correct.append(question.correct)
 
 
 class Quiz:
     """Structure used for holding multiple choice quizzes"""
 
+    __slots__ = ("title", "questions", "colour", "tags")
+
     def __init__(
         self,
         title: str,
-        questions: typing.List[QuizQuestion],
+        questions: typing.Iterable[QuizQuestion],
         colour: Colour = MAGIC_EMBED_COLOUR,
+        # for finding it in listings
+        tags: typing.Iterable[str] = (),
     ):
         self.title: str = title
-        self.questions: typing.List[QuizQuestion] = questions
+        if not isinstance(questions, QuizTable):
+            questions = QuizTable(questions)
+        self.questions = questions
         self.colour = colour
+        self.tags: typing.FrozenSet[str] = frozenset(tags)
 
     def add_questions(self, *questions: QuizQuestion):
         """Used to add additional questions after a Quiz has been created"""
         self.questions.extend(questions)
 
-    async def do_quiz(self, ctx: commands.Context):
-        """Run a quiz, including all Discord interaction"""
-        # as we're not mutating the objects, there's no need for a deepcopy.
-        # we *are* shuffling, though, hence the shallow copy.
-        # we could, in theory, omit the copy and just shuffle it;
-        # but that would cause problems if the same quiz is played under
-        # multiple instances. </p>
-        quiz_questions: typing.List[QuizQuestion] = self.questions.copy()
-
-        # shuffle it the mathematically best number of times
-        for _ in range(7):
-            shuffle(quiz_questions)
+    def pick_questions(
+        self,
+        session: SessionShuffle,
+        length: int = None,
+        sampling: str = "uniform",
+        weights: AliasTable = None,
+    ) -> typing.Sized:
+        """The indexes of the questions to ask, in order: all of them, or
+        `length` picked by `sampling` (one of lib.sampling.SAMPLINGS).
+        Weighted sampling needs the quiz's `weights`. Takes O(length) time
+        and memory, however many questions there are"""
+        count = len(self.questions)
+        if length is None or length >= count:
+            # a lazy shuffle of question indexes, so the question list
+            # (which other sessions share) is never copied or modified
+            return session.sequence(count)
+        if sampling == "stratified":
+            return stratified(self.questions.strata, length, session.random)
+        if sampling == "weighted" and weights is not None:
+            return weighted(weights, length, session.random)
+        return uniform(count, length, session.random)
+
+    async def do_quiz(
+        self,
+        ctx: commands.Context,
+        seed: int = None,
+        length: int = None,
+        sampling: str = "uniform",
+        weights: AliasTable = None,
+    ):
+        """Run a quiz, including all Discord interaction.
+        Passing the `seed` of an earlier session (and the `length` and
+        `sampling` saved with its result) replays its question and option
+        order. Weights aren't saved, so a weighted session only replays
+        exactly while the quiz's answer stats are as they were.
+        See pick_questions for the rest"""
+        # all of this session's randomness comes from one seed
+        session = SessionShuffle(seed)
+        question_order = self.pick_questions(session, length, sampling, weights)
 
         # set data for this run
         score = 0
-        max_question = len(quiz_questions)
-        # initialise the message
-        msg: discord.Message = await ctx.send("Loading quiz...")
-        # add option reactions
-        for emoji in OPTION_EMOJI:
-            await msg.add_reaction(emoji)
-        # add cancel reaction
-        await msg.add_reaction(CANCEL)
-
-        # get check now to avoid redefining each loop
-        check = get_check(ctx, msg)
-
-        # main quiz loop
-        for number, question in enumerate(quiz_questions, 1):
-            # retrieve the question data
-            embed, answer = await question.prepare_question_with_embed(
-                self.title, number, max_question, self.colour
-            )
-
-            # ask the question
-            await msg.edit(
-                content=f"{ctx.author.nick or ctx.author.name}'s score: {score}",
-                embed=embed,
-            )
-
-            # wait for user response
-            reaction, _ = await ctx.bot.wait_for("reaction_add", check=check)
-
-            # if the user cancels
-            if reaction.emoji == CANCEL:
-                await msg.edit(embed=get_cancelled_embed(colour=self.colour))
-                return
-
-            # if they got the question right
-            if EMOJI_TO_INT[reaction.emoji] == answer:
-                score += 1
+        answers = []
+        max_question = len(question_order)
+        # saved with the result, to replay it and keep it off the leaderboards
+        if max_question < len(self.questions):
+            picked = {"length": max_question, "sampling": sampling}
+        else:
+            picked = {}
+        # initialise the message, reactions and all
+        started = time.monotonic()
+        edits = get_scheduler(ctx.bot)
+        msg = await get_session_message(ctx, "Loading quiz...")
+
+        # subscribe to the author's reactions on this message
+        with get_router(ctx.bot).listen(msg.id, ctx.author.id, ALL_EMOJI) as listener:
+            # main quiz loop
+            for number, index in enumerate(question_order, 1):
+                question = self.questions[index]
+
+                # retrieve the question data
+                embed, answer = await question.prepare_question_with_embed(
+                    self.title, number, max_question, self.colour, session
+                )
+
+                # ask the question
+                msg = await show_question(
+                    ctx,
+                    msg,
+                    listener,
+                    number == 1,
+                    content=f"{ctx.author.nick or ctx.author.name}'s score: {score}",
+                    embed=embed,
+                )
+                if number == 1:
+                    record_first_question(ctx, started)
+                asked = time.monotonic()
+
+                # wait for user response
+                emoji = await next_reaction(ctx, listener)
+
+                # if the user cancels (or has gone away)
+                if emoji == CANCEL:
+                    await edits.submit(
+                        msg, embed=get_cancelled_embed(colour=self.colour)
+                    )
+                    record_result(
+                        ctx,
+                        "quiz",
+                        self.title,
+                        None,
+                        answers,
+                        started,
+                        session,
+                        **picked,
+                    )
+                    return
+
+                # if they got the question right
+                correct = EMOJI_TO_INT[emoji] == answer
+                if correct:
+                    score += 1
+                answers.append(
+                    {
+                        "question": index,
+                        "correct": correct,
+                        "seconds": time.monotonic() - asked,
+                    }
+                )
 
         # at the end of the quiz
-        await msg.edit(
+        await edits.submit(
+            msg,
             content=f"Final score for {ctx.author.nick or ctx.author.name}: {score}",
             embed=get_finished_embed(colour=self.colour),
         )
+        record_result(
+            ctx, "quiz", self.title, score, answers, started, session, **picked
+        )
 
 
-class AlignmentQuestion:
-    """Structure used for holding multiple-choice alignment test questions"""
+class AlignmentQuestion(Question):
+    """Structure used for holding multiple-choice alignment test questions.
+
+    Each option moves the user's score along one axis (or neither); the
+    axes and amounts are kept in small arrays, one entry per option."""
+
+    __slots__ = ("fields", "shifts")
 
     def __init__(
         self,
         question_text: str,
-        options: typing.Tuple[
-            typing.Tuple[str, AlignmentField, int],
-            typing.Tuple[str, AlignmentField, int],
-            typing.Tuple[str, AlignmentField, int],
-            typing.Tuple[str, AlignmentField, int],
-            typing.Tuple[str, AlignmentField, int],
-        ],
+        options: typing.Sequence[typing.Tuple[str, AlignmentField, int]],
     ):
-        self.text: str = question_text
-        self.options: typing.Tuple[
-            typing.Tuple[str, AlignmentField, int],
-            typing.Tuple[str, AlignmentField, int],
-            typing.Tuple[str, AlignmentField, int],
-            typing.Tuple[str, AlignmentField, int],
-            typing.Tuple[str, AlignmentField, int],
-        ] = options
+        self._set(
+            text=question_text,
+            labels=intern_all(text for text, _field, _shift in options),
+            fields=array("b", (FIELD_CODES[field] for _text, field, _shift in options)),
+            shifts=small_ints(
+                "b", (shift for _text, _field, shift in options), "alignment shifts"
+            ),
+        )
+
+    @property
+    def options(self) -> typing.List[typing.Tuple[str, AlignmentField, int]]:
+        """The options as they were given: (text, field, increment)"""
+        return [
+            (label, FIELDS_BY_CODE[field], shift)
+            for label, field, shift in zip(self.labels, self.fields, self.shifts)
+        ]
+
+    def answer_key(
+        self, order: typing.Tuple[int, ...]
+    ) -> typing.List[typing.Tuple[AlignmentField, int]]:
+        """The (field, increment) of each option, in `order`"""
+        return [(FIELDS_BY_CODE[self.fields[i]], self.shifts[i]) for i in order]
 
     async def prepare_question(
-        self
-    ) -> typing.Tuple[
-        str,
-        typing.Tuple[
-            typing.Tuple[str, AlignmentField, int],
-            typing.Tuple[str, AlignmentField, int],
-            typing.Tuple[str, AlignmentField, int],
-            typing.Tuple[str, AlignmentField, int],
-            typing.Tuple[str, AlignmentField, int],
-        ],
-    ]:
+        self, session: SessionShuffle = None
+    ) -> typing.Tuple[str, typing.List[typing.Tuple[str, AlignmentField, int]]]:
         """Called when generating a question during an alignment test"""
-        # copy self.options
-        options = self.options.copy()
-        # shuffle it the mathematically best number of times
-        for _ in range(7):
-            shuffle(options)
+        order = self.shuffled_order(session)
+        options = self.options
         # return the question and shuffled options
-        return self.text, options
+        return self.text, [options[i] for i in order]
 
     async def prepare_question_with_embed(
-        self, colour: Colour = MAGIC_EMBED_COLOUR
-    ) -> typing.Tuple[discord.Embed, int]:
+        self, colour: Colour = MAGIC_EMBED_COLOUR, session: SessionShuffle = None
+    ) -> typing.Tuple[discord.Embed, typing.List[typing.Tuple[AlignmentField, int]]]:
         """Called immediately before display during a quiz, for formatting.
         Quizzes can customise the colour of the embed using the `colour` parameter"""
         # get question data
-        text, options = await self.prepare_question()
+        order = self.shuffled_order(session)
 
-        # make a basic embed, honouring the customisation settings
-        embed = discord.Embed(colour=colour, description=text)
-        embed.set_thumbnail(url=EMBED_THUMBNAIL)
+        # there are only so many orders, so each embed is only built once
+        embed = embed_cache.render(
+            (self, order, colour), lambda: self.build_embed(order, colour)
+        )
 
-        # for each option, add a field
-        for emoji, option in zip(OPTION_EMOJI, options):
-            embed.add_field(name=emoji, value=option[0])
+        # return the embed and alignment data
+        return embed, self.answer_key(order)
 
-        # tell the user what's going on
-        embed.set_footer(
-            text=f"React with your choice to answer, or with {CANCEL} to end:"
+
+class AlignmentTable(QuestionTable):
+    """An alignment test's questions, stored by column (see QuestionTable)"""
+
+    def __init__(self, questions: typing.Iterable[AlignmentQuestion] = ()):
+        # the field code and increment of every option
+        self.fields = array("b")
+        self.shifts = array("b")
+        super().__init__(questions)
+
+    def make(self, index: int) -> AlignmentQuestion:
+        start, end = self.span(index)
+        return AlignmentQuestion._make(
+            self.texts[index],
+            self.question_labels(index),
+            self.fields[start:end],
+            self.shifts[start:end],
         )
 
-        # return the embed and alignment data
-        return embed, [option[1:] for option in options]
+    def append(self, question: AlignmentQuestion):
+        super().append(question)
+        self.fields.extend(question.fields)
+        self.shifts.extend(question.shifts)
 
 
 class AlignmentTest:
-    """Structure used for holding multiple choice alignment tests"""
+    """Structure used for holding multiple choice alignment tests.
+
+    Before it's run, a test is compiled: the range of scores each axis can
+    reach is worked out from the questions' options, checked, and turned
+    into a table from score to row/column of `alignment_table`, so working
+    out an alignment is two lookups"""
+
+    __slots__ = (
+        "title",
+        "questions",
+        "alignment_table",
+        "declared_x",
+        "declared_y",
+        "x",
+        "y",
+        "colour",
+        "images",
+        "tags",
+        "columns",
+        "rows",
+    )
 
     def __init__(
         self,
         title: str,
-        questions: typing.List[AlignmentQuestion],
+        questions: typing.Iterable[AlignmentQuestion],
         alignment_table: typing.Tuple[
             typing.Tuple[str, str, str],
             typing.Tuple[str, str, str],
             typing.Tuple[str, str, str],
         ],
-        # This should be symmetric i.e. all scores within 0 ± max_x_displacement
-        max_x_displacement: int,
-        # This should be symmetric i.e. all scores within 0 ± max_y_displacement
-        max_y_displacement: int,
+        # All scores are within 0 ± max_x_displacement. Worked out from the
+        # questions if not given; if given, it's checked against them
+        max_x_displacement: int = None,
+        # All scores are within 0 ± max_y_displacement, as above
+        max_y_displacement: int = None,
         colour: Colour = MAGIC_EMBED_COLOUR,
         as_images: bool = False,
+        # for finding it in listings
+        tags: typing.Iterable[str] = (),
     ):
         self.title: str = title
-        self.questions: typing.List[AlignmentQuestion] = questions
+        if not isinstance(questions, AlignmentTable):
+            questions = AlignmentTable(questions)
+        self.questions = questions
         self.alignment_table = alignment_table
+        self.declared_x = max_x_displacement
+        self.declared_y = max_y_displacement
         self.x = max_x_displacement
         self.y = max_y_displacement
         self.colour = colour
         self.images = as_images
+        self.tags: typing.FrozenSet[str] = frozenset(tags)
+        # score + displacement -> table column/row; filled in by compile
+        self.columns: typing.Optional[array] = None
+        self.rows: typing.Optional[array] = None
 
     def add_questions(self, *questions: AlignmentQuestion):
         """Used to add additional questions after an AlignmentTest has been created"""
         self.questions.extend(questions)
+        # the score ranges may have changed
+        self.columns = self.rows = None
+
+    def displacement(self, field: AlignmentField) -> typing.Tuple[int, int]:
+        """The lowest and highest total score the questions allow on one axis"""
+        code = FIELD_CODES[field]
+        fields, shifts = self.questions.fields, self.questions.shifts
+        low = high = 0
+        for index in range(len(self.questions)):
+            start, end = self.questions.span(index)
+            # options for the other axis (or neither) leave this one alone
+            moves = [
+                shifts[option] if fields[option] == code else 0
+                for option in range(start, end)
+            ]
+            low += min(moves)
+            high += max(moves)
+        return low, high
+
+    @staticmethod
+    def bins(displacement: int, cells: int) -> array:
+        """Which of `cells` equal bins each score in ±`displacement` falls into"""
+        return array(
+            "B",
+            (
+                floor(value_map(score, -displacement, displacement + 1, 0, cells))
+                for score in range(-displacement, displacement + 1)
+            ),
+        )
 
-    async def do_test(self, ctx: commands.Context):
-        """Run an alignment test, including all Discord interaction"""
-        # as we're not mutating the objects, there's no need for a deepcopy.
-        # we *are* shuffling, though, hence the shallow copy.
-        # we could, in theory, omit the copy and just shuffle it;
-        # but that would cause problems if the same quiz is played under
-        # multiple instances. </p>
-        quiz_questions: typing.List[AlignmentQuestion] = self.questions.copy()
-
-        # shuffle it the mathematically best number of times
-        for _ in range(7):
-            shuffle(quiz_questions)
+    def compile(self, check: bool = True) -> "AlignmentTest":
+        """Check the test and build its score lookup tables.
+        Raises ValueError if the test can't be scored properly.
+        With `check` off, the declared displacements are trusted rather than
+        worked out from every question, e.g. for a test from a bank file,
+        which was checked when the bank was compiled"""
+        if (
+            not self.alignment_table
+            or len({len(row) for row in self.alignment_table}) != 1
+        ):
+            raise ValueError(f"{self.title!r}: the alignment table must be rectangular")
+
+        displacements = []
+        for name, field, declared in (
+            ("x", AlignmentField.X, self.declared_x),
+            ("y", AlignmentField.Y, self.declared_y),
+        ):
+            if not check:
+                displacements.append(declared)
+                continue
+            low, high = self.displacement(field)
+            # the middle of the table is meant to be neutral
+            if low != -high:
+                raise ValueError(
+                    f"{self.title!r}: {name} scores can range from {low} to {high},"
+                    " which isn't symmetric about 0"
+                )
+            if declared is not None and declared != high:
+                raise ValueError(
+                    f"{self.title!r}: max_{name}_displacement is {declared},"
+                    f" but the answers can reach ±{high}"
+                )
+            displacements.append(high)
+
+        self.x, self.y = displacements
+        self.columns = self.bins(self.x, len(self.alignment_table[0]))
+        self.rows = self.bins(self.y, len(self.alignment_table))
+        return self
+
+    def alignment(self, x: int, y: int) -> str:
+        """The cell of the alignment table for a final score"""
+        if self.columns is None:
+            self.compile()
+        return self.alignment_table[self.rows[y + self.y]][self.columns[x + self.x]]
+
+    def rescore(
+        self, answer_sets: typing.Iterable[typing.List[dict]]
+    ) -> typing.List[str]:
+        """Work out the alignments for many saved sets of answers at once,
+        e.g. the `answers` of stored results, after the table was changed"""
+        if self.columns is None:
+            self.compile()
+        table, rows, columns = self.alignment_table, self.rows, self.columns
+        alignments = []
+        for answers in answer_sets:
+            totals = {"X": self.x, "Y": self.y, "NONE": 0}
+            for answer in answers:
+                totals[answer["field"]] += answer["shift"]
+            alignments.append(table[rows[totals["Y"]]][columns[totals["X"]]])
+        return alignments
+
+    async def do_test(self, ctx: commands.Context, seed: int = None):
+        """Run an alignment test, including all Discord interaction.
+        Passing the `seed` of an earlier session replays its question and option order"""
+        # make sure we can score it before the user starts answering
+        if self.columns is None:
+            self.compile()
+
+        # all of this session's randomness comes from one seed
+        session = SessionShuffle(seed)
+
+        # a lazy shuffle of question indexes, so the question list
+        # (which other sessions share) is never copied or modified
+        question_order = session.sequence(len(self.questions))
 
         # set data for this run
         x = y = 0
-        max_question = len(quiz_questions)
-        # initialise the message
-        msg: discord.Message = await ctx.send("Loading alignment test...")
-        # add option reactions
-        for emoji in OPTION_EMOJI:
-            await msg.add_reaction(emoji)
-        # add cancel reaction
-        await msg.add_reaction(CANCEL)
-
-        # get check now to avoid redefining each loop
-        check = get_check(ctx, msg)
-
-        # main quiz loop
-        for number, question in enumerate(quiz_questions, 1):
-            # retrieve the question data
-            embed, answer_key = await question.prepare_question_with_embed(self.colour)
-
-            # ask the question
-            await msg.edit(
-                content=f"[{self.title}] Question {number} of {max_question}",
-                embed=embed,
-            )
-
-            # wait for user response
-            reaction, _ = await ctx.bot.wait_for("reaction_add", check=check)
-
-            # if the user cancels
-            if reaction.emoji == CANCEL:
-                await msg.edit(embed=alignment_cancelled_embed(colour=self.colour))
-                return
-
-            # get the chosen answer in [field, increment] form
-            # some increments will be negative, indicated a downward shift
-            # in that alignment
-            answer = answer_key[EMOJI_TO_INT[reaction.emoji]]
-            if answer[0] == AlignmentField.X:
-                x += answer[1]
-            elif answer[0] == AlignmentField.Y:
-                y += answer[1]
+        answers = []
+        max_question = len(self.questions)
+        # initialise the message, reactions and all
+        started = time.monotonic()
+        edits = get_scheduler(ctx.bot)
+        msg = await get_session_message(ctx, "Loading alignment test...")
+
+        # subscribe to the author's reactions on this message
+        with get_router(ctx.bot).listen(msg.id, ctx.author.id, ALL_EMOJI) as listener:
+            # main quiz loop
+            for number, index in enumerate(question_order, 1):
+                question = self.questions[index]
+
+                # retrieve the question data
+                embed, answer_key = await question.prepare_question_with_embed(
+                    self.colour, session
+                )
+
+                # ask the question
+                msg = await show_question(
+                    ctx,
+                    msg,
+                    listener,
+                    number == 1,
+                    content=f"[{self.title}] Question {number} of {max_question}",
+                    embed=embed,
+                )
+                if number == 1:
+                    record_first_question(ctx, started)
+                asked = time.monotonic()
+
+                # wait for user response
+                emoji = await next_reaction(ctx, listener)
+
+                # if the user cancels (or has gone away)
+                if emoji == CANCEL:
+                    await edits.submit(
+                        msg, embed=alignment_cancelled_embed(colour=self.colour)
+                    )
+                    record_result(
+                        ctx, "test", self.title, None, answers, started, session
+                    )
+                    return
+
+                # get the chosen answer in [field, increment] form
+                # some increments will be negative, indicated a downward shift
+                # in that alignment
+                answer = answer_key[EMOJI_TO_INT[emoji]]
+                if answer[0] == AlignmentField.X:
+                    x += answer[1]
+                elif answer[0] == AlignmentField.Y:
+                    y += answer[1]
+                answers.append(
+                    {
+                        "question": index,
+                        "field": answer[0].name,
+                        "shift": answer[1],
+                        "seconds": time.monotonic() - asked,
+                    }
+                )
 
         # at the end of the quiz
-        alignment = self.alignment_table[
-            floor(value_map(y, -self.y, self.y + 1, 0, 3))
-        ][floor(value_map(x, -self.x, self.x + 1, 0, 3))]
+        alignment = self.alignment(x, y)
+        record_result(ctx, "test", self.title, alignment, answers, started, session)
         user = ctx.author.nick or ctx.author.name
         if not self.images:
-            await msg.edit(
+            await edits.submit(
+                msg,
                 content=f"Alignment for {user}: {alignment}",
                 embed=get_alignment_embed(colour=self.colour),
             )
@@ -391,15 +788,19 @@ class AlignmentTest:
             embed = discord.Embed(colour=self.colour)
             embed.set_thumbnail(url=EMBED_THUMBNAIL)
             embed.set_image(url=alignment)
-            await msg.edit(content=f"Alignment for {user}:", embed=embed)
+            await edits.submit(msg, content=f"Alignment for {user}:", embed=embed)
 
 
 class GameNode:
+    """Structure used for holding a choice in a game; its children are the options"""
+
+    __slots__ = ("as_option", "text", "children", "colour")
+
     def __init__(
         self,
         short_text: str,
         long_text: str,
-        children: typing.List[GameNode],
+        children: typing.List["GameNode"],
         colour: Colour = MAGIC_EMBED_COLOUR,
     ):
         self.as_option = short_text
@@ -407,96 +808,23 @@ class GameNode:
         self.children = children
         self.colour = colour
 
-    def to_embed(self, shuffled_children):
-        """Returns the embed for this node"""
-        # make the embed object
-        embed = discord.Embed(colour=self.colour, description=self.text)
-
-        # add fields for each child
-        for emoji, child in zip(OPTION_EMOJI, shuffled_children):
-            embed.add_field(name=emoji, value=child.as_option)
-
-        # set standard embed data - thumbnail and footer
-        embed.set_thumbnail(url=EMBED_THUMBNAIL)
-        embed.set_footer(text=f"Select your choice below, or quit with {CANCEL}:")
-
-        # send back the embed
-        return embed
-
-    async def get_next_node(self):
-        """Performs the Discord logic of retrieving the next node"""
-        # generate the check for the node's response
-
-        # the little zip hack shortens the list of emoji so that it is the same
-        # length as our list of children
-        # N.B. there might be a better way of doing this
-        check = get_check(
-            self.ctx,
-            self.message,
-            [emoji for emoji, child in zip(OPTION_EMOJI, self.children)] + [CANCEL],
-        )
-
-        # copy our children
-        shuffled_children = self.children.copy()
-
-        # shuffle them the mathematically best number of times
-        for _ in range(7):
-            shuffle(shuffled_children)
-
-        # edit the message with our embed
-        await self.message.edit(embed=self.to_embed(shuffled_children))
-
-        # wait for user response
-        reaction, _ = await self.ctx.bot.wait_for("reaction_add", check=check)
-
-        # if the user cancels
-        if reaction.emoji == CANCEL:
-            await self.message.edit(embed=game_cancelled_embed(colour=self.colour))
-            # tell the node we don't want to continue
-            return -1
-
-        # tell the node which option we picked
-        return EMOJI_TO_INT[reaction.emoji]
+    def compile(self) -> "CompiledGame":
+        """Flatten the game starting at this node into a CompiledGame"""
+        return CompiledGame.from_root(self)
 
     async def run_this_node(
-        self,
-        ctx: commands.Context = None,
-        message: discord.Message = None,
-        is_first: bool = False,
+        self, ctx: commands.Context, message: discord.Message = None
     ):
         """Run the node, playing the rest of the game"""
-        # initialise self.ctx from ctx and self.message from message
-        # N.B. if this node is first then message is None
-        self.ctx = ctx
-        self.message = message
-
-        # if this is the first node, initialise the discord data:
-        if is_first:
-            # send our message, with dummy text for now
-            self.message = await ctx.send("Loading game...")
-
-            # add our reactions
-            for emoji in OPTION_EMOJI + [CANCEL]:
-                await self.message.add_reaction(emoji)
+        # the engine is iterative, so long or looping games don't grow the stack
+        await self.compile().run(ctx, message)
 
-            # we've finished setup (reacting takes a while), so
-            # clear the dummy text with a zero width space
-            await self.message.edit(content="\u200b")
 
-        # get the next node
-        next_node = await self.get_next_node()
-
-        # user cancelled
-        if next_node == -1:
-            return
-
-        # get next node
-        child = self.children[next_node]
-        # run it
-        await child.run_this_node(ctx, message)
+class EndNode(GameNode):
+    """Structure used for holding the end of a game"""
 
+    __slots__ = ("is_image",)
 
-class EndNode(GameNode):
     def __init__(
         self,
         short_text: str,
@@ -511,21 +839,225 @@ class EndNode(GameNode):
         self.children = children
         self.colour = colour
 
-    async def run_this_node(self, ctx: commands.Context, message: discord.Message):
-        """As this is the last node, all that is left is to show the embed."""
+
+class CompiledGame:
+    """A game graph flattened into a table of nodes.
+
+    Node IDs are indexes into the parallel lists, and node 0 is the start.
+    The children of node `i` are `child_ids[child_offsets[i]:child_offsets[i + 1]]`.
+    Nodes reachable along several paths (or in a loop) are stored once."""
+
+    __slots__ = (
+        "as_option",
+        "text",
+        "colour",
+        "is_end",
+        "is_image",
+        "child_offsets",
+        "child_ids",
+        "tags",
+    )
+
+    def __init__(
+        self,
+        as_option: typing.List[str],
+        text: typing.List[str],
+        colour: typing.List[Colour],
+        is_end: array,
+        is_image: array,
+        child_offsets: array,
+        child_ids: array,
+    ):
+        # for finding it in listings; set from the content file
+        self.tags: typing.FrozenSet[str] = frozenset()
+        self.as_option = as_option
+        self.text = text
+        self.colour = colour
+        self.is_end = is_end
+        self.is_image = is_image
+        self.child_offsets = child_offsets
+        self.child_ids = child_ids
+
+    @classmethod
+    def from_root(cls, root: GameNode) -> "CompiledGame":
+        """Number every node reachable from `root` and build the tables"""
+        # map object identity to node ID; nodes doubles as the BFS queue
+        ids = {id(root): 0}
+        nodes = [root]
+        child_offsets = array("I", [0])
+        child_ids = array("I")
+
+        position = 0
+        while position < len(nodes):
+            node = nodes[position]
+            position += 1
+
+            # end nodes have no choices, whatever their children say
+            if not isinstance(node, EndNode):
+                if not node.children:
+                    raise ValueError(f"Game node {node.as_option!r} has no children")
+                if len(node.children) > len(OPTION_EMOJI):
+                    raise ValueError(
+                        f"Game node {node.as_option!r} has more than "
+                        f"{len(OPTION_EMOJI)} children"
+                    )
+
+                for child in node.children:
+                    # only number each node once, so cycles terminate
+                    if id(child) not in ids:
+                        ids[id(child)] = len(nodes)
+                        nodes.append(child)
+                    child_ids.append(ids[id(child)])
+
+            child_offsets.append(len(child_ids))
+
+        return cls(
+            # options like "Yes" and "Go back" come up again and again
+            list(intern_all(node.as_option for node in nodes)),
+            [node.text for node in nodes],
+            [node.colour for node in nodes],
+            array("B", (isinstance(node, EndNode) for node in nodes)),
+            array("B", (getattr(node, "is_image", False) for node in nodes)),
+            child_offsets,
+            child_ids,
+        )
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def children(self, node: int) -> array:
+        """Returns the IDs of a node's children"""
+        start, end = self.child_offsets[node], self.child_offsets[node + 1]
+        return self.child_ids[start:end]
+
+    def to_embed(self, node: int, order: typing.Tuple[int, ...]) -> discord.Embed:
+        """Returns the embed for a choice node, built once per order of children"""
+        return embed_cache.render(
+            (self, node, order), lambda: self.build_embed(node, order)
+        )
+
+    def build_embed(self, node: int, order: typing.Tuple[int, ...]) -> discord.Embed:
+        """Builds the embed for a choice node, showing its children in `order`"""
+        # make the embed object
+        embed = discord.Embed(colour=self.colour[node], description=self.text[node])
+
+        # add fields for each child
+        children = self.children(node)
+        for emoji, index in zip(OPTION_EMOJI, order):
+            embed.add_field(name=emoji, value=self.as_option[children[index]])
+
+        # set standard embed data - thumbnail and footer
+        embed.set_thumbnail(url=EMBED_THUMBNAIL)
+        embed.set_footer(text=f"Select your choice below, or quit with {CANCEL}:")
+
+        # send back the embed
+        return embed
+
+    def end_embed(self, node: int) -> discord.Embed:
+        """Returns the embed for an end node, which is only ever built once"""
+        return embed_cache.render((self, node), lambda: self.build_end_embed(node))
+
+    def build_end_embed(self, node: int) -> discord.Embed:
+        """Builds the embed for an end node"""
         # generate embed
-        if not self.is_image:
+        if not self.is_image[node]:
             # it's not an image, generate in one statement
             embed = discord.Embed(
-                colour=self.colour, description=self.text, title="The game is now over"
+                colour=self.colour[node],
+                description=self.text[node],
+                title="The game is now over",
             )
         else:
             # it's an image, need two statements
-            embed = discord.Embed(colour=self.colour, title="The game is now over")
-            embed.set_image(url=self.text)
+            embed = discord.Embed(
+                colour=self.colour[node], title="The game is now over"
+            )
+            embed.set_image(url=self.text[node])
 
         # set standard embed data - thumbnail
         embed.set_thumbnail(url=EMBED_THUMBNAIL)
+        return embed
 
-        # edit onto the message
-        await message.edit(embed=embed)
+    async def run(
+        self,
+        ctx: commands.Context,
+        message: discord.Message = None,
+        seed: int = None,
+        title: str = None,
+    ):
+        """Play the game, including all Discord interaction.
+        Passing the `seed` of an earlier session replays its option order.
+        The `title` is what results are saved under; by default it's the
+        root node's option text.
+
+        The only state carried between steps is the current node ID,
+        so memory use doesn't depend on how long the game goes on for"""
+        # all of this session's randomness comes from one seed
+        session = SessionShuffle(seed)
+
+        # if we weren't given a message, initialise the discord data:
+        edits = get_scheduler(ctx.bot)
+        began = time.monotonic()
+        started = None
+        if message is None:
+            started = began
+            message = await get_session_message(ctx, "Loading game...")
+
+        title = title or self.as_option[0]
+        answers = []
+        node = 0
+        with get_router(ctx.bot).listen(
+            message.id, ctx.author.id, ALL_EMOJI
+        ) as listener:
+            while not self.is_end[node]:
+                # pick an order to show our children in
+                children = self.children(node)
+                order = session.order(len(children))
+
+                # edit the message with our embed, clearing the loading text
+                # with a zero width space
+                message = await show_question(
+                    ctx,
+                    message,
+                    listener,
+                    started is not None,
+                    content="\u200b",
+                    embed=self.to_embed(node, order),
+                )
+                if started is not None:
+                    record_first_question(ctx, started)
+                    started = None
+                asked = time.monotonic()
+
+                # wait for a response naming one of this node's children
+                next_node = None
+                while next_node is None:
+                    emoji = await next_reaction(ctx, listener)
+
+                    # if the user cancels (or has gone away)
+                    if emoji == CANCEL:
+                        await edits.submit(
+                            message,
+                            embed=game_cancelled_embed(colour=self.colour[node]),
+                        )
+                        record_result(ctx, "game", title, None, answers, began, session)
+                        return
+
+                    # this node may have fewer than five children
+                    choice = EMOJI_TO_INT[emoji]
+                    if choice < len(order):
+                        next_node = children[order[choice]]
+
+                # move on to the chosen node
+                answers.append(
+                    {
+                        "node": node,
+                        "choice": next_node,
+                        "seconds": time.monotonic() - asked,
+                    }
+                )
+                node = next_node
+
+        # as this is the last node, all that is left is to show the embed
+        await edits.submit(message, embed=self.end_embed(node))
+        record_result(ctx, "game", title, node, answers, began, session)
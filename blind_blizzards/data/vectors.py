@@ -0,0 +1,299 @@
+import itertools
+import time
+import typing
+from array import array
+
+import discord
+from discord.ext import commands
+
+from .consts import EMBED_THUMBNAIL, MAGIC_EMBED_COLOUR, EMOJI_TO_INT, CANCEL, ALL_EMOJI
+from .render import embed_cache
+from .compact import intern_all
+from .structs import (
+    Question,
+    alignment_cancelled_embed,
+    get_alignment_embed,
+    get_session_message,
+    show_question,
+    next_reaction,
+    record_first_question,
+    record_result,
+)
+from .typing import Colour
+from lib.edits import get_scheduler
+from lib.nearest import NearestPoint, numpy
+from lib.permutations import SessionShuffle
+from lib.reactions import get_router
+
+
+class VectorQuestion(Question):
+    """A question for a VectorTest; each option moves the user along any
+    number of axes at once, given as one displacement per axis.
+
+    The displacements are kept in one flat array, option after option"""
+
+    __slots__ = ("dimensions", "shifts")
+
+    def __init__(
+        self,
+        question_text: str,
+        options: typing.Sequence[typing.Tuple[str, typing.Sequence[float]]],
+    ):
+        dimensions = {len(shift) for _text, shift in options}
+        if len(dimensions) > 1:
+            raise ValueError(
+                f"{question_text!r}: every option needs the same number of displacements"
+            )
+        self._set(
+            text=question_text,
+            labels=intern_all(text for text, _shift in options),
+            dimensions=dimensions.pop() if dimensions else 0,
+            shifts=array("d", (value for _text, shift in options for value in shift)),
+        )
+
+    @property
+    def options(self) -> typing.List[typing.Tuple[str, typing.Tuple[float, ...]]]:
+        """The options as they were given: (text, displacements)"""
+        values = iter(self.shifts)
+        return [
+            (label, tuple(itertools.islice(values, self.dimensions)))
+            for label in self.labels
+        ]
+
+    async def prepare_question_with_embed(
+        self, colour: Colour = MAGIC_EMBED_COLOUR, session: SessionShuffle = None
+    ) -> typing.Tuple[discord.Embed, typing.Tuple[int, ...]]:
+        """Called immediately before display during a test.
+        Returns the embed and the order the options are shown in"""
+        order = self.shuffled_order(session)
+        embed = embed_cache.render(
+            (self, order, colour), lambda: self.build_embed(order, colour)
+        )
+        return embed, order
+
+
+class VectorTest:
+    """An alignment test with any number of axes.
+
+    Each result is an archetype with a centroid: the user gets whichever
+    archetype is nearest to where their answers put them. Positions (and
+    centroids) are measured in reaches: on each axis, ±1 is the furthest
+    any set of answers can go.
+
+    Compiling stacks every option's displacement into one array, so a set
+    of answers is scored by indexing it and summing, and many sets can be
+    scored at once."""
+
+    __slots__ = (
+        "title",
+        "axes",
+        "questions",
+        "archetypes",
+        "colour",
+        "images",
+        "tags",
+        "table",
+        "offsets",
+        "reach",
+        "names",
+        "nearest",
+    )
+
+    def __init__(
+        self,
+        title: str,
+        axes: typing.List[str],
+        questions: typing.List[VectorQuestion],
+        # archetype name (or image URL) -> centroid
+        archetypes: typing.Dict[str, typing.Sequence[float]],
+        colour: Colour = MAGIC_EMBED_COLOUR,
+        as_images: bool = False,
+        # for finding it in listings
+        tags: typing.Iterable[str] = (),
+    ):
+        if numpy is None:
+            raise RuntimeError("vector alignment tests need numpy")
+        self.title: str = title
+        self.axes = axes
+        self.questions: typing.List[VectorQuestion] = questions
+        self.archetypes = archetypes
+        self.colour = colour
+        self.images = as_images
+        self.tags: typing.FrozenSet[str] = frozenset(tags)
+        # filled in by compile
+        self.table: typing.Optional[numpy.ndarray] = None
+        self.offsets: typing.Optional[numpy.ndarray] = None
+        self.reach: typing.Optional[numpy.ndarray] = None
+        self.names: typing.List[str] = []
+        self.nearest: typing.Optional[NearestPoint] = None
+
+    def add_questions(self, *questions: VectorQuestion):
+        """Used to add additional questions after a VectorTest has been created"""
+        self.questions.extend(questions)
+        self.table = None
+
+    def compile(self) -> "VectorTest":
+        """Check the test and build its scoring arrays.
+        Raises ValueError if the test can't be scored properly"""
+        dimensions = len(self.axes)
+        if not self.archetypes:
+            raise ValueError(f"{self.title!r}: there are no archetypes")
+
+        rows = []
+        offsets = []
+        # where the next question's options start in the table
+        total = 0
+        low = numpy.zeros(dimensions)
+        high = numpy.zeros(dimensions)
+        for number, question in enumerate(self.questions, 1):
+            if question.dimensions != dimensions:
+                raise ValueError(
+                    f"{self.title!r}: every option of question {number} needs"
+                    f" {dimensions} displacements, one per axis"
+                )
+            shifts = numpy.frombuffer(question.shifts, dtype=float).reshape(
+                len(question.labels), dimensions
+            )
+            offsets.append(total)
+            rows.append(shifts)
+            total += len(shifts)
+            low += shifts.min(axis=0)
+            high += shifts.max(axis=0)
+
+        centroids = numpy.array(list(self.archetypes.values()), dtype=float)
+        if centroids.shape != (len(self.archetypes), dimensions):
+            raise ValueError(
+                f"{self.title!r}: every archetype needs {dimensions} coordinates"
+            )
+
+        # one row per option, then a row of zeros to pad short answer sets with
+        rows.append(numpy.zeros((1, dimensions)))
+        self.table = numpy.concatenate(rows)
+        self.offsets = numpy.array(offsets, dtype=numpy.intp)
+        # axes nothing moves along are left as they are
+        reach = numpy.maximum(abs(low), abs(high))
+        self.reach = numpy.where(reach > 0, reach, 1.0)
+        self.names = list(self.archetypes)
+        self.nearest = NearestPoint(centroids)
+        return self
+
+    def option_index(self, question: int, option: int) -> int:
+        """Where an option's displacement is in the table"""
+        return int(self.offsets[question]) + option
+
+    def classify(self, indexes: "numpy.ndarray") -> "numpy.ndarray":
+        """Score many answer sets at once. `indexes` is a (sets, answers)
+        array of table rows (see `option_index`), padded with -1 (the row
+        of zeros); returns the index of each set's archetype in `names`"""
+        if self.table is None:
+            self.compile()
+        positions = self.table[indexes].sum(axis=1) / self.reach
+        return self.nearest.nearest(positions)
+
+    def archetype(self, indexes: typing.Sequence[int]) -> str:
+        """The archetype for one set of answers, as table rows"""
+        return self.names[self.classify(numpy.array([indexes], dtype=numpy.intp))[0]]
+
+    def rescore(
+        self, answer_sets: typing.Iterable[typing.List[dict]]
+    ) -> typing.List[str]:
+        """Work out the archetypes for many saved sets of answers at once,
+        e.g. the `answers` of stored results, after the test was changed"""
+        if self.table is None:
+            self.compile()
+        answer_sets = list(answer_sets)
+        width = max((len(answers) for answers in answer_sets), default=0)
+        indexes = numpy.full((len(answer_sets), width), -1, dtype=numpy.intp)
+        for row, answers in zip(indexes, answer_sets):
+            count = len(answers)
+            row[:count] = [
+                self.option_index(answer["question"], answer["option"])
+                for answer in answers
+            ]
+        return [self.names[found] for found in self.classify(indexes)]
+
+    async def do_test(self, ctx: commands.Context, seed: int = None):
+        """Run the test, including all Discord interaction.
+        Passing the `seed` of an earlier session replays its question and option order"""
+        # make sure we can score it before the user starts answering
+        if self.table is None:
+            self.compile()
+
+        # all of this session's randomness comes from one seed
+        session = SessionShuffle(seed)
+        question_order = session.sequence(len(self.questions))
+
+        # set data for this run
+        chosen = []
+        answers = []
+        max_question = len(self.questions)
+        # initialise the message, reactions and all
+        started = time.monotonic()
+        edits = get_scheduler(ctx.bot)
+        msg = await get_session_message(ctx, "Loading alignment test...")
+
+        # subscribe to the author's reactions on this message
+        with get_router(ctx.bot).listen(msg.id, ctx.author.id, ALL_EMOJI) as listener:
+            for number, index in enumerate(question_order, 1):
+                question = self.questions[index]
+                embed, order = await question.prepare_question_with_embed(
+                    self.colour, session
+                )
+
+                # ask the question
+                msg = await show_question(
+                    ctx,
+                    msg,
+                    listener,
+                    number == 1,
+                    content=f"[{self.title}] Question {number} of {max_question}",
+                    embed=embed,
+                )
+                if number == 1:
+                    record_first_question(ctx, started)
+                asked = time.monotonic()
+
+                # wait for a response naming one of this question's options
+                option = None
+                while option is None:
+                    emoji = await next_reaction(ctx, listener)
+
+                    # if the user cancels (or has gone away)
+                    if emoji == CANCEL:
+                        await edits.submit(
+                            msg, embed=alignment_cancelled_embed(colour=self.colour)
+                        )
+                        record_result(
+                            ctx, "test", self.title, None, answers, started, session
+                        )
+                        return
+
+                    # this question may have fewer than five options
+                    choice = EMOJI_TO_INT[emoji]
+                    if choice < len(order):
+                        option = order[choice]
+
+                chosen.append(self.option_index(index, option))
+                answers.append(
+                    {
+                        "question": index,
+                        "option": option,
+                        "seconds": time.monotonic() - asked,
+                    }
+                )
+
+        # at the end of the test
+        alignment = self.archetype(chosen)
+        record_result(ctx, "test", self.title, alignment, answers, started, session)
+        user = ctx.author.nick or ctx.author.name
+        if not self.images:
+            await edits.submit(
+                msg,
+                content=f"Alignment for {user}: {alignment}",
+                embed=get_alignment_embed(colour=self.colour),
+            )
+        else:
+            embed = discord.Embed(colour=self.colour)
+            embed.set_thumbnail(url=EMBED_THUMBNAIL)
+            embed.set_image(url=alignment)
+            await edits.submit(msg, content=f"Alignment for {user}:", embed=embed)
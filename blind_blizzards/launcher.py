@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+"""Runs the bot as several shards, each in its own process.
+
+The launcher runs the registry every shard shares (session limits,
+results and leaderboards, see lib.registry) and restarts shards that
+crash (see lib.shards). To try it without connecting to Discord:
+
+    python launcher.py --shards 4 --fake-gateway --duration 20 --crash-after 5
+"""
+
+import argparse
+import asyncio
+import signal
+import sys
+
+import config
+
+from lib.leaderboards import Leaderboards
+from lib.registry import RegistryServer
+from lib.results import ResultStore
+from lib.sessions import SessionManager
+from lib.shards import ShardSupervisor
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the bot as several shards")
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=getattr(config, "SHARD_COUNT", 2),
+        help="how many shard processes to run",
+    )
+    parser.add_argument(
+        "--registry",
+        default=getattr(config, "REGISTRY_ADDRESS", "registry.sock"),
+        help="where the shared registry listens: a socket path, or host:port",
+    )
+    parser.add_argument(
+        "--fake-gateway",
+        action="store_true",
+        help="have the shards run made-up sessions instead of connecting to Discord",
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        default=60.0,
+        help="with --fake-gateway, how many seconds the shards run for",
+    )
+    parser.add_argument(
+        "--crash-after",
+        type=float,
+        help="with --fake-gateway, have shard 0 crash once, after this many seconds",
+    )
+    return parser.parse_args()
+
+
+def shard_command(args: argparse.Namespace, shard_id: int, restarts: int) -> list:
+    command = [
+        sys.executable,
+        "bot.py",
+        "--shard-id",
+        str(shard_id),
+        "--shard-count",
+        str(args.shards),
+        "--registry",
+        args.registry,
+    ]
+    if args.fake_gateway:
+        command += ["--fake-gateway", "--duration", str(args.duration)]
+        if args.crash_after is not None and shard_id == 0 and not restarts:
+            command += ["--crash-after", str(args.crash_after)]
+    return command
+
+
+async def launch(args: argparse.Namespace):
+    # the same limits the cog applies when it runs on its own
+    sessions = SessionManager(
+        idle_timeout=getattr(config, "SESSION_IDLE_TIMEOUT", 300.0),
+        per_user=getattr(config, "MAX_SESSIONS_PER_USER", 2),
+        per_guild=getattr(config, "MAX_SESSIONS_PER_GUILD", 50),
+        total=getattr(config, "MAX_SESSIONS", 1000),
+        queue_timeout=getattr(config, "SESSION_QUEUE_TIMEOUT", 10.0),
+    )
+    store = None
+    leaderboards = Leaderboards()
+    results_path = getattr(config, "RESULTS_DATABASE", "results.sqlite3")
+    if results_path:
+        store = ResultStore(results_path, getattr(config, "RESULTS_BATCH_SIZE", 500))
+        await store.start()
+        await leaderboards.load(results_path)
+
+    server = RegistryServer(args.registry, sessions, store, leaderboards)
+    await server.start()
+
+    supervisor = ShardSupervisor(
+        lambda shard_id, restarts: shard_command(args, shard_id, restarts), args.shards
+    )
+    loop = asyncio.get_event_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(
+                signal_number, lambda: asyncio.ensure_future(supervisor.stop())
+            )
+        except NotImplementedError:
+            # Windows; Ctrl+C still reaches the shards directly
+            pass
+
+    try:
+        await supervisor.run()
+    finally:
+        await supervisor.stop()
+        await server.close()
+        counts = sessions.counts()
+        restarts = sum(supervisor.restarts.values())
+        print(
+            f"{restarts} shard restart(s), {counts['total']} session(s) still claimed"
+        )
+        if store is not None:
+            await store.close()
+            stats = store.stats()
+            print(
+                f"{stats['written']} results saved, {stats['dropped']} dropped;"
+                f" {len(leaderboards.boards)} leaderboards"
+            )
+
+
+def main():
+    asyncio.run(launch(parse_arguments()))
+
+
+if __name__ == "__main__":
+    main()
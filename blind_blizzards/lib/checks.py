@@ -11,3 +11,16 @@ async def check(ctx):
 # discord check version of the above
 def _check():
     return commands.check(check)
+
+
+# what decides which commands someone can use, so that help pages built for one
+# person can be shown to anyone else with the same class. This covers our own
+# check, the bot owner check, and anything based on permissions or roles. The
+# channel is included as well, for checks on the channel itself (like NSFW)
+async def permission_class(ctx) -> tuple:
+    owner = await ctx.bot.is_owner(ctx.author)
+    if ctx.guild is None:
+        return None, None, None, owner, await check(ctx)
+    permissions = ctx.channel.permissions_for(ctx.author).value
+    roles = tuple(sorted(role.id for role in ctx.author.roles))
+    return ctx.channel.id, roles, permissions, owner, await check(ctx)
@@ -0,0 +1,241 @@
+import asyncio
+import collections
+import itertools
+import json
+import sys
+import traceback
+import typing
+
+import discord
+
+# edit priorities; lower goes first
+# answer feedback and new questions, which the user is waiting on
+FEEDBACK = 0
+# anything that's fine to show a little later, like a page flip
+COSMETIC = 1
+
+# the coroutine that actually makes an edit: (message, fields) -> None
+Sender = typing.Callable[[discord.Message, dict], typing.Awaitable[None]]
+
+
+def serialise(fields: dict) -> dict:
+    """Snapshot the fields as they'll be sent, so edits can be compared.
+    Embeds become JSON, as `to_dict` shares lists with the (mutable) embed"""
+    serialised = dict(fields)
+    if serialised.get("content") is not None:
+        serialised["content"] = str(serialised["content"])
+    if serialised.get("embed") is not None:
+        serialised["embed"] = json.dumps(serialised["embed"].to_dict(), sort_keys=True)
+    return serialised
+
+
+async def send_edit(message: discord.Message, fields: dict):
+    """The default Sender: a plain `Message.edit`"""
+    await message.edit(**fields)
+
+
+class _PendingEdit:
+    """The latest state requested for one message, not yet sent"""
+
+    __slots__ = ("message", "fields", "priority", "order", "waiters")
+
+    def __init__(self, message: discord.Message, priority: int, order: int):
+        self.message = message
+        self.fields: dict = {}
+        self.priority = priority
+        self.order = order
+        self.waiters: typing.List[asyncio.Future] = []
+
+
+class EditScheduler:
+    """Coalesces and orders edits to session messages.
+
+    Each channel sends one edit at a time (Discord rate limits edits per
+    channel, and discord.py waits out any 429 inside the edit). While an
+    edit is in flight, later edits to the same message are merged into
+    one, keeping only the latest value of each field. Edits that wouldn't
+    change what was last sent are skipped, and FEEDBACK edits go before
+    COSMETIC ones. In channels where feedback edits are being made,
+    COSMETIC edits are also spaced out, so they never use up the channel's
+    rate limit and leave feedback waiting on a 429; elsewhere they're sent
+    straight away.
+
+    Parameters
+    ----------
+    send: Sender
+        How to make an edit; replace it to run against a fake client
+    remember: int
+        How many messages' last-sent payloads to keep for no-op detection
+    cosmetic_interval: float
+        The least time in seconds between COSMETIC edits in a busy channel.
+        Discord allows 5 edits per 5 seconds, so the default leaves most of
+        those for feedback
+    busy_window: float
+        How many seconds after a FEEDBACK edit its channel counts as busy
+    """
+
+    def __init__(
+        self,
+        send: Sender = send_edit,
+        remember: int = 10_000,
+        cosmetic_interval: float = 2.5,
+        busy_window: float = 5.0,
+    ):
+        self.send = send
+        self.remember = remember
+        self.cosmetic_interval = cosmetic_interval
+        self.busy_window = busy_window
+        # channel ID -> message ID -> pending edit
+        self.pending: typing.Dict[int, typing.Dict[int, _PendingEdit]] = {}
+        self.workers: typing.Dict[int, asyncio.Task] = {}
+        # channel ID -> set when a FEEDBACK edit arrives
+        self.wakeups: typing.Dict[int, asyncio.Event] = {}
+        # channel ID -> when the next COSMETIC edit may be sent
+        self.cosmetic_after: typing.Dict[int, float] = {}
+        # channel ID -> until when it counts as busy with feedback, soonest first
+        self.busy_until: typing.MutableMapping[int, float] = collections.OrderedDict()
+        # message ID -> the serialised fields it was last edited to
+        self.sent: typing.MutableMapping[int, dict] = collections.OrderedDict()
+        self.counter = itertools.count()
+
+        self.submitted = 0
+        self.merged = 0
+        self.skipped = 0
+        self.made = 0
+
+    def submit(
+        self, message: discord.Message, priority: int = FEEDBACK, **fields: typing.Any
+    ) -> asyncio.Future:
+        """Queue an edit. Returns a future that completes once the message
+        shows these fields (or a later state), which callers may await or not"""
+        self.submitted += 1
+        channel = self.pending.setdefault(message.channel.id, {})
+        pending = channel.get(message.id)
+        if pending is None:
+            pending = channel[message.id] = _PendingEdit(
+                message, priority, next(self.counter)
+            )
+        else:
+            self.merged += 1
+            pending.priority = min(pending.priority, priority)
+        pending.fields.update(fields)
+
+        waiter = asyncio.get_event_loop().create_future()
+        pending.waiters.append(waiter)
+
+        if message.channel.id not in self.workers:
+            self.workers[message.channel.id] = asyncio.ensure_future(
+                self.work(message.channel.id)
+            )
+        elif priority == FEEDBACK and message.channel.id in self.wakeups:
+            # the worker may be holding back a cosmetic edit
+            self.wakeups[message.channel.id].set()
+        return waiter
+
+    def depth(self) -> int:
+        """How many messages have edits waiting to be sent"""
+        return sum(len(channel) for channel in self.pending.values())
+
+    async def work(self, channel_id: int):
+        """Send a channel's edits one at a time until none are left"""
+        loop = asyncio.get_event_loop()
+        channel = self.pending[channel_id]
+        wakeup = self.wakeups[channel_id] = asyncio.Event()
+        try:
+            while channel:
+                # most urgent first, then oldest first
+                pending = min(
+                    channel.values(), key=lambda edit: (edit.priority, edit.order)
+                )
+
+                busy = loop.time() < self.busy_until.get(channel_id, 0.0)
+                if pending.priority == COSMETIC and busy:
+                    delay = self.cosmetic_after.get(channel_id, 0.0) - loop.time()
+                    if delay > 0:
+                        # hold it back, unless something more urgent turns up
+                        wakeup.clear()
+                        try:
+                            await asyncio.wait_for(wakeup.wait(), delay)
+                        except asyncio.TimeoutError:
+                            pass
+                        continue
+                    self.cosmetic_after[channel_id] = (
+                        loop.time() + self.cosmetic_interval
+                    )
+                elif pending.priority == FEEDBACK:
+                    self.mark_busy(channel_id, loop.time())
+
+                del channel[pending.message.id]
+                await self.make(pending)
+        except asyncio.CancelledError:
+            # nothing will send the rest, so don't leave anyone waiting on them
+            for pending in channel.values():
+                for waiter in pending.waiters:
+                    waiter.cancel()
+            channel.clear()
+            raise
+        finally:
+            del self.workers[channel_id]
+            del self.wakeups[channel_id]
+            if not channel:
+                del self.pending[channel_id]
+                self.cosmetic_after.pop(channel_id, None)
+
+    def mark_busy(self, channel_id: int, now: float):
+        """Count the channel as busy with feedback for the next `busy_window`"""
+        self.busy_until[channel_id] = now + self.busy_window
+        self.busy_until.move_to_end(channel_id)
+        # forget channels that have gone quiet
+        while next(iter(self.busy_until.values())) <= now:
+            self.busy_until.popitem(last=False)
+
+    async def make(self, pending: _PendingEdit):
+        """Send one (merged) edit, unless it wouldn't change anything"""
+        payload = serialise(pending.fields)
+        last = self.sent.get(pending.message.id, {})
+        changed = {
+            field: pending.fields[field]
+            for field, value in payload.items()
+            if field not in last or last[field] != value
+        }
+        try:
+            if changed:
+                await self.send(pending.message, changed)
+                self.made += 1
+            else:
+                self.skipped += 1
+        except asyncio.CancelledError:
+            for waiter in pending.waiters:
+                waiter.cancel()
+            raise
+        except Exception as exc:
+            for waiter in pending.waiters:
+                if not waiter.done():
+                    waiter.set_exception(exc)
+            return
+
+        self.sent[pending.message.id] = {**last, **payload}
+        self.sent.move_to_end(pending.message.id)
+        if len(self.sent) > self.remember:
+            self.sent.popitem(last=False)
+        for waiter in pending.waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+
+def report_failure(waiter: asyncio.Future):
+    """A done callback for edits nobody awaits, so a failed one is logged
+    rather than left as an exception that was never retrieved"""
+    if waiter.cancelled() or waiter.exception() is None:
+        return
+    error = waiter.exception()
+    print("Ignoring exception in an edit nobody waited for:", file=sys.stderr)
+    traceback.print_exception(type(error), error, error.__traceback__, file=sys.stderr)
+
+
+def get_scheduler(bot) -> EditScheduler:
+    """Get the bot's edit scheduler, creating it on first use"""
+    scheduler = getattr(bot, "edit_scheduler", None)
+    if scheduler is None:
+        scheduler = bot.edit_scheduler = EditScheduler()
+    return scheduler
@@ -0,0 +1,115 @@
+import asyncio
+import collections
+import os
+import random
+import time
+import typing
+from types import SimpleNamespace
+
+from discord.ext import commands
+
+from data.structs import record_result
+from lib.permutations import SessionShuffle
+from lib.sessions import SessionLimitReached, get_session_manager
+
+
+def shard_guilds(shard_id: int, shard_count: int, count: int) -> typing.List[int]:
+    """`count` guild IDs that Discord would send to this shard"""
+    # Discord puts a guild on shard (guild_id >> 22) % shard_count
+    return [(number * shard_count + shard_id) << 22 for number in range(count)]
+
+
+async def fake_session(
+    bot: commands.Bot,
+    rng: random.Random,
+    user_id: int,
+    guild_id: int,
+    length: float,
+    tally: typing.Counter[str],
+):
+    """One made-up quiz: claim a session, 'play' for a while, record a score"""
+    ctx = SimpleNamespace(
+        bot=bot, author=SimpleNamespace(id=user_id), guild=SimpleNamespace(id=guild_id)
+    )
+    try:
+        async with get_session_manager(bot).session(ctx, "quiz"):
+            tally["started"] += 1
+            started = time.monotonic()
+            await asyncio.sleep(rng.expovariate(1 / length))
+            record_result(
+                ctx,
+                "quiz",
+                "Fake quiz",
+                rng.randrange(11),
+                [],
+                started,
+                SessionShuffle(rng.getrandbits(64)),
+            )
+            tally["finished"] += 1
+    except SessionLimitReached:
+        tally["refused"] += 1
+
+
+async def run(
+    bot: commands.Bot,
+    shard_id: int,
+    shard_count: int,
+    duration: float = 60.0,
+    crash_after: float = None,
+    rate: float = 100.0,
+    users: int = 200,
+    guilds: int = 50,
+    length: float = 2.0,
+    report_every: float = 5.0,
+):
+    """Stand in for the Discord gateway: start made-up quiz sessions at
+    `rate` per second, from `users` users (shared by every shard) in this
+    shard's `guilds` guilds, for `duration` seconds.
+
+    Sessions go through the bot's session manager and results through
+    `record_result`, so with a registry this exercises the shared limits,
+    results and leaderboards without connecting to Discord. If
+    `crash_after` is given, the process dies without cleaning up after
+    that many seconds, as a crashing shard would."""
+    rng = random.Random(shard_id)
+    guild_ids = shard_guilds(shard_id, shard_count, guilds)
+    tally: typing.Counter[str] = collections.Counter()
+    tasks: typing.Set[asyncio.Task] = set()
+
+    started = time.monotonic()
+    reported = started
+    while time.monotonic() - started < duration:
+        await asyncio.sleep(rng.expovariate(rate))
+        now = time.monotonic()
+        if crash_after is not None and now - started >= crash_after:
+            print(f"shard {shard_id}: crashing on purpose", flush=True)
+            os._exit(1)
+        if now - reported >= report_every:
+            reported = now
+            print(
+                f"shard {shard_id}: {tally['started']} started,"
+                f" {tally['finished']} finished, {tally['refused']} refused,"
+                f" {len(tasks)} running",
+                flush=True,
+            )
+        task = asyncio.ensure_future(
+            fake_session(
+                bot,
+                rng,
+                rng.randrange(1, users + 1),
+                rng.choice(guild_ids),
+                length,
+                tally,
+            )
+        )
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    # let the sessions that are running finish
+    if tasks:
+        await asyncio.wait(tasks)
+    print(
+        f"shard {shard_id}: done; {tally['started']} started,"
+        f" {tally['finished']} finished, {tally['refused']} refused",
+        flush=True,
+    )
@@ -0,0 +1,214 @@
+import asyncio
+import bisect
+import itertools
+import sqlite3
+import typing
+
+from .results import Result, upgrade
+
+# (-score, when it was first reached, user ID); sorting these puts the
+# best score first, and the first person to reach a score ahead of anyone
+# who matched it later
+Entry = typing.Tuple[float, float, int]
+
+# quiz title, guild ID (None for the overall board)
+BoardKey = typing.Tuple[str, typing.Optional[int]]
+
+LOAD_QUERY = """
+SELECT title, guild_id, user_id, CAST(score AS REAL), finished
+FROM results
+WHERE kind = 'quiz' AND outcome = 'finished' AND length IS NULL
+"""
+
+
+def board_keys(title: str, guild_id: typing.Optional[int]) -> typing.List[BoardKey]:
+    """The boards a result counts towards: overall, and its guild's if it has one"""
+    if guild_id is None:
+        return [(title, None)]
+    return [(title, None), (title, guild_id)]
+
+
+class Board:
+    """Everyone's best score on one board, kept sorted.
+
+    The entries are kept in a list of sorted buckets of up to 2 * LOAD
+    entries, with each bucket's last entry in `maxes`. Finding an entry
+    is a binary search over `maxes` then over one bucket, and moving a
+    user only shifts one bucket, so updates stay cheap however many users
+    there are. A user's rank also counts the buckets before theirs, which
+    is a handful of `len` calls for millions of users."""
+
+    __slots__ = ("buckets", "maxes", "best")
+
+    LOAD = 512
+
+    def __init__(self, entries: typing.List[Entry] = ()):
+        # `entries` must already be sorted
+        self.buckets: typing.List[typing.List[Entry]] = []
+        for start in range(0, len(entries), self.LOAD):
+            end = start + self.LOAD
+            self.buckets.append(entries[start:end])
+        self.maxes: typing.List[Entry] = [bucket[-1] for bucket in self.buckets]
+        # user ID -> their entry
+        self.best: typing.Dict[int, Entry] = {entry[2]: entry for entry in entries}
+
+    def __len__(self) -> int:
+        return len(self.best)
+
+    def add(self, user_id: int, score: float, when: float) -> bool:
+        """Record an attempt. Returns whether it was the user's new best"""
+        entry = (-score, when, user_id)
+        old = self.best.get(user_id)
+        if old is not None:
+            if old <= entry:
+                return False
+            self.remove(old)
+        self.insert(entry)
+        self.best[user_id] = entry
+        return True
+
+    def remove(self, entry: Entry):
+        index = bisect.bisect_left(self.maxes, entry)
+        bucket = self.buckets[index]
+        del bucket[bisect.bisect_left(bucket, entry)]
+        if bucket:
+            self.maxes[index] = bucket[-1]
+        else:
+            del self.buckets[index]
+            del self.maxes[index]
+
+    def insert(self, entry: Entry):
+        if not self.buckets:
+            self.buckets.append([entry])
+            self.maxes.append(entry)
+            return
+        # past the end goes into the last bucket
+        index = min(bisect.bisect_left(self.maxes, entry), len(self.maxes) - 1)
+        bucket = self.buckets[index]
+        bisect.insort(bucket, entry)
+        self.maxes[index] = bucket[-1]
+        if len(bucket) > 2 * self.LOAD:
+            # split it in half
+            load = self.LOAD
+            half = bucket[load:]
+            del bucket[load:]
+            self.buckets.insert(index + 1, half)
+            self.maxes.insert(index, bucket[-1])
+
+    def top(self, count: int = 10) -> typing.List[typing.Tuple[int, float]]:
+        """The best `count` users and their scores, best first"""
+        entries = itertools.islice(itertools.chain.from_iterable(self.buckets), count)
+        return [(user_id, -score) for score, _, user_id in entries]
+
+    def rank(self, user_id: int) -> typing.Optional[typing.Tuple[int, float]]:
+        """The user's place (from 1) and best score, or None if they haven't played"""
+        entry = self.best.get(user_id)
+        if entry is None:
+            return None
+        index = bisect.bisect_left(self.maxes, entry)
+        before = sum(len(self.buckets[i]) for i in range(index))
+        return before + bisect.bisect_left(self.buckets[index], entry) + 1, -entry[0]
+
+
+def read_best(path: str, batch_size: int = 10_000) -> typing.Dict[BoardKey, dict]:
+    """Stream finished quiz results out of the database, keeping only each
+    user's best entry per board. Runs on a worker thread"""
+    best: typing.Dict[BoardKey, typing.Dict[int, Entry]] = {}
+    # (title, guild ID) -> the boards its results count towards
+    targets: typing.Dict[BoardKey, typing.List[typing.Dict[int, Entry]]] = {}
+    connection = sqlite3.connect(path)
+    try:
+        # this may run before the result store has added the length column
+        upgrade(connection)
+        cursor = connection.execute(LOAD_QUERY)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for title, guild_id, user_id, score, finished in rows:
+                entry = (-score, finished, user_id)
+                boards = targets.get((title, guild_id))
+                if boards is None:
+                    boards = targets[title, guild_id] = [
+                        best.setdefault(key, {}) for key in board_keys(title, guild_id)
+                    ]
+                for board in boards:
+                    old = board.get(user_id)
+                    if old is None or entry < old:
+                        board[user_id] = entry
+    except sqlite3.OperationalError:
+        # no results table yet
+        pass
+    finally:
+        connection.close()
+    return best
+
+
+class Leaderboards:
+    """Best quiz scores per quiz, overall and per guild. Only runs through
+    the whole quiz count, as a score from a sample of its questions (see
+    lib.sampling) isn't comparable.
+
+    Boards are rebuilt from the results database in the background at
+    startup, then kept up to date as quizzes finish. Results that finish
+    while the load is running are applied once it's done; adding a result
+    twice is harmless, as only bests are kept."""
+
+    def __init__(self):
+        self.boards: typing.Dict[BoardKey, Board] = {}
+        self.loading = False
+        self.backlog: typing.List[Result] = []
+
+    def add(self, result: Result):
+        """Update the boards with a result, if it's a finished run of a whole quiz"""
+        if (
+            result.kind != "quiz"
+            or result.outcome != "finished"
+            or result.length is not None
+        ):
+            return
+        if self.loading:
+            self.backlog.append(result)
+            return
+        for key in board_keys(result.title, result.guild_id):
+            board = self.boards.get(key)
+            if board is None:
+                board = self.boards[key] = Board()
+            board.add(result.user_id, result.score, result.finished)
+
+    async def load(self, path: str):
+        """Rebuild every board from the results database"""
+        self.loading = True
+        try:
+            best = await asyncio.get_event_loop().run_in_executor(None, read_best, path)
+            # sorting everything once beats inserting one at a time
+            self.boards = {
+                key: Board(sorted(entries.values())) for key, entries in best.items()
+            }
+        finally:
+            self.loading = False
+            backlog, self.backlog = self.backlog, []
+            for result in backlog:
+                self.add(result)
+
+    def board(self, title: str, guild_id: int = None) -> Board:
+        """The board for a quiz, in a guild or overall"""
+        return self.boards.get((title, guild_id)) or Board()
+
+    def standings(
+        self, title: str, guild_id: typing.Optional[int], user_id: int, count: int = 10
+    ) -> dict:
+        """The top of a quiz's board, and where a user stands on it and
+        overall, as plain lists so it can be sent between processes.
+        `places` has a `[where, rank, of, score]` for each board they're on"""
+        board = self.board(title, guild_id)
+        boards = [("overall", self.board(title))]
+        # in DMs, "here" is everywhere
+        if guild_id is not None:
+            boards.insert(0, ("here", board))
+        places = []
+        for where, this_board in boards:
+            rank = this_board.rank(user_id)
+            if rank is not None:
+                places.append([where, rank[0], len(this_board), rank[1]])
+        return {"top": [list(entry) for entry in board.top(count)], "places": places}
@@ -0,0 +1,340 @@
+import asyncio
+import bisect
+import logging
+import time
+import typing
+
+import discord
+
+# label values, in the order the metric's labels were given
+Labels = typing.Tuple[str, ...]
+
+# seconds; commands include whole sessions, so these go up to a quarter hour
+COMMAND_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+HTTP_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def label_text(names: typing.Sequence[str], values: typing.Sequence[str]) -> str:
+    """e.g. '{route="/channels",status="429"}'"""
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{escape(str(value))}"' for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class Metric:
+    """A named metric with labels, rendered in the Prometheus text format"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str, labels: typing.Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+
+    def samples(self) -> typing.Iterator[typing.Tuple[str, str, float]]:
+        """(name suffix, label text, value) for every sample"""
+        raise NotImplementedError
+
+    def render(self) -> typing.List[str]:
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {value:g}")
+        return lines
+
+
+class Counter(Metric):
+    """A count that only goes up"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labels: typing.Sequence[str] = ()):
+        super().__init__(name, description, labels)
+        self.values: typing.Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in sorted(self.values.items()):
+            yield "", label_text(self.labels, labels), value
+
+
+class Histogram(Metric):
+    """Counts of observations by upper bound, with their sum"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labels: typing.Sequence[str] = (),
+        buckets: typing.Sequence[float] = HTTP_BUCKETS,
+    ):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket (the last is +Inf), sum]
+        self.values: typing.Dict[Labels, typing.List] = {}
+
+    def observe(self, value: float, *labels: str):
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        # counts are kept per bucket, and only made cumulative when rendered
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def samples(self):
+        names = self.labels + ("le",)
+        for labels, (counts, total) in sorted(self.values.items()):
+            running = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                running += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                yield "_bucket", label_text(names, labels + (le,)), running
+            yield "_sum", label_text(self.labels, labels), total
+            yield "_count", label_text(self.labels, labels), running
+
+
+class Gauge(Metric):
+    """A value worked out when it's read, so keeping it costs nothing.
+    `read` returns the value, or a mapping of label values to values"""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        read: typing.Callable[[], typing.Union[float, typing.Mapping[Labels, float]]],
+        labels: typing.Sequence[str] = (),
+    ):
+        super().__init__(name, description, labels)
+        self.read = read
+
+    def samples(self):
+        value = self.read()
+        if not self.labels:
+            yield "", "", value
+            return
+        for labels, each in sorted(value.items()):
+            yield "", label_text(self.labels, labels), each
+
+
+class Metrics:
+    """Everything measured about one bot.
+
+    Counters and histograms are dict updates at the point they're
+    measured; gauges are only read when the metrics are rendered, so
+    nothing is paid for them unless someone is looking."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.started = time.time()
+        self.commands = Histogram(
+            "bot_command_seconds",
+            "Time from a command being invoked to it finishing, sessions included",
+            ("command", "outcome"),
+            COMMAND_BUCKETS,
+        )
+        self.http_requests = Counter(
+            "discord_http_requests_total",
+            "Discord API requests, by how they ended",
+            ("method", "route", "status"),
+        )
+        self.http_seconds = Histogram(
+            "discord_http_request_seconds",
+            "Discord API request time, including waiting out rate limits",
+            ("method", "route"),
+        )
+        self.rate_limits = Counter(
+            "discord_http_rate_limited_total",
+            "429 responses from Discord, by route",
+            ("route",),
+        )
+        self.global_rate_limits = Counter(
+            "discord_http_global_rate_limited_total",
+            "Those 429 responses that were for the global limit",
+        )
+        self.loop_lag = Histogram(
+            "bot_event_loop_lag_seconds",
+            "How late the event loop ran the watchdog's heartbeat",
+            buckets=LAG_BUCKETS,
+        )
+        self.loop_stalls = Counter(
+            "bot_event_loop_stalls_total",
+            "Times the event loop was blocked past the watchdog's threshold",
+        )
+        self.metrics: typing.List[Metric] = [
+            self.commands,
+            self.http_requests,
+            self.http_seconds,
+            self.rate_limits,
+            self.global_rate_limits,
+            self.loop_lag,
+            self.loop_stalls,
+            Gauge(
+                "bot_sessions",
+                "Running sessions, by kind",
+                self.session_counts,
+                ("kind",),
+            ),
+            Gauge(
+                "bot_sessions_queued",
+                "Sessions waiting for room under the session limits",
+                self.sessions_queued,
+            ),
+            Gauge(
+                "bot_edit_queue_depth",
+                "Messages with edits waiting to be sent",
+                lambda: self.scheduler_figure(lambda scheduler: scheduler.depth()),
+            ),
+            Gauge(
+                "bot_edit_channels",
+                "Channels with edits being sent",
+                lambda: self.scheduler_figure(lambda scheduler: len(scheduler.workers)),
+            ),
+            Gauge(
+                "bot_reaction_listeners",
+                "Messages waiting on a reaction",
+                lambda: len(getattr(self.bot, "reaction_router", ())),
+            ),
+            Gauge(
+                "bot_guilds",
+                "Guilds this bot (or shard) is in",
+                lambda: len(bot.guilds),
+            ),
+            Gauge(
+                "bot_uptime_seconds",
+                "Seconds since startup",
+                lambda: time.time() - self.started,
+            ),
+        ]
+
+    def session_counts(self) -> typing.Dict[Labels, float]:
+        manager = getattr(self.bot, "session_manager", None)
+        if manager is None:
+            return {}
+        return {
+            (kind,): count
+            for kind, count in manager.counts().items()
+            if kind not in ("total", "queued")
+        }
+
+    def sessions_queued(self) -> float:
+        manager = getattr(self.bot, "session_manager", None)
+        return 0 if manager is None else manager.queued
+
+    def scheduler_figure(self, figure: typing.Callable) -> float:
+        scheduler = getattr(self.bot, "edit_scheduler", None)
+        return 0 if scheduler is None else figure(scheduler)
+
+    def command_finished(self, ctx, outcome: str):
+        """Record a command finishing, if it was timed from `on_command`"""
+        started = getattr(ctx, "metrics_started", None)
+        if started is not None and ctx.command is not None:
+            self.commands.observe(
+                time.perf_counter() - started, ctx.command.qualified_name, outcome
+            )
+
+    def render(self, search: str = "") -> str:
+        """Every metric (with `search` in its name), in the Prometheus text format"""
+        lines = []
+        for metric in self.metrics:
+            if search in metric.name:
+                lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def instrument_http(http: discord.http.HTTPClient, metrics: Metrics):
+    """Count and time every Discord API request the client makes"""
+    request = http.request
+
+    async def timed_request(route: discord.http.Route, **kwargs):
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            return await request(route, **kwargs)
+        except discord.HTTPException as exc:
+            status = str(exc.status)
+            raise
+        except Exception:
+            # e.g. the connection dropped
+            status = "error"
+            raise
+        finally:
+            metrics.http_requests.inc(route.method, route.path, status)
+            metrics.http_seconds.observe(
+                time.perf_counter() - started, route.method, route.path
+            )
+
+    http.request = timed_request
+
+
+class RateLimitCounter(logging.Handler):
+    """Counts 429s from the warnings discord.py logs for them.
+
+    discord.py retries rate limited requests itself, so they never reach
+    `instrument_http` as errors; the warning is the only sign of them.
+    Every 429 gets a "We are being rate limited" warning, and a global one
+    then gets a "Global rate limit" warning too, so only the first is
+    counted in the total."""
+
+    def __init__(self, metrics: Metrics):
+        super().__init__(logging.WARNING)
+        self.metrics = metrics
+
+    def emit(self, record: logging.LogRecord):
+        if record.msg.startswith("We are being rate limited"):
+            # the bucket is "channel ID:guild ID:route"
+            bucket = str(record.args[1])
+            self.metrics.rate_limits.inc(bucket.split(":", 2)[-1])
+        elif record.msg.startswith("Global rate limit"):
+            self.metrics.global_rate_limits.inc()
+
+
+async def serve(metrics: Metrics, host: str, port: int) -> asyncio.AbstractServer:
+    """Serve the metrics over HTTP at /metrics, for Prometheus to scrape"""
+
+    async def respond(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await reader.readline()
+            # the headers don't matter
+            while (await reader.readline()).strip():
+                pass
+            parts = request.split()
+            if len(parts) >= 2 and parts[0] == b"GET" and parts[1] == b"/metrics":
+                status, body = "200 OK", metrics.render().encode("utf-8")
+            else:
+                status, body = "404 Not Found", b"Try /metrics\n"
+            writer.write(
+                f"HTTP/1.0 {status}\r\n"
+                "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n".encode("ascii") + body
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(respond, host, port)
+
+
+def get_metrics(bot) -> Metrics:
+    """Get the bot's metrics, creating them on first use"""
+    metrics = getattr(bot, "metrics", None)
+    if metrics is None:
+        metrics = bot.metrics = Metrics(bot)
+    return metrics
@@ -0,0 +1,57 @@
+import typing
+
+try:
+    import numpy
+except ImportError:  # vector alignment tests are unavailable without it
+    numpy = None
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # the brute force search is used instead
+    cKDTree = None
+
+# with more points than this, a k-d tree is used when scipy is installed
+KD_TREE_THRESHOLD = 32
+# how many queries to compare against every point at once; bounds the
+# size of the (queries x points) distance matrix
+CHUNK_SIZE = 4096
+
+
+class NearestPoint:
+    """Finds the nearest of a fixed set of points to each query point.
+
+    With few points (or without scipy) this is a brute force search,
+    vectorised over the queries; with many, a k-d tree.
+
+    Parameters
+    ----------
+    points: numpy.ndarray
+        A (points, dimensions) array
+    """
+
+    def __init__(self, points: "numpy.ndarray"):
+        if numpy is None:
+            raise RuntimeError("numpy is needed to look up nearest points")
+        self.points = numpy.asarray(points, dtype=float)
+        self.tree = None
+        if cKDTree is not None and len(self.points) > KD_TREE_THRESHOLD:
+            self.tree = cKDTree(self.points)
+
+    def nearest(self, queries: "numpy.ndarray") -> "numpy.ndarray":
+        """The index of the nearest point to each row of a (queries, dimensions) array"""
+        queries = numpy.asarray(queries, dtype=float)
+        if self.tree is not None:
+            return self.tree.query(queries)[1]
+
+        found = numpy.empty(len(queries), dtype=numpy.intp)
+        # |q - p|^2 = |q|^2 - 2 q.p + |p|^2, and |q|^2 doesn't change the winner
+        squared = numpy.einsum("ij,ij->i", self.points, self.points)
+        for start in range(0, len(queries), CHUNK_SIZE):
+            end = start + CHUNK_SIZE
+            distances = squared - 2 * queries[start:end] @ self.points.T
+            found[start:end] = distances.argmin(axis=1)
+        return found
+
+    def nearest_one(self, query: typing.Sequence[float]) -> int:
+        """The index of the nearest point to a single query point"""
+        return int(self.nearest(numpy.asarray(query, dtype=float)[None, :])[0])
@@ -0,0 +1,52 @@
+import asyncio
+import concurrent.futures
+import typing
+
+
+class Offloader:
+    """Runs CPU-heavy work off the event loop, so reactions and the gateway
+    heartbeat aren't held up behind it.
+
+    Work that needs the bot's objects (fuzzy lookups, building indexes)
+    goes to a thread pool. Work that only needs picklable arguments, like
+    parsing content files, can go to a process pool instead, which isn't
+    held back by the GIL; without one, it goes to the threads too.
+
+    Parameters
+    ----------
+    threads: int
+        How many worker threads to run
+    processes: int
+        How many worker processes to run, or 0 for none
+    """
+
+    def __init__(self, threads: int = 4, processes: int = 0):
+        self.threads = concurrent.futures.ThreadPoolExecutor(
+            threads, thread_name_prefix="offload"
+        )
+        # the processes themselves only start once there's work for them
+        self.processes: typing.Optional[concurrent.futures.Executor] = (
+            concurrent.futures.ProcessPoolExecutor(processes) if processes else None
+        )
+
+    async def run(self, func: typing.Callable, *args) -> typing.Any:
+        """Run `func(*args)` in a worker thread"""
+        return await asyncio.get_event_loop().run_in_executor(self.threads, func, *args)
+
+    async def run_process(self, func: typing.Callable, *args) -> typing.Any:
+        """Run `func(*args)` in a worker process, or a thread if there are none"""
+        executor = self.processes or self.threads
+        return await asyncio.get_event_loop().run_in_executor(executor, func, *args)
+
+    def shutdown(self, wait: bool = True):
+        self.threads.shutdown(wait)
+        if self.processes is not None:
+            self.processes.shutdown(wait)
+
+
+def get_offloader(bot) -> Offloader:
+    """Get the bot's offloader, creating it on first use"""
+    offloader = getattr(bot, "offloader", None)
+    if offloader is None:
+        offloader = bot.offloader = Offloader()
+    return offloader
@@ -0,0 +1,62 @@
+import itertools
+import typing
+
+Page = typing.TypeVar("Page")
+
+
+class LazyPages(typing.Generic[Page]):
+    """Pages for a paginator, produced only as they're needed.
+
+    Given a sequence, this just indexes it. Given any other iterable,
+    pages are taken from it as the paginator reaches them and kept for
+    flipping back, so only the pages up to the furthest one viewed are
+    ever made.
+
+    Parameters
+    ----------
+    pages: typing.Iterable[Page]
+        The pages, in order
+    count: typing.Optional[int]
+        How many pages an iterable will give, if known in advance
+    """
+
+    __slots__ = ("made", "iterator", "count")
+
+    def __init__(self, pages: typing.Iterable[Page], count: int = None):
+        if isinstance(pages, typing.Sequence):
+            self.made: typing.Sequence[Page] = pages
+            self.iterator: typing.Optional[typing.Iterator[Page]] = None
+            self.count: typing.Optional[int] = len(pages)
+        else:
+            self.made = []
+            self.iterator = iter(pages)
+            self.count = count
+
+    def get(self, index: int) -> typing.Optional[Page]:
+        """The page at `index`, or None if there aren't that many"""
+        if index < 0:
+            return None
+        if index >= len(self.made) and self.iterator is not None:
+            self.made.extend(
+                itertools.islice(self.iterator, index + 1 - len(self.made))
+            )
+            if index >= len(self.made):
+                # that's all of them
+                self.iterator = None
+                self.count = len(self.made)
+        return self.made[index] if index < len(self.made) else None
+
+    def __getitem__(self, index: int) -> Page:
+        page = self.get(index)
+        if page is None:
+            raise IndexError(index)
+        return page
+
+    def last(self) -> int:
+        """The index of the last page. If the number of pages isn't known,
+        this has to make every page to find out"""
+        if self.count is None:
+            self.made.extend(self.iterator)
+            self.iterator = None
+            self.count = len(self.made)
+        return self.count - 1
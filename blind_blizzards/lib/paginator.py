@@ -0,0 +1,343 @@
+import asyncio
+import collections
+import typing
+
+import discord
+from discord.ext import commands
+
+from lib.edits import get_scheduler, report_failure, FEEDBACK, COSMETIC
+from lib.pages import LazyPages
+from lib.reactions import get_router
+from lib.search import TitlePages
+from lib.sessions import get_session_manager
+
+# the most characters of a title a TitleList shows
+MAX_TITLE = 100
+
+
+class Paginator:
+    """An embed with reactions to flip between pages.
+
+    Pages are taken from `pages` as they're reached (see lib.pages), and
+    each one's embed is prepared the first time it's shown. Reactions come
+    through the bot's reaction router, like sessions' do, rather than each
+    paginator holding its own `wait_for`. Subclasses fill in `prepare_embed`.
+
+    Parameters
+    ----------
+    bot: discord.ext.commands.Bot
+        The discord bot currently running
+    ctx: discord.ext.commands.Context
+        The current context of the Discord message
+    pages: typing.Iterable
+        The pages to show, in order
+    page_count: typing.Optional[int]
+        How many pages there are, if `pages` isn't a sequence and that's known
+
+    Attributes
+    ----------
+    author: discord.User
+        A shortcut for `self.context.author` - The invoker of the command
+    channel: typing.Union[discord.TextChannel, discord.DMChannel]
+        A shortcut for `self.context.channel` - The channel in which the command was invoked
+    original_message: discord.Mesage
+        A shortcut for `self.context.message` - The message that invoked the command
+    embed: discord.Embed
+        The embed that is frequently edited to send to discord
+    reaction_emoji: typing.List[typing.Tuple[str, typing.Callable]]
+        The list of possible emoji to react to and their function
+    maximum_pages: typing.Optional[int]
+        The number of pages, if known yet
+    paginating: bool
+        Whether we are paginating or not
+    rendered: typing.OrderedDict[int, discord.Embed]
+        The embeds of recently shown pages, so flipping back doesn't prepare them again
+    current_page: typing.Optional[int]
+        The index of the current page being displayed
+    match: typing.Optional[typing.Callable]
+        The method assigned to the reacted emoji. Altered in `set_match`
+    message: typing.Optional[discord.Message]
+        The message the pages are shown in
+    """
+
+    # counted by the session manager under this kind
+    session_kind = "pages"
+    # what the message says once the reader stops or goes away
+    stopped_text = "Closed."
+    # how many prepared embeds to keep; None keeps every page shown
+    max_rendered: typing.Optional[int] = None
+    # seconds without a reaction before giving up
+    timeout = 120.0
+
+    def __init__(
+        self,
+        bot: commands.Bot,
+        ctx: commands.Context,
+        pages: typing.Iterable,
+        page_count: int = None,
+    ):
+        self.bot: commands.Bot = bot
+        self.context: commands.Context = ctx
+        self.author: discord.User = ctx.author
+        self.channel: typing.Union[discord.TextChannel, discord.DMChannel] = ctx.channel
+        self.original_message: discord.Message = ctx.message
+
+        self.pages: LazyPages = LazyPages(pages, page_count)
+
+        self.embed: discord.Embed = discord.Embed(colour=0x36393E)
+        self.reaction_emoji: typing.List[typing.Tuple[str, typing.Callable]] = [
+            (
+                "\N{BLACK LEFT-POINTING DOUBLE TRIANGLE WITH VERTICAL BAR}",
+                self.first_page,
+            ),
+            ("\N{BLACK LEFT-POINTING TRIANGLE}", self.previous_page),
+            ("\N{BLACK RIGHT-POINTING TRIANGLE}", self.next_page),
+            (
+                "\N{BLACK RIGHT-POINTING DOUBLE TRIANGLE WITH VERTICAL BAR}",
+                self.last_page,
+            ),
+            ("\N{BLACK SQUARE FOR STOP}", self.stop_pages),
+        ]
+
+        # only paginate if there's a second page
+        self.paginating: bool = self.pages.get(1) is not None
+
+        self.rendered: typing.Dict[int, discord.Embed] = collections.OrderedDict()
+        self.current_page: typing.Optional[int] = None
+        self.match: typing.Optional[typing.Callable]
+        self.message: typing.Optional[discord.Message] = None
+
+    @property
+    def maximum_pages(self) -> typing.Optional[int]:
+        return self.pages.count
+
+    def page_footer(self, page: int, total: int = None, counting: str = "") -> str:
+        """e.g. 'Page 2 of 5 (48 commands)', leaving out anything not known yet
+
+        Parameters
+        ----------
+        page: int
+            The index of the page
+        total: typing.Optional[int]
+            How many things there are across all the pages, if known
+        counting: str
+            What `total` counts
+        """
+
+        footer = f"Page {page + 1}"
+        if self.maximum_pages is not None:
+            footer += f" of {self.maximum_pages}"
+        if total is not None:
+            footer += f" ({total} {counting})"
+        return footer
+
+    def set_match(self, reaction: discord.Reaction) -> None:
+        """Point `self.match` at the method for the reacted emoji"""
+
+        for (emoji, func) in self.reaction_emoji:
+            if reaction.emoji == emoji:
+                self.match = func
+                return
+
+    async def prepare_embed(self, page: int) -> typing.NoReturn:
+        """The function called to prepare the embed before it is sent/edited.
+
+        This is overwritten when subclassed.
+
+        Parameters
+        ----------
+        page: int
+            The index of the current page to prepare
+        """
+
+        raise NotImplementedError
+
+    async def show(self, page: int, *, first: bool = False) -> None:
+        """Displays the given page in discord
+
+        Parameters
+        ----------
+        page: int
+            The index of the current page to show
+
+        first: bool (default False)
+            Whether this is the first time this is being called and hence
+            the return message hasn't been sent yet.
+        """
+
+        self.current_page = page
+        # each page is only prepared the first time it's shown
+        embed = self.rendered.get(page)
+        if embed is None:
+            await self.prepare_embed(page)
+            self.rendered[page] = self.embed
+            if self.max_rendered is not None and len(self.rendered) > self.max_rendered:
+                self.rendered.popitem(last=False)
+        else:
+            self.embed = embed
+            self.rendered.move_to_end(page)
+
+        if not self.paginating:
+            await self.channel.send(embed=self.embed)
+            return
+
+        if not first:
+            # don't wait for the edit; if pages are flipped faster than we can
+            # edit, only the latest page gets sent
+            edit = get_scheduler(self.bot).submit(
+                self.message, COSMETIC, embed=self.embed
+            )
+            edit.add_done_callback(report_failure)
+            return
+
+        self.message = await self.channel.send(embed=self.embed)
+
+    async def add_reactions(self) -> None:
+        """Adds the control reactions to the message"""
+
+        for reaction, _func in self.reaction_emoji:
+            if self.maximum_pages == 2 and reaction in ("\u23ed", "\u23ee"):
+                # Don't add first and last page when there are only two
+                continue
+            await self.message.add_reaction(reaction)
+
+    async def first_page(self) -> None:
+        """When the Double Left Triangle is clicked."""
+
+        await self.show(0)
+
+    async def last_page(self) -> None:
+        """When the Double Right Triangle is clicked."""
+
+        # if the pages are being generated, this generates the rest
+        await self.show(self.pages.last())
+
+    async def next_page(self) -> None:
+        """WHen the Single Right Triangle is clicked."""
+
+        new = self.current_page + 1
+        # check limits
+        if self.pages.get(new) is not None:
+            await self.show(new)
+
+    async def previous_page(self) -> None:
+        """When the Single Left Triangle is clicked."""
+
+        new = self.current_page - 1
+        # check limits
+        if new >= 0:
+            await self.show(new)
+
+    async def stop_pages(self) -> None:
+        """When the Stop button is clicked."""
+
+        await get_scheduler(self.bot).submit(
+            self.message, FEEDBACK, content=self.stopped_text, embed=None
+        )  # remove embed after pagination
+        try:
+            await self.message.clear_reactions()
+        except discord.errors.DiscordException:
+            for emoji, _func in self.reaction_emoji:
+                await self.message.remove_reaction(emoji, self.context.me)
+        self.paginating = False
+
+    async def paginate(self) -> None:
+        """The commnand to esentially start the paginator."""
+
+        await self.show(0, first=True)
+        if not self.paginating:
+            return
+
+        # If paginating, allows us to react straight away
+        self.bot.loop.create_task(self.add_reactions())
+
+        # paginators are counted, but not limited like quizzes are
+        async with get_session_manager(self.bot).session(
+            self.context, self.session_kind, capped=False
+        ):
+            with get_router(self.bot).listen(
+                self.message.id,
+                self.author.id,
+                [emoji for emoji, _func in self.reaction_emoji],
+            ) as listener:
+                while self.paginating:
+                    try:
+                        reaction, user = await listener.wait(timeout=self.timeout)
+
+                    except asyncio.TimeoutError:
+                        self.paginating = False
+                        try:
+                            await self.stop_pages()
+                        except discord.DiscordException:
+                            pass
+                        finally:
+                            break
+
+                    try:
+                        await self.message.remove_reaction(reaction, user)
+                    except discord.DiscordException:
+                        # leave it if we can't remove it
+                        pass
+
+                    # self.match updates to the correct method here
+                    self.set_match(reaction)
+                    await self.match()
+
+
+class TitleList(Paginator):
+    """Pages of quiz, test or game titles (see `TitlePages`).
+
+    Pages are worked out from the title index when they're shown and
+    only the last few embeds are kept, so a listing costs the same
+    however many titles there are.
+
+    Parameters
+    ----------
+    bot: discord.ext.commands.Bot
+        The discord bot currently running
+    ctx: discord.ext.commands.Context
+        The current context of the Discord message
+    pages: TitlePages
+        The titles to list
+    heading: str
+        The title of the embed, e.g. 'Quizzes'
+    colour: int
+        The colour of the embed
+    """
+
+    session_kind = "list"
+    max_rendered = 3
+
+    def __init__(
+        self,
+        bot: commands.Bot,
+        ctx: commands.Context,
+        pages: TitlePages,
+        heading: str,
+        colour: int = 0x36393E,
+    ):
+        super().__init__(bot, ctx, pages)
+        self.titles: TitlePages = pages
+        self.heading: str = heading
+        self.colour: int = colour
+
+    async def prepare_embed(self, page: int) -> None:
+        """Lists the titles on the page.
+
+        Parameters
+        ----------
+        page: int
+            The index of the current page to prepare
+        """
+
+        self.embed = discord.Embed(
+            colour=self.colour,
+            title=self.heading,
+            # long titles are cut short so a page always fits in an embed
+            description="\n".join(
+                title if len(title) <= MAX_TITLE else title[: MAX_TITLE - 1] + "\u2026"
+                for title in self.pages[page]
+            )
+            or "Nothing found.",
+        )
+        self.embed.set_footer(text=self.page_footer(page, self.titles.total, "titles"))
@@ -0,0 +1,87 @@
+import functools
+import itertools
+import random
+import typing
+
+# orders of up to this many items are picked from a precomputed table
+TABLE_LIMIT = 6
+
+
+@functools.lru_cache(maxsize=None)
+def permutations_of(count: int) -> typing.Tuple[typing.Tuple[int, ...], ...]:
+    """Every order of `count` items, as tuples of indexes.
+    Only sensible for small counts: there are count! of them"""
+    return tuple(itertools.permutations(range(count)))
+
+
+class LazyPermutation:
+    """A random order of `range(count)`, generated one index at a time.
+
+    This is Fisher-Yates run lazily: only the positions that have been
+    swapped are stored, so drawing k indexes costs O(k) time and memory
+    however large `count` is."""
+
+    __slots__ = ("count", "random", "swaps", "position")
+
+    def __init__(self, count: int, rng: random.Random):
+        self.count = count
+        self.random = rng
+        # position -> the value that was swapped into it
+        self.swaps: typing.Dict[int, int] = {}
+        self.position = 0
+
+    def __iter__(self) -> "LazyPermutation":
+        return self
+
+    def __next__(self) -> int:
+        if self.position >= self.count:
+            raise StopIteration
+        here = self.position
+        there = self.random.randrange(here, self.count)
+        value = self.swaps.get(there, there)
+        # move whatever is here out to the position we drew from;
+        # `here` is never read again, so it needn't be stored
+        self.swaps[there] = self.swaps.pop(here, here)
+        self.position += 1
+        return value
+
+    def __len__(self) -> int:
+        return self.count - self.position
+
+    def take(self, amount: int) -> typing.List[int]:
+        """The next `amount` indexes (or fewer, if there aren't that many left)"""
+        return list(itertools.islice(self, amount))
+
+
+class SessionShuffle:
+    """Every random choice made during one session, derived from one seed.
+
+    Running a session again with the same seed (and the same content)
+    shows the same questions and options in the same order, which makes
+    sessions reproducible for debugging and benchmarks.
+
+    Parameters
+    ----------
+    seed: typing.Optional[int]
+        The seed to use. If None, a new one is picked
+    """
+
+    __slots__ = ("seed", "random")
+
+    def __init__(self, seed: int = None):
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.seed = seed
+        self.random = random.Random(seed)
+
+    def order(self, count: int) -> typing.Tuple[int, ...]:
+        """A random order for a handful of options, as a tuple of indexes.
+        These come from a shared table, so nothing is copied or shuffled"""
+        if count <= TABLE_LIMIT:
+            table = permutations_of(count)
+            return table[self.random.randrange(len(table))]
+        return tuple(self.random.sample(range(count), count))
+
+    def sequence(self, count: int) -> LazyPermutation:
+        """A lazily generated random order of `range(count)`"""
+        return LazyPermutation(count, self.random)
@@ -0,0 +1,163 @@
+import asyncio
+import collections
+import time
+import typing
+
+import discord
+
+
+class RateBudget:
+    """A token bucket: `rate` requests per second, bursting up to `burst`"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    async def acquire(self, amount: float = 1):
+        """Wait until `amount` requests can be made, then spend them"""
+        while True:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return
+            await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+class MessagePool:
+    """Per-channel pools of messages that already carry a session's reactions.
+
+    Adding the reactions to a new message takes several rate-limited
+    requests, so sessions claim a ready-made message instead when there
+    is one. A channel gets a pool once a session has been started in it,
+    and a background task tops pools up within a request budget.
+
+    Parameters
+    ----------
+    reactions: typing.List[str]
+        The reactions every pooled message carries
+    size: int
+        How many ready messages to keep per channel
+    rate: float
+        How many requests per second the background task may make
+    placeholder: str
+        The content of a message waiting in the pool
+    max_age: float
+        How many seconds a message may wait in the pool. Older ones have
+        scrolled out of sight, or been deleted, so they're thrown away
+
+    Attributes
+    ----------
+    hits: int
+        Sessions that got a pooled message
+    misses: int
+        Sessions that had to set up their own message
+    expired: int
+        Pooled messages thrown away for being too old
+    first_question_times: typing.Deque[float]
+        Seconds from each recent session starting to its first question being shown
+    """
+
+    def __init__(
+        self,
+        reactions: typing.List[str],
+        size: int = 2,
+        rate: float = 1.0,
+        placeholder: str = "Getting ready...",
+        max_age: float = 600.0,
+    ):
+        self.reactions = reactions
+        self.size = size
+        self.placeholder = placeholder
+        self.max_age = max_age
+        self.budget = RateBudget(rate, burst=1 + len(reactions))
+
+        # channel ID -> (when it was sent, message), oldest first
+        self.pools: typing.Dict[
+            int, typing.Deque[typing.Tuple[float, discord.Message]]
+        ] = {}
+        # too old to use; deleted by the background task
+        self.stale: typing.Deque[discord.Message] = collections.deque()
+        self.refills: asyncio.Queue = asyncio.Queue()
+        self.task: typing.Optional[asyncio.Task] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.first_question_times: typing.Deque[float] = collections.deque(maxlen=1000)
+
+    def start(self):
+        """Start topping up pools in the background"""
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.top_up())
+
+    def stop(self):
+        """Stop the background task; pooled messages are left as they are"""
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def claim(
+        self, channel: discord.abc.Messageable
+    ) -> typing.Optional[discord.Message]:
+        """Take a ready message from the channel's pool, if it has one
+        that isn't too old. Either way, the pool is queued for topping up"""
+        pool = self.pools.setdefault(channel.id, collections.deque())
+        cutoff = time.monotonic() - self.max_age
+        while pool and pool[0][0] < cutoff:
+            self.stale.append(pool.popleft()[1])
+            self.expired += 1
+        message = pool.popleft()[1] if pool else None
+        if message is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        self.refills.put_nowait(channel)
+        return message
+
+    def record_first_question(self, seconds: float):
+        """Record how long a session took to show its first question"""
+        self.first_question_times.append(seconds)
+
+    async def top_up(self):
+        """Refill pools as they're drawn from, within the request budget"""
+        while True:
+            channel = await self.refills.get()
+            while self.stale:
+                await self.budget.acquire()
+                try:
+                    await self.stale.popleft().delete()
+                except discord.HTTPException:
+                    # already deleted, most likely
+                    pass
+            pool = self.pools[channel.id]
+            while len(pool) < self.size:
+                # one request to send, then one per reaction
+                await self.budget.acquire(1 + len(self.reactions))
+                try:
+                    message = await channel.send(self.placeholder)
+                    for emoji in self.reactions:
+                        await message.add_reaction(emoji)
+                except discord.HTTPException:
+                    # e.g. we can't speak there any more; try again when next used
+                    break
+                pool.append((time.monotonic(), message))
+
+    def stats(self) -> typing.Dict[str, float]:
+        """Hit rate and time-to-first-question figures"""
+        claims = self.hits + self.misses
+        times = sorted(self.first_question_times)
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_rate": self.hits / claims if claims else 0.0,
+            "pooled": sum(len(pool) for pool in self.pools.values()),
+            "first_question_median": times[len(times) // 2] if times else 0.0,
+            "first_question_p95": times[int(len(times) * 0.95)] if times else 0.0,
+        }
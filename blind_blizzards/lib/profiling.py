@@ -0,0 +1,234 @@
+import asyncio
+import collections.abc
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import typing
+import weakref
+
+
+def frame_name(frame) -> str:
+    """e.g. 'find_title (cogs/interactive.py:182)'"""
+    code = frame.f_code
+    path = code.co_filename
+    try:
+        path = os.path.relpath(path)
+    except ValueError:
+        # on another drive, on Windows
+        pass
+    if path.startswith(".."):
+        # something installed; the last couple of parts are enough
+        path = "/".join(path.replace("\\", "/").split("/")[-2:])
+    # ';' separates frames in the collapsed format
+    return f"{code.co_name} ({path}:{code.co_firstlineno})".replace(";", ",")
+
+
+def collapse(frame) -> str:
+    """A stack as 'outermost;...;innermost', the collapsed format flame graph
+    tools (flamegraph.pl, speedscope) read"""
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """Samples a thread's stack every `interval` seconds from another thread,
+    counting how often each stack was seen.
+
+    Nothing is added to the sampled thread, so this is cheap enough to run
+    in production; a stack seen in n of N samples took about n/N of the time.
+    Time the loop spent waiting for something to do shows up under `select`.
+
+    Parameters
+    ----------
+    thread_id: int
+        The thread to sample, e.g. the event loop's
+    interval: float
+        Seconds between samples
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts: typing.Counter[str] = collections.Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+        self.thread: typing.Optional[threading.Thread] = None
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self.run, name="stack sampler", daemon=True
+        )
+        self.thread.start()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                # the thread has gone
+                return
+            self.counts[collapse(frame)] += 1
+            self.samples += 1
+            del frame
+
+    def stop(self):
+        """Stop sampling. Blocks for up to `interval`, so call it off the loop"""
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def write(self, path: str):
+        """Write the samples as collapsed stacks, one 'stack count' per line"""
+        with open(path, "w", encoding="utf-8") as file:
+            for stack, count in self.counts.most_common():
+                file.write(f"{stack} {count}\n")
+
+
+class TimedCoroutine(collections.abc.Coroutine):
+    """Wraps a coroutine, adding up how long each of its steps (the time
+    between one await and the next) kept the event loop busy"""
+
+    __slots__ = ("coro", "busy", "steps", "longest")
+
+    def __init__(self, coro: typing.Coroutine):
+        self.coro = coro
+        self.busy = 0.0
+        self.steps = 0
+        self.longest = 0.0
+
+    def timed(self, method: typing.Callable, *args) -> typing.Any:
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            took = time.perf_counter() - start
+            self.busy += took
+            self.steps += 1
+            if took > self.longest:
+                self.longest = took
+
+    def send(self, value):
+        return self.timed(self.coro.send, value)
+
+    def throw(self, *args):
+        return self.timed(self.coro.throw, *args)
+
+    def close(self):
+        return self.coro.close()
+
+    def __await__(self):
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.send(None)
+
+
+class CommandTimings:
+    """How long each command took, and how much of that it kept the event
+    loop busy, while installed.
+
+    Every task created while installed has its coroutine wrapped in a
+    TimedCoroutine. Commands run in the task that handled their message,
+    so the bot's before and after invoke hooks note how much busy time
+    that task had on either side of the command. Commands whose message
+    arrived before installing aren't counted.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.loop = bot.loop
+        # the coroutine wrapper of every task created while installed
+        self.timed: typing.MutableMapping[asyncio.Task, TimedCoroutine] = (
+            weakref.WeakKeyDictionary()
+        )
+        # command -> [invocations, seconds taken, seconds busy, steps, longest step]
+        self.commands: typing.Dict[str, typing.List] = {}
+        self.previous_factory = None
+        self.previous_hooks = (None, None)
+
+    def create_task(
+        self, loop: asyncio.AbstractEventLoop, coro, **kwargs
+    ) -> asyncio.Task:
+        timed = TimedCoroutine(coro)
+        if self.previous_factory is not None:
+            task = self.previous_factory(loop, timed, **kwargs)
+        else:
+            task = asyncio.Task(timed, loop=loop, **kwargs)
+        self.timed[task] = timed
+        return task
+
+    def install(self):
+        self.previous_factory = self.loop.get_task_factory()
+        self.loop.set_task_factory(self.create_task)
+        # commands.Bot has no way to add a hook alongside others, so keep
+        # whatever was set and call it from ours
+        self.previous_hooks = (self.bot._before_invoke, self.bot._after_invoke)
+        self.bot._before_invoke = self.before_invoke
+        self.bot._after_invoke = self.after_invoke
+
+    def uninstall(self):
+        self.loop.set_task_factory(self.previous_factory)
+        self.bot._before_invoke, self.bot._after_invoke = self.previous_hooks
+
+    async def before_invoke(self, ctx):
+        timed = self.timed.get(asyncio.current_task())
+        if timed is not None:
+            ctx.profile_started = (time.perf_counter(), timed.busy, timed.steps)
+        if self.previous_hooks[0] is not None:
+            await self.previous_hooks[0](ctx)
+
+    async def after_invoke(self, ctx):
+        if self.previous_hooks[1] is not None:
+            await self.previous_hooks[1](ctx)
+        timed = self.timed.get(asyncio.current_task())
+        started = getattr(ctx, "profile_started", None)
+        if timed is None or started is None:
+            return
+        start, busy, steps = started
+        entry = self.commands.setdefault(
+            ctx.command.qualified_name, [0, 0.0, 0.0, 0, 0.0]
+        )
+        entry[0] += 1
+        entry[1] += time.perf_counter() - start
+        entry[2] += timed.busy - busy
+        entry[3] += timed.steps - steps
+        # the longest step of the task so far; near enough, as tasks
+        # handling a message only run the one command
+        entry[4] = max(entry[4], timed.longest)
+
+    def format(self) -> str:
+        """A table of the commands, busiest first"""
+        lines = [
+            f"{'command':<24} {'calls':>6} {'total s':>9} {'busy s':>9}"
+            f" {'awaits':>7} {'longest ms':>11}"
+        ]
+        for name, (calls, took, busy, steps, longest) in sorted(
+            self.commands.items(), key=lambda item: item[1][2], reverse=True
+        ):
+            lines.append(
+                f"{name:<24} {calls:>6} {took:>9.3f} {busy:>9.3f}"
+                f" {steps:>7} {longest * 1e3:>11.2f}"
+            )
+        return "\n".join(lines)
+
+
+def memory_diff(
+    before: tracemalloc.Snapshot, after: tracemalloc.Snapshot, limit: int = 25
+) -> str:
+    """The lines that allocated the most between two snapshots, biggest first"""
+    # leave out tracemalloc's own bookkeeping
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    stats = after.filter_traces(filters).compare_to(
+        before.filter_traces(filters), "lineno"
+    )
+    total = sum(stat.size_diff for stat in stats)
+    lines = [f"{total / 1024:+.1f} KiB overall"]
+    lines.extend(str(stat) for stat in stats[:limit])
+    return "\n".join(lines)
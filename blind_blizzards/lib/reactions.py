@@ -0,0 +1,118 @@
+import asyncio
+import typing
+
+
+class ReactionListener:
+    """A session's subscription to one user's reactions on one message.
+
+    Created by `ReactionRouter.listen`; use it as a context manager so the
+    subscription is always removed when the session ends."""
+
+    __slots__ = ("router", "message_id", "user_id", "emoji", "future")
+
+    def __init__(
+        self,
+        router: "ReactionRouter",
+        message_id: int,
+        user_id: int,
+        emoji: typing.Optional[typing.FrozenSet[str]] = None,
+    ):
+        self.router = router
+        self.message_id = message_id
+        self.user_id = user_id
+        # None means 'any emoji'
+        self.emoji = emoji
+        # only set while the session is actually waiting
+        self.future: typing.Optional[asyncio.Future] = None
+
+    def feed(self, reaction, user) -> bool:
+        """Hand a reaction to the waiting session, if there is one.
+        Like `Bot.wait_for`, reactions arriving while nobody waits are dropped"""
+        if self.emoji is not None and str(reaction.emoji) not in self.emoji:
+            return False
+        if self.future is None or self.future.done():
+            return False
+        self.future.set_result((reaction, user))
+        return True
+
+    async def wait(self, timeout: float = None):
+        """Wait for the next matching reaction and return `(reaction, user)`.
+        Raises `asyncio.TimeoutError` if `timeout` seconds pass first"""
+        self.future = asyncio.get_event_loop().create_future()
+        try:
+            return await asyncio.wait_for(self.future, timeout)
+        finally:
+            self.future = None
+
+    def move(self, message_id: int):
+        """Receive reactions on another message instead, e.g. a replacement
+        for one that was deleted"""
+        self.router.remove(self)
+        self.message_id = message_id
+        self.router.listeners[message_id, self.user_id] = self
+
+    def close(self):
+        """Stop receiving reactions"""
+        self.router.remove(self)
+        if self.future is not None and not self.future.done():
+            self.future.cancel()
+
+    def __enter__(self) -> "ReactionListener":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ReactionRouter:
+    """Routes `reaction_add` events to the session that owns the message.
+
+    `Bot.wait_for` runs the check of every pending waiter on every event,
+    so each reaction costs O(sessions). Here sessions are indexed by
+    (message ID, user ID), so each event is a single dict lookup."""
+
+    def __init__(self):
+        self.listeners: typing.Dict[typing.Tuple[int, int], ReactionListener] = {}
+
+    def listen(
+        self,
+        message_id: int,
+        user_id: int,
+        emoji: typing.Optional[typing.Iterable[str]] = None,
+    ) -> ReactionListener:
+        """Subscribe to `user_id`'s reactions on `message_id`.
+        If `emoji` is given, any other emoji will be ignored"""
+        listener = ReactionListener(
+            self, message_id, user_id, None if emoji is None else frozenset(emoji)
+        )
+        self.listeners[message_id, user_id] = listener
+        return listener
+
+    def remove(self, listener: ReactionListener):
+        """Unsubscribe a listener; a no-op if it was already replaced"""
+        key = (listener.message_id, listener.user_id)
+        if self.listeners.get(key) is listener:
+            del self.listeners[key]
+
+    def dispatch(self, reaction, user) -> bool:
+        """Deliver a reaction to its owner. Returns whether anyone took it"""
+        listener = self.listeners.get((reaction.message.id, user.id))
+        if listener is None:
+            return False
+        return listener.feed(reaction, user)
+
+    async def on_reaction_add(self, reaction, user):
+        """The single `reaction_add` listener registered on the bot"""
+        self.dispatch(reaction, user)
+
+    def __len__(self) -> int:
+        return len(self.listeners)
+
+
+def get_router(bot) -> ReactionRouter:
+    """Get the bot's reaction router, creating and registering it on first use"""
+    router = getattr(bot, "reaction_router", None)
+    if router is None:
+        router = bot.reaction_router = ReactionRouter()
+        bot.add_listener(router.on_reaction_add, "on_reaction_add")
+    return router
@@ -0,0 +1,349 @@
+import asyncio
+import collections
+import itertools
+import json
+import os
+import typing
+
+from lib.leaderboards import Leaderboards
+from lib.results import Result, ResultStore
+from lib.sessions import Session, SessionLimitReached, SessionManager
+
+# the longest message either side will read; results carry every answer
+MAX_MESSAGE = 16 * 1024 * 1024
+
+
+async def start_server(
+    address: str, handler: typing.Callable
+) -> asyncio.AbstractServer:
+    """Listen on `address`: a Unix socket path, or `host:port` for TCP"""
+    if ":" in address:
+        host, port = address.rsplit(":", 1)
+        return await asyncio.start_server(handler, host, int(port), limit=MAX_MESSAGE)
+    # a socket left behind by a launcher that didn't exit cleanly
+    if os.path.exists(address):
+        os.unlink(address)
+    return await asyncio.start_unix_server(handler, address, limit=MAX_MESSAGE)
+
+
+async def open_connection(
+    address: str
+) -> typing.Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    """Connect to `address`, as given to `start_server`"""
+    if ":" in address:
+        host, port = address.rsplit(":", 1)
+        return await asyncio.open_connection(host, int(port), limit=MAX_MESSAGE)
+    return await asyncio.open_unix_connection(address, limit=MAX_MESSAGE)
+
+
+def encode(message: dict) -> bytes:
+    """One message per line"""
+    return json.dumps(message, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+class RegistryServer:
+    """The state every shard shares, run by the launcher.
+
+    Shards claim capped sessions here, so the per-user, per-guild and
+    total limits hold across all of them, and send their results here, so
+    there's one database writer and one set of leaderboards. A shard's
+    claims are released when its connection closes, so a crashed shard
+    doesn't hold on to its users' sessions.
+
+    Messages are lines of JSON. Requests with an `id` get a reply with the
+    same `id` and either a `result` or an `error`; the rest get no reply.
+
+    Parameters
+    ----------
+    address: str
+        Where to listen (see `start_server`)
+    sessions: lib.sessions.SessionManager
+        Applies the limits; its sessions are the claims of every shard
+    store: typing.Optional[lib.results.ResultStore]
+        Saves results, if they're being saved
+    leaderboards: lib.leaderboards.Leaderboards
+        The leaderboards every shard reads
+    """
+
+    def __init__(
+        self,
+        address: str,
+        sessions: SessionManager,
+        store: typing.Optional[ResultStore],
+        leaderboards: Leaderboards,
+    ):
+        self.address = address
+        self.sessions = sessions
+        self.store = store
+        self.leaderboards = leaderboards
+        self.server: typing.Optional[asyncio.AbstractServer] = None
+        self.tokens = itertools.count(1)
+        # one per connected shard
+        self.writers: typing.Set[asyncio.StreamWriter] = set()
+
+    async def start(self):
+        self.server = await start_server(self.address, self.handle)
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            for writer in self.writers:
+                writer.close()
+            await self.server.wait_closed()
+            self.server = None
+        if ":" not in self.address and os.path.exists(self.address):
+            os.unlink(self.address)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve one shard's connection until it closes"""
+        # this shard's claims, by token
+        claims: typing.Dict[int, Session] = {}
+        tasks: typing.Set[asyncio.Task] = set()
+        self.writers.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                if "id" in message:
+                    # claims can wait for room, so don't hold up the rest
+                    task = asyncio.ensure_future(self.reply(message, claims, writer))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                else:
+                    await self.dispatch(message, claims)
+        except (ConnectionError, ValueError):
+            # the shard went away, or sent something we can't read
+            pass
+        finally:
+            self.writers.discard(writer)
+            for task in list(tasks):
+                task.cancel()
+            # whatever the shard was running is gone with it
+            for session in claims.values():
+                await self.sessions.finish(session)
+            writer.close()
+
+    async def reply(
+        self,
+        message: dict,
+        claims: typing.Dict[int, Session],
+        writer: asyncio.StreamWriter,
+    ):
+        try:
+            response = {
+                "id": message["id"],
+                "result": await self.dispatch(message, claims),
+            }
+        except Exception as exc:
+            response = {
+                "id": message["id"],
+                "error": f"{exc.__class__.__name__}: {exc}",
+            }
+        writer.write(encode(response))
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def dispatch(
+        self, message: dict, claims: typing.Dict[int, Session]
+    ) -> typing.Any:
+        operation = message["op"]
+        arguments = message.get("args", {})
+
+        if operation == "claim":
+            user_id, guild_id = arguments["user_id"], arguments["guild_id"]
+            try:
+                await self.sessions.admit(user_id, guild_id)
+            except SessionLimitReached as exc:
+                return {"refused": str(exc)}
+            token = next(self.tokens)
+            claims[token] = Session(arguments["kind"], user_id, guild_id, None, True)
+            self.sessions.add(claims[token])
+            return {"token": token}
+
+        if operation == "release":
+            # tokens from before a reconnect belong to the old connection,
+            # which has already released them
+            session = claims.pop(arguments["token"], None)
+            if session is not None:
+                await self.sessions.finish(session)
+            return None
+
+        if operation == "record":
+            result = Result(**arguments["result"])
+            if self.store is not None:
+                self.store.record(result)
+            self.leaderboards.add(result)
+            return None
+
+        if operation == "standings":
+            return self.leaderboards.standings(**arguments)
+
+        if operation == "result_stats":
+            return None if self.store is None else self.store.stats()
+
+        if operation == "counts":
+            counts = self.sessions.counts()
+            counts["shards"] = len(self.writers)
+            return counts
+
+        raise ValueError(f"unknown operation {operation!r}")
+
+
+class RegistryClient:
+    """A shard's connection to the launcher's RegistryServer.
+
+    The connection is kept open (and reopened) by `run`. While it's down,
+    `connected` is False so sessions fall back to this shard's own limits,
+    and results wait in a backlog until it's back.
+
+    Parameters
+    ----------
+    address: str
+        Where the registry listens (see `start_server`)
+    timeout: float
+        Seconds to wait for a reply; longer than the registry's queue timeout
+    retry: float
+        Seconds between attempts to reconnect
+    max_backlog: int
+        The most results to hold on to while disconnected
+    """
+
+    def __init__(
+        self,
+        address: str,
+        timeout: float = 30.0,
+        retry: float = 1.0,
+        max_backlog: int = 100_000,
+    ):
+        self.address = address
+        self.timeout = timeout
+        self.retry = retry
+        self.writer: typing.Optional[asyncio.StreamWriter] = None
+        self.ids = itertools.count(1)
+        self.pending: typing.Dict[int, asyncio.Future] = {}
+        self.backlog: typing.Deque[bytes] = collections.deque(maxlen=max_backlog)
+        self.task: typing.Optional[asyncio.Task] = None
+
+    @property
+    def connected(self) -> bool:
+        return self.writer is not None
+
+    def start(self, loop: asyncio.AbstractEventLoop = None):
+        """Start connecting in the background"""
+        if self.task is None:
+            self.task = (loop or asyncio.get_event_loop()).create_task(self.run())
+
+    async def close(self):
+        """Send anything still buffered, then disconnect"""
+        writer = self.writer
+        if writer is not None:
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+        self.writer = None
+
+    async def run(self):
+        """Stay connected, reconnecting whenever the connection drops"""
+        while True:
+            try:
+                reader, writer = await open_connection(self.address)
+            except OSError:
+                await asyncio.sleep(self.retry)
+                continue
+            self.writer = writer
+            # results recorded while we were away
+            while self.backlog:
+                writer.write(self.backlog.popleft())
+            try:
+                await self.read_replies(reader)
+            finally:
+                self.writer = None
+                writer.close()
+                for future in self.pending.values():
+                    if not future.done():
+                        future.set_exception(ConnectionError("lost the registry"))
+                self.pending.clear()
+
+    async def read_replies(self, reader: asyncio.StreamReader):
+        while True:
+            try:
+                line = await reader.readline()
+            except ConnectionError:
+                return
+            if not line:
+                return
+            reply = json.loads(line)
+            future = self.pending.pop(reply["id"], None)
+            if future is None or future.done():
+                # a claim granted after its session stopped waiting
+                result = reply.get("result")
+                if isinstance(result, dict) and "token" in result:
+                    self.release(result["token"])
+            elif "error" in reply:
+                future.set_exception(RuntimeError(reply["error"]))
+            else:
+                future.set_result(reply["result"])
+
+    async def call(self, operation: str, **arguments) -> typing.Any:
+        """Make a request and wait for its result.
+        Raises ConnectionError if the registry can't be reached"""
+        if self.writer is None:
+            raise ConnectionError("not connected to the registry")
+        request_id = next(self.ids)
+        future = asyncio.get_event_loop().create_future()
+        self.pending[request_id] = future
+        self.writer.write(
+            encode({"id": request_id, "op": operation, "args": arguments})
+        )
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        finally:
+            self.pending.pop(request_id, None)
+
+    def send(self, operation: str, **arguments) -> bool:
+        """Make a request without waiting for it; returns whether it was sent"""
+        if self.writer is None:
+            return False
+        self.writer.write(encode({"op": operation, "args": arguments}))
+        return True
+
+    async def claim(
+        self, user_id: int, guild_id: typing.Optional[int], kind: str
+    ) -> typing.Optional[int]:
+        """Claim a capped session, waiting for room if need be. Returns a token
+        for `release`, or None if the registry couldn't be asked.
+        Raises SessionLimitReached if the limits don't leave room for it"""
+        try:
+            result = await self.call(
+                "claim", user_id=user_id, guild_id=guild_id, kind=kind
+            )
+        except (ConnectionError, asyncio.TimeoutError):
+            return None
+        if "refused" in result:
+            raise SessionLimitReached(result["refused"])
+        return result["token"]
+
+    def release(self, token: int):
+        self.send("release", token=token)
+
+    def record(self, result: Result):
+        """Send a result to be saved and put on the leaderboards; never waits"""
+        message = {"op": "record", "args": {"result": result._asdict()}}
+        if self.writer is None:
+            self.backlog.append(encode(message))
+        else:
+            self.writer.write(encode(message))
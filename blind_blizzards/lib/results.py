@@ -0,0 +1,231 @@
+import asyncio
+import collections
+import concurrent.futures
+import json
+import sqlite3
+import sys
+import time
+import traceback
+import typing
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    title TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    guild_id INTEGER,
+    outcome TEXT NOT NULL,
+    score TEXT,
+    answers TEXT NOT NULL,
+    duration REAL NOT NULL,
+    seed TEXT NOT NULL,
+    finished REAL NOT NULL,
+    length INTEGER,
+    sampling TEXT
+);
+CREATE INDEX IF NOT EXISTS results_by_title ON results (kind, title);
+CREATE INDEX IF NOT EXISTS results_by_user ON results (user_id);
+"""
+
+INSERT = """
+INSERT INTO results
+    (kind, title, user_id, guild_id, outcome, score, answers, duration, seed, finished,
+     length, sampling)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# columns added since the table was first made, which older databases lack
+ADDED_COLUMNS = {"length": "INTEGER", "sampling": "TEXT"}
+
+
+def upgrade(connection: sqlite3.Connection):
+    """Add any columns an older database is missing"""
+    have = {row[1] for row in connection.execute("PRAGMA table_info(results)")}
+    for name, kind in ADDED_COLUMNS.items():
+        if name not in have:
+            try:
+                connection.execute(f"ALTER TABLE results ADD COLUMN {name} {kind}")
+            except sqlite3.OperationalError:
+                # another connection added it first, or there's no table yet
+                pass
+
+
+class Result(typing.NamedTuple):
+    """The outcome of one finished (or cancelled) session"""
+
+    # "quiz", "test" or "game"
+    kind: str
+    title: str
+    user_id: int
+    guild_id: typing.Optional[int]
+    # "finished" or "cancelled"
+    outcome: str
+    # the final score, alignment or end node; None if it didn't finish
+    score: typing.Any
+    # one entry per question answered, in the order they were shown
+    answers: typing.List[dict]
+    # seconds from the session starting to its end
+    duration: float
+    # replays the session's order (see lib.permutations.SessionShuffle)
+    seed: int
+    finished: float
+    # for quizzes asking only some of their questions: how many, and how
+    # they were picked (see lib.sampling). None for the whole quiz
+    length: typing.Optional[int] = None
+    sampling: typing.Optional[str] = None
+
+    def row(self) -> tuple:
+        return (
+            self.kind,
+            self.title,
+            self.user_id,
+            self.guild_id,
+            self.outcome,
+            None if self.score is None else json.dumps(self.score),
+            json.dumps(self.answers, separators=(",", ":")),
+            self.duration,
+            # seeds are 64 bit unsigned, which SQLite integers can't hold
+            str(self.seed),
+            self.finished,
+            self.length,
+            self.sampling,
+        )
+
+
+class ResultStore:
+    """Saves session results to SQLite without blocking the event loop.
+
+    `record` only puts the result on a queue. A writer task takes
+    everything that's queued (up to `batch_size` at a time) and inserts it
+    in one transaction on a dedicated thread, so under load many results
+    share a commit. The database uses WAL mode, so reads (leaderboards,
+    exports) don't wait on writes.
+
+    Parameters
+    ----------
+    path: str
+        The database file
+    batch_size: int
+        The most results written per transaction
+    max_pending: int
+        How many results may be waiting before new ones are dropped
+        (and counted), so a stuck disk can't use up all our memory
+
+    Attributes
+    ----------
+    written: int
+        Results saved so far
+    batches: int
+        Transactions committed so far
+    dropped: int
+        Results that were lost, because the queue was full or a write failed
+    latencies: typing.Deque[float]
+        Seconds from `record` to commit for recent results
+    """
+
+    def __init__(self, path: str, batch_size: int = 500, max_pending: int = 100_000):
+        self.path = path
+        self.batch_size = batch_size
+        self.queue: asyncio.Queue = asyncio.Queue(max_pending)
+        # sqlite connections belong to the thread that made them
+        self.executor = concurrent.futures.ThreadPoolExecutor(1, "results")
+        self.connection: typing.Optional[sqlite3.Connection] = None
+        self.task: typing.Optional[asyncio.Task] = None
+
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.latencies: typing.Deque[float] = collections.deque(maxlen=10_000)
+
+    async def run_in_writer(self, func: typing.Callable, *args) -> typing.Any:
+        return await asyncio.get_event_loop().run_in_executor(
+            self.executor, func, *args
+        )
+
+    def connect(self):
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        # in WAL mode this is still safe against corruption, and only
+        # risks the last few commits on power loss
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        upgrade(self.connection)
+
+    async def start(self):
+        """Open the database and start the writer"""
+        if self.task is None:
+            await self.run_in_writer(self.connect)
+            self.task = asyncio.ensure_future(self.write_forever())
+
+    async def close(self):
+        """Write everything that's queued, then close the database"""
+        if self.task is not None:
+            await self.queue.join()
+            self.task.cancel()
+            self.task = None
+        if self.connection is not None:
+            await self.run_in_writer(self.connection.close)
+            self.connection = None
+        self.executor.shutdown(wait=False)
+
+    def record(self, result: Result):
+        """Queue a result to be saved; never waits"""
+        try:
+            self.queue.put_nowait((time.monotonic(), result))
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def take_batch(self) -> typing.List[typing.Tuple[float, Result]]:
+        batch = []
+        while len(batch) < self.batch_size and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def write_forever(self):
+        while True:
+            batch = [await self.queue.get()]
+            batch.extend(self.take_batch())
+            try:
+                await self.write_batch(batch)
+            finally:
+                # or close() would wait on queue.join() forever
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def write_batch(self, batch: typing.List[typing.Tuple[float, Result]]):
+        try:
+            await self.run_in_writer(self.insert, [result.row() for _, result in batch])
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            # e.g. the disk is full, or a result that can't be saved;
+            # nobody is waiting on the write, so log it, count it and go on
+            self.dropped += len(batch)
+            print(f"Dropped {len(batch)} results:", file=sys.stderr)
+            traceback.print_exception(
+                type(exc), exc, exc.__traceback__, file=sys.stderr
+            )
+            return
+        done = time.monotonic()
+        self.latencies.extend(done - queued for queued, _ in batch)
+        self.written += len(batch)
+        self.batches += 1
+
+    def insert(self, rows: typing.List[tuple]):
+        with self.connection:
+            self.connection.executemany(INSERT, rows)
+
+    def stats(self) -> typing.Dict[str, float]:
+        """Queue depth, throughput and write latency figures"""
+        times = sorted(self.latencies)
+        return {
+            "pending": self.queue.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "mean_batch": self.written / self.batches if self.batches else 0.0,
+            "latency_median": times[len(times) // 2] if times else 0.0,
+            "latency_p95": times[int(len(times) * 0.95)] if times else 0.0,
+            "latency_max": times[-1] if times else 0.0,
+        }
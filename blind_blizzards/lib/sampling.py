@@ -0,0 +1,252 @@
+import asyncio
+import json
+import random
+import sqlite3
+import time
+import typing
+from array import array
+
+from discord.ext import commands
+
+from .permutations import LazyPermutation
+from .results import Result
+
+# the ways `take_quiz` can pick a quiz's questions
+SAMPLINGS = ("uniform", "stratified", "weighted")
+
+LOAD_QUERY = """
+SELECT title, answers
+FROM results
+WHERE kind = 'quiz'
+"""
+
+
+def sampling_options(text: str) -> typing.Tuple[str, typing.Optional[int], str]:
+    """Take `length:<number>` and `sample:<way>` out of a quiz request,
+    like the `tag:` of listings. Returns the rest (the title), the length
+    and the sampling. A word is only an option with the colon, so titles
+    like "Sample questions" can still be asked for"""
+    length = None
+    sampling = "uniform"
+    words = []
+    for word in text.split():
+        option, separator, value = word.partition(":")
+        option = option.lower() if separator else None
+        if option == "length":
+            if not value.isdigit() or int(value) < 1:
+                raise commands.BadArgument(f"{value!r} isn't a number of questions")
+            length = int(value)
+        elif option == "sample":
+            if value.lower() not in SAMPLINGS:
+                raise commands.BadArgument(
+                    f"{value!r} isn't a way to pick questions;"
+                    f" try {', '.join(SAMPLINGS)}"
+                )
+            sampling = value.lower()
+        else:
+            words.append(word)
+    return " ".join(words), length, sampling
+
+
+class AliasTable:
+    """Draws indexes with probability proportional to their weights, in O(1)
+    per draw after O(n) setup (Vose's alias method).
+
+    Each index gets a slot; a draw picks a slot uniformly, then keeps it
+    with probability `keep[slot]`, or takes the slot's `alias` instead.
+
+    Parameters
+    ----------
+    weights: typing.Sequence[float]
+        One non-negative weight per index, not all zero
+    """
+
+    __slots__ = ("keep", "alias")
+
+    def __init__(self, weights: typing.Sequence[float]):
+        count = len(weights)
+        total = sum(weights)
+        if not count or total <= 0:
+            raise ValueError("an alias table needs a positive total weight")
+        # each weight scaled so that the average is 1
+        scaled = array("d", (weight * count / total for weight in weights))
+        self.keep = array("d", bytes(8 * count))
+        self.alias = array("I", range(count))
+        small = [index for index in range(count) if scaled[index] < 1.0]
+        large = [index for index in range(count) if scaled[index] >= 1.0]
+        while small and large:
+            less, more = small.pop(), large[-1]
+            # `less` is topped up to 1 with some of `more`
+            self.keep[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            if scaled[more] < 1.0:
+                small.append(large.pop())
+        # whatever is left is 1, give or take rounding
+        for index in small + large:
+            self.keep[index] = 1.0
+
+    def __len__(self) -> int:
+        return len(self.keep)
+
+    def draw(self, rng: random.Random) -> int:
+        slot = rng.randrange(len(self.keep))
+        return slot if rng.random() < self.keep[slot] else self.alias[slot]
+
+
+def uniform(count: int, amount: int, rng: random.Random) -> typing.List[int]:
+    """`amount` of `range(count)`, all equally likely, in a random order"""
+    return LazyPermutation(count, rng).take(amount)
+
+
+def stratified(
+    strata: typing.Mapping[str, typing.Sequence[int]], amount: int, rng: random.Random
+) -> typing.List[int]:
+    """`amount` indexes spread over the strata in proportion to their
+    sizes, e.g. a 20 question quiz from a bank that's half "easy" asks
+    10 easy questions. Each stratum is a precomputed array of indexes"""
+    total = sum(len(indexes) for indexes in strata.values())
+    if not total:
+        return []
+    amount = min(amount, total)
+    # each stratum's whole share, then the biggest remainders get one more
+    shares = {
+        name: divmod(amount * len(indexes), total) for name, indexes in strata.items()
+    }
+    counts = {name: whole for name, (whole, _rest) in shares.items()}
+    short = amount - sum(counts.values())
+    for name in sorted(shares, key=lambda name: shares[name][1], reverse=True)[:short]:
+        counts[name] += 1
+
+    picked = []
+    for name, indexes in strata.items():
+        picked.extend(
+            indexes[position]
+            for position in LazyPermutation(len(indexes), rng).take(counts[name])
+        )
+    # otherwise every question from one stratum would come before the next
+    rng.shuffle(picked)
+    return picked
+
+
+def weighted(table: AliasTable, amount: int, rng: random.Random) -> typing.List[int]:
+    """`amount` different indexes, each picked with probability in proportion
+    to its weight in `table` (among those not picked yet)"""
+    count = len(table)
+    amount = min(amount, count)
+    picked = []
+    seen = set()
+    # repeats are thrown away; if a few heavy weights keep coming up,
+    # give up after a while and fill in uniformly
+    for _attempt in range(20 * amount):
+        if len(picked) == amount:
+            return picked
+        index = table.draw(rng)
+        if index not in seen:
+            seen.add(index)
+            picked.append(index)
+    for index in LazyPermutation(count, rng):
+        if len(picked) == amount:
+            break
+        if index not in seen:
+            seen.add(index)
+            picked.append(index)
+    return picked
+
+
+def read_answers(path: str, batch_size: int = 10_000) -> typing.Dict[str, dict]:
+    """Count, per quiz and question, how often each question was answered
+    and answered wrong. Runs on a worker thread"""
+    counts: typing.Dict[str, typing.Dict[int, typing.List[int]]] = {}
+    connection = sqlite3.connect(path)
+    try:
+        cursor = connection.execute(LOAD_QUERY)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for title, answers in rows:
+                add_answers(counts.setdefault(title, {}), json.loads(answers))
+    except sqlite3.OperationalError:
+        # no results table yet
+        pass
+    finally:
+        connection.close()
+    return counts
+
+
+def add_answers(counts: typing.Dict[int, typing.List[int]], answers: typing.List[dict]):
+    for answer in answers:
+        entry = counts.get(answer["question"])
+        if entry is None:
+            entry = counts[answer["question"]] = [0, 0]
+        entry[0] += 1
+        if not answer["correct"]:
+            entry[1] += 1
+
+
+class AnswerStats:
+    """How often each quiz question has been answered wrong, for picking
+    the questions people find hard more often.
+
+    Counts are rebuilt from the results database at startup, then kept up
+    to date as quizzes end (cancelled ones included, as their answers
+    count just the same). A quiz's alias table is rebuilt from the counts
+    at most every `max_age` seconds, as that's O(questions).
+
+    Parameters
+    ----------
+    max_age: float
+        How many seconds an alias table is used for before it's rebuilt
+    """
+
+    def __init__(self, max_age: float = 300.0):
+        self.max_age = max_age
+        # quiz title -> question index -> [times answered, times wrong]
+        self.counts: typing.Dict[str, typing.Dict[int, typing.List[int]]] = {}
+        # quiz title -> (when it was built, question count, table)
+        self.tables: typing.Dict[str, typing.Tuple[float, int, AliasTable]] = {}
+        self.loading = False
+        self.backlog: typing.List[Result] = []
+
+    def add(self, result: Result):
+        if result.kind != "quiz":
+            return
+        if self.loading:
+            self.backlog.append(result)
+            return
+        add_answers(self.counts.setdefault(result.title, {}), result.answers)
+
+    async def load(self, path: str):
+        """Rebuild the counts from the results database"""
+        self.loading = True
+        try:
+            self.counts = await asyncio.get_event_loop().run_in_executor(
+                None, read_answers, path
+            )
+        finally:
+            self.loading = False
+            backlog, self.backlog = self.backlog, []
+            for result in backlog:
+                self.add(result)
+
+    def weights(self, title: str, count: int) -> array:
+        """Each question's chance of being answered wrong, smoothed so
+        questions nobody has answered yet count as even odds"""
+        weights = array("d", [0.5]) * count
+        # copied, as this may run on a worker thread while results come in
+        for index, (answered, wrong) in list(self.counts.get(title, {}).items()):
+            if index < count:
+                weights[index] = (wrong + 1) / (answered + 2)
+        return weights
+
+    def alias_table(self, title: str, count: int) -> AliasTable:
+        """The quiz's alias table, rebuilt if it's old or the quiz has
+        changed size. O(questions) when rebuilt, so call it off the loop"""
+        cached = self.tables.get(title)
+        now = time.monotonic()
+        if cached is not None and cached[1] == count and now - cached[0] < self.max_age:
+            return cached[2]
+        table = AliasTable(self.weights(title, count))
+        self.tables[title] = now, count, table
+        return table
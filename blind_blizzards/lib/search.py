@@ -0,0 +1,229 @@
+import functools
+import heapq
+import typing
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from fuzzywuzzy import fuzz, utils
+
+# (title, score) pairs, best first
+Matches = typing.List[typing.Tuple[str, int]]
+
+# sorts after any character a processed title can have, to end prefix ranges
+LAST_CHARACTER = chr(0x10FFFF)
+
+
+def trigrams(text: str) -> typing.Set[str]:
+    """The set of three-character substrings of a padded, processed string"""
+    padded = f"  {text} "
+    return {a + b + c for a, b, c in zip(padded, padded[1:], padded[2:])}
+
+
+class TitleIndex:
+    """A prebuilt index for fuzzy title lookup.
+
+    Exact matches and prefixes are found without any fuzzy scoring.
+    Otherwise titles sharing the most trigrams with the query are
+    gathered, and only those get scored with `fuzz.WRatio` (the scorer
+    `process.extractOne` uses). Results are kept in an LRU cache.
+
+    Parameters
+    ----------
+    titles: typing.Iterable[str]
+        The titles to index
+    candidates: int
+        How many titles get fully scored per lookup
+    max_postings: int
+        Roughly how many trigram postings to count per lookup; the rarest
+        trigrams are counted first, so very common ones get skipped
+    cache_size: int
+        How many lookups to remember
+    tags: typing.Optional[typing.Mapping[str, typing.Iterable[str]]]
+        Each title's tags, for listing only the titles with a tag
+    """
+
+    def __init__(
+        self,
+        titles: typing.Iterable[str],
+        candidates: int = 64,
+        max_postings: int = 20_000,
+        cache_size: int = 1024,
+        tags: typing.Mapping[str, typing.Iterable[str]] = None,
+    ):
+        self.titles: typing.List[str] = list(titles)
+        self.candidates = candidates
+        self.max_postings = max_postings
+
+        processed = [utils.full_process(title) for title in self.titles]
+        # processed title to index, for the exact match fast path
+        self.exact: typing.Dict[str, int] = {}
+        for index, title in enumerate(processed):
+            self.exact.setdefault(title, index)
+        # sorted processed titles, for the prefix fast path
+        self.ordered: typing.List[typing.Tuple[str, int]] = sorted(
+            (title, index) for index, title in enumerate(processed)
+        )
+        # trigram to the indexes of the titles containing it
+        self.postings: typing.Dict[str, array] = {}
+        for index, title in enumerate(processed):
+            for gram in trigrams(title):
+                self.postings.setdefault(gram, array("I")).append(index)
+        # tag to the positions in `ordered` of the titles with it, ascending
+        self.tagged: typing.Dict[str, array] = {}
+        if tags:
+            for position, (_title, index) in enumerate(self.ordered):
+                for tag in tags.get(self.titles[index], ()):
+                    self.tagged.setdefault(tag.casefold(), array("I")).append(position)
+
+        self.lookup = functools.lru_cache(cache_size)(self._lookup)
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def prefixed(self, query: str, limit: int) -> typing.List[int]:
+        """Indexes of up to `limit` titles starting with the processed query"""
+        found = []
+        position = bisect_left(self.ordered, (query, -1))
+        while position < len(self.ordered) and len(found) < limit:
+            title, index = self.ordered[position]
+            if not title.startswith(query):
+                break
+            found.append(index)
+            position += 1
+        return found
+
+    def candidate_indexes(self, query: str) -> typing.Set[int]:
+        """The titles worth scoring: prefix matches, then trigram overlap"""
+        found = set(self.prefixed(query, self.candidates))
+
+        grams = [gram for gram in trigrams(query) if gram in self.postings]
+        # count the rarest trigrams first, and stop before the common ones
+        # blow the budget
+        grams.sort(key=lambda gram: len(self.postings[gram]))
+        shared = Counter()
+        visited = 0
+        for gram in grams:
+            posting = self.postings[gram]
+            if shared and visited + len(posting) > self.max_postings:
+                break
+            shared.update(posting)
+            visited += len(posting)
+
+        for index, _count in heapq.nlargest(
+            self.candidates, shared.items(), key=lambda item: item[1]
+        ):
+            found.add(index)
+        return found
+
+    def _lookup(self, query: str, limit: int) -> typing.Tuple[typing.Tuple[str, int]]:
+        processed = utils.full_process(query)
+        if not processed:
+            return ()
+
+        # an exact match can't be beaten
+        if processed in self.exact:
+            return ((self.titles[self.exact[processed]], 100),)
+
+        indexes = self.candidate_indexes(processed)
+        if not indexes and len(self.titles) <= self.candidates:
+            # nothing in common, but there are few enough titles to check them all
+            indexes = range(len(self.titles))
+
+        scored = [
+            (self.titles[index], fuzz.WRatio(processed, self.titles[index]))
+            for index in indexes
+        ]
+        return tuple(heapq.nlargest(limit, scored, key=lambda item: item[1]))
+
+    def search(self, query: str, limit: int = 5) -> Matches:
+        """The best `limit` titles for a query, with their scores"""
+        return list(self.lookup(query, limit))
+
+    def best(self, query: str) -> typing.Optional[typing.Tuple[str, int]]:
+        """The best title for a query and its score, or None if nothing is close"""
+        matches = self.lookup(query, 1)
+        return matches[0] if matches else None
+
+    def did_you_mean(self, query: str, limit: int = 5) -> typing.List[str]:
+        """Titles to suggest when a query doesn't match well"""
+        return [title for title, _score in self.lookup(query, limit)]
+
+    def span(self, prefix: str = "") -> typing.Tuple[int, int]:
+        """The start and end positions in `ordered` of the titles starting
+        with the processed prefix; every title if there's no prefix"""
+        processed = utils.full_process(prefix) if prefix else ""
+        if not processed:
+            return 0, len(self.ordered)
+        return (
+            bisect_left(self.ordered, (processed, -1)),
+            bisect_left(self.ordered, (processed + LAST_CHARACTER, -1)),
+        )
+
+    def listing(
+        self, prefix: str = "", tag: str = None, per_page: int = 15
+    ) -> "TitlePages":
+        """The titles starting with `prefix` (and with `tag`, if given), in pages"""
+        start, stop = self.span(prefix)
+        if tag is None:
+            return TitlePages(self, range(len(self.ordered)), start, stop, per_page)
+        # positions are ascending, so the prefix's titles are a slice of them
+        positions = self.tagged.get(tag.casefold(), array("I"))
+        return TitlePages(
+            self,
+            positions,
+            bisect_left(positions, start),
+            bisect_left(positions, stop),
+            per_page,
+        )
+
+
+class TitlePages(typing.Sequence[typing.List[str]]):
+    """Pages of titles from a TitleIndex, in sorted order.
+
+    Each page is looked up when it's asked for, so this is the same size
+    however many titles there are.
+
+    Parameters
+    ----------
+    index: TitleIndex
+        The index to list titles from
+    positions: typing.Sequence[int]
+        Positions in the index's `ordered` list, ascending
+    start: int
+        The first of `positions` to list
+    stop: int
+        Where to stop listing `positions`
+    per_page: int
+        How many titles go on a page
+    """
+
+    __slots__ = ("index", "positions", "start", "total", "per_page")
+
+    def __init__(
+        self,
+        index: TitleIndex,
+        positions: typing.Sequence[int],
+        start: int,
+        stop: int,
+        per_page: int = 15,
+    ):
+        self.index = index
+        self.positions = positions
+        self.start = start
+        self.total = max(stop - start, 0)
+        self.per_page = per_page
+
+    def __len__(self) -> int:
+        # an empty listing still has a page, to say there's nothing
+        return max(-(-self.total // self.per_page), 1)
+
+    def __getitem__(self, page: int) -> typing.List[str]:
+        if not 0 <= page < len(self):
+            raise IndexError(page)
+        first = self.start + page * self.per_page
+        last = min(first + self.per_page, self.start + self.total)
+        return [
+            self.index.titles[self.index.ordered[self.positions[position]][1]]
+            for position in range(first, last)
+        ]
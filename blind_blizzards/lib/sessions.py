@@ -0,0 +1,198 @@
+import asyncio
+import collections
+import contextlib
+import time
+import typing
+
+from discord.ext import commands
+
+if typing.TYPE_CHECKING:
+    from lib.registry import RegistryClient
+
+
+class SessionLimitReached(commands.CommandError):
+    """Raised when a session can't be started because too many are running"""
+
+
+class Session:
+    """One running interactive session (a quiz, test, game or help menu)"""
+
+    __slots__ = ("kind", "user_id", "guild_id", "task", "started", "capped")
+
+    def __init__(
+        self,
+        kind: str,
+        user_id: int,
+        guild_id: typing.Optional[int],
+        # None for sessions running in another process (see lib.registry)
+        task: typing.Optional[asyncio.Task],
+        capped: bool,
+    ):
+        self.kind = kind
+        self.user_id = user_id
+        self.guild_id = guild_id
+        self.task = task
+        self.started = time.monotonic()
+        self.capped = capped
+
+
+class SessionManager:
+    """Keeps track of every running session, and limits how many there are.
+
+    Parameters
+    ----------
+    idle_timeout: float
+        Seconds a session may wait for its user before it's ended
+    per_user: int
+        The most sessions one user may have running
+    per_guild: int
+        The most sessions one guild may have running
+    total: int
+        The most sessions that may run at once
+    queue_timeout: float
+        When a guild (or the bot) is full, how long a new session waits
+        for room before giving up
+
+    registry: typing.Optional[RegistryClient] (see lib.registry)
+        When running as one of several shards, the launcher's registry,
+        which applies the limits across every shard. While it can't be
+        reached, the limits are applied to this shard alone
+
+    Sessions started with `capped=False` (like help menus) are counted,
+    but don't count towards or wait on the limits.
+    """
+
+    def __init__(
+        self,
+        idle_timeout: float = 300.0,
+        per_user: int = 2,
+        per_guild: int = 50,
+        total: int = 1000,
+        queue_timeout: float = 10.0,
+        registry: "RegistryClient" = None,
+    ):
+        self.idle_timeout = idle_timeout
+        self.per_user = per_user
+        self.per_guild = per_guild
+        self.total = total
+        self.queue_timeout = queue_timeout
+        self.registry = registry
+
+        self.sessions: typing.Set[Session] = set()
+        self.by_user: typing.Counter[int] = collections.Counter()
+        self.by_guild: typing.Counter[typing.Optional[int]] = collections.Counter()
+        self.capped = 0
+        self.queued = 0
+        self.room = asyncio.Condition()
+
+    def has_room(self, guild_id: typing.Optional[int]) -> bool:
+        """Whether a capped session could start in this guild right now"""
+        if self.capped >= self.total:
+            return False
+        return guild_id is None or self.by_guild[guild_id] < self.per_guild
+
+    @contextlib.asynccontextmanager
+    async def session(self, ctx: commands.Context, kind: str, capped: bool = True):
+        """Run the body as a registered session of `kind`.
+        Raises SessionLimitReached if the limits don't leave room for it"""
+        user_id = ctx.author.id
+        guild_id = ctx.guild.id if ctx.guild is not None else None
+
+        token = None
+        if capped:
+            if self.registry is not None and self.registry.connected:
+                # the limits cover every shard, so the registry decides
+                token = await self.registry.claim(user_id, guild_id, kind)
+            if token is None:
+                await self.admit(user_id, guild_id)
+
+        session = Session(kind, user_id, guild_id, asyncio.current_task(), capped)
+        self.add(session)
+        try:
+            yield session
+        finally:
+            if token is not None:
+                self.registry.release(token)
+            await self.finish(session)
+
+    async def admit(self, user_id: int, guild_id: typing.Optional[int]):
+        """Wait until the limits leave room for a capped session.
+        Raises SessionLimitReached if they don't"""
+        self.check_user(user_id)
+        if not self.has_room(guild_id):
+            # wait in line for a while before giving up
+            self.queued += 1
+            try:
+                async with self.room:
+                    await asyncio.wait_for(
+                        self.room.wait_for(lambda: self.has_room(guild_id)),
+                        self.queue_timeout,
+                    )
+            except asyncio.TimeoutError:
+                raise SessionLimitReached(
+                    "Too many sessions are running right now; try again in a bit."
+                )
+            finally:
+                self.queued -= 1
+            # their other requests may have started while this one waited
+            self.check_user(user_id)
+
+    def check_user(self, user_id: int):
+        """Raises SessionLimitReached if the user can't start another session"""
+        if self.by_user[user_id] >= self.per_user:
+            raise SessionLimitReached(
+                f"You already have {self.by_user[user_id]} session(s) running;"
+                " finish or cancel one of them first."
+            )
+
+    async def finish(self, session: Session):
+        """Remove a session and let anyone waiting for room know"""
+        self.remove(session)
+        if session.capped:
+            async with self.room:
+                self.room.notify_all()
+
+    def add(self, session: Session):
+        self.sessions.add(session)
+        if session.capped:
+            self.by_user[session.user_id] += 1
+            self.by_guild[session.guild_id] += 1
+            self.capped += 1
+
+    def remove(self, session: Session):
+        self.sessions.discard(session)
+        if session.capped:
+            self.by_user[session.user_id] -= 1
+            self.by_guild[session.guild_id] -= 1
+            self.capped -= 1
+            # don't keep a count around for everyone who ever played
+            if not self.by_user[session.user_id]:
+                del self.by_user[session.user_id]
+            if not self.by_guild[session.guild_id]:
+                del self.by_guild[session.guild_id]
+
+    def cancel_all(self, kinds: typing.Iterable[str] = None):
+        """Cancel every running session, or those of the given kinds, e.g.
+        because the cog running them is unloading. Each one cleans up after
+        itself as it unwinds"""
+        kinds = None if kinds is None else set(kinds)
+        for session in list(self.sessions):
+            if kinds is not None and session.kind not in kinds:
+                continue
+            if session.task is not None:
+                session.task.cancel()
+
+    def counts(self) -> typing.Dict[str, int]:
+        """Live session counts, overall and by kind"""
+        counts = collections.Counter(session.kind for session in self.sessions)
+        counts["total"] = len(self.sessions)
+        counts["queued"] = self.queued
+        return dict(counts)
+
+
+def get_session_manager(bot) -> SessionManager:
+    """Get the bot's session manager, creating it on first use"""
+    manager = getattr(bot, "session_manager", None)
+    if manager is None:
+        manager = bot.session_manager = SessionManager()
+    return manager
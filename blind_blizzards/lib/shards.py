@@ -0,0 +1,90 @@
+import asyncio
+import time
+import typing
+
+
+class ShardSupervisor:
+    """Runs every shard in its own process, and restarts any that crash.
+
+    Each shard is watched separately, so one crashing (or crash looping)
+    leaves the rest running. A shard that exits with status 0 has been
+    shut down on purpose and isn't restarted.
+
+    Parameters
+    ----------
+    command: typing.Callable[[int, int], typing.List[str]]
+        The command line that runs a shard, given its shard ID and how
+        many times it has been restarted
+    shard_count: int
+        How many shards to run
+    min_uptime: float
+        A shard that crashes sooner than this after starting waits longer
+        before each restart, up to `max_delay` seconds
+    max_delay: float
+        The longest to wait before restarting a shard
+    """
+
+    def __init__(
+        self,
+        command: typing.Callable[[int, int], typing.List[str]],
+        shard_count: int,
+        min_uptime: float = 60.0,
+        max_delay: float = 60.0,
+    ):
+        self.command = command
+        self.shard_count = shard_count
+        self.min_uptime = min_uptime
+        self.max_delay = max_delay
+        self.processes: typing.Dict[int, asyncio.subprocess.Process] = {}
+        self.restarts: typing.Dict[int, int] = {}
+        self.stopping = False
+
+    async def run(self):
+        """Run every shard until they've all stopped"""
+        await asyncio.gather(
+            *(self.watch(shard_id) for shard_id in range(self.shard_count))
+        )
+
+    async def watch(self, shard_id: int):
+        """Run one shard, restarting it whenever it crashes"""
+        # doubled before the first wait, so that's a second
+        delay = 0.5
+        self.restarts[shard_id] = 0
+        while not self.stopping:
+            process = await asyncio.create_subprocess_exec(
+                *self.command(shard_id, self.restarts[shard_id])
+            )
+            self.processes[shard_id] = process
+            started = time.monotonic()
+            code = await process.wait()
+            del self.processes[shard_id]
+            if self.stopping or code == 0:
+                return
+
+            # back off if it keeps crashing straight away
+            if time.monotonic() - started < self.min_uptime:
+                delay = min(delay * 2, self.max_delay)
+            else:
+                delay = 1.0
+            self.restarts[shard_id] += 1
+            print(
+                f"Shard {shard_id} exited with status {code};"
+                f" restarting in {delay:.0f}s",
+                flush=True,
+            )
+            await asyncio.sleep(delay)
+
+    async def stop(self, timeout: float = 10.0):
+        """Ask every shard to stop, and kill any that don't in time"""
+        self.stopping = True
+        processes = list(self.processes.values())
+        for process in processes:
+            process.terminate()
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(process.wait() for process in processes)), timeout
+            )
+        except asyncio.TimeoutError:
+            for process in processes:
+                if process.returncode is None:
+                    process.kill()
@@ -0,0 +1,81 @@
+import asyncio
+import contextlib
+import time
+import typing
+
+# as near to the process starting as we can get; bot.py imports this first
+STARTED = time.perf_counter()
+
+
+class StartupTimer:
+    """How long each phase of startup took, measured from `origin`.
+
+    Phases may overlap (content compiles while the gateway connects), so
+    each one is kept with its own start time. Phases still running are
+    counted, so `settled` can wait for the background ones to finish."""
+
+    def __init__(self, origin: float = None):
+        self.origin = STARTED if origin is None else origin
+        # (phase, seconds from origin to its start, seconds it took)
+        self.phases: typing.List[typing.Tuple[str, float, float]] = []
+        self.running = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+    def record(self, name: str, start: float, end: float = None):
+        """Record a phase that ran from `start` to `end` (or now), as perf_counter times"""
+        end = time.perf_counter() if end is None else end
+        self.phases.append((name, start - self.origin, end - start))
+
+    def mark(self, name: str):
+        """Record a moment, like the bot becoming ready"""
+        self.record(name, time.perf_counter())
+
+    def begin(self, name: str) -> typing.Tuple[str, float]:
+        """Start timing a phase; pass what this returns to `end`"""
+        self.running += 1
+        self.idle.clear()
+        return name, time.perf_counter()
+
+    def end(self, started: typing.Tuple[str, float]):
+        name, start = started
+        self.record(name, start)
+        self.running -= 1
+        if not self.running:
+            self.idle.set()
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """Time the body as a phase"""
+        started = self.begin(name)
+        try:
+            yield
+        finally:
+            self.end(started)
+
+    async def settled(self):
+        """Wait until no phase is running"""
+        await self.idle.wait()
+
+    def report(self) -> typing.List[typing.Dict[str, typing.Any]]:
+        """Every phase so far, in the order they started"""
+        return [
+            {"phase": name, "start": start, "seconds": seconds}
+            for name, start, seconds in sorted(self.phases, key=lambda phase: phase[1])
+        ]
+
+    def format(self) -> str:
+        """The report as a table"""
+        return "\n".join(
+            f"{phase['phase']:<16} at {phase['start']:7.3f}s"
+            f" took {phase['seconds']:7.3f}s"
+            for phase in self.report()
+        )
+
+
+def get_startup_timer(bot) -> StartupTimer:
+    """Get the bot's startup timer, creating it on first use"""
+    timer = getattr(bot, "startup", None)
+    if timer is None:
+        timer = bot.startup = StartupTimer()
+    return timer
@@ -1,5 +1,13 @@
+import typing
+
 from data.typing import Number
 
+# batch mapping is unavailable without numpy
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 def value_map(
     unmapped: Number,
@@ -28,3 +36,42 @@ def value_map(
 
     # return the mapped value
     return value
+
+
+def value_map_batch(
+    unmapped: typing.Any,
+    min_start: Number,
+    max_start: Number,
+    min_end: Number,
+    max_end: Number,
+    out: "numpy.ndarray" = None,
+) -> "numpy.ndarray":
+    """`value_map` for many numbers at once: a numpy array, `array.array`,
+    or anything else numpy can read as an array. Returns a float64 array
+    (or fills in `out`).
+
+    The steps happen in the same order as in `value_map`, so the results
+    are the same as mapping each number on its own. For integers this
+    holds as long as `(unmapped - min_start) * (max_end - min_end)` fits
+    in 53 bits, the same as for a float."""
+    if numpy is None:
+        raise RuntimeError("numpy is needed to map values in bulk")
+    values = numpy.asarray(unmapped)
+    original_width = max_start - min_start
+    target_width = max_end - min_end
+
+    if values.dtype.kind in "iub" and all(
+        isinstance(bound, int) for bound in (min_start, min_end, target_width)
+    ):
+        # like Python ints, keep these exact until the division
+        value = values.astype(numpy.int64)
+        value -= min_start
+        value *= target_width
+        out = numpy.true_divide(value, original_width, out=out)
+    else:
+        out = numpy.subtract(values, min_start, out=out, dtype=numpy.float64)
+        out *= target_width
+        out /= original_width
+
+    out += min_end
+    return out
@@ -0,0 +1,137 @@
+import asyncio
+import collections
+import sys
+import threading
+import time
+import traceback
+import typing
+
+
+class Stall:
+    """A time the event loop was blocked, and what it was running"""
+
+    __slots__ = ("when", "stack", "seconds")
+
+    def __init__(self, when: float, stack: str):
+        # wall clock time it was noticed
+        self.when = when
+        self.stack = stack
+        # filled in once the loop gets going again
+        self.seconds: typing.Optional[float] = None
+
+
+class LoopWatchdog:
+    """Measures event loop lag, and catches whatever blocks the loop.
+
+    The loop runs a heartbeat every `interval`, and how late each one is
+    is the loop's lag. A thread keeps an eye on the heartbeat; when it's
+    more than `threshold` late, the loop is stuck in something, and the
+    thread takes the loop thread's stack to show what.
+
+    Parameters
+    ----------
+    loop: asyncio.AbstractEventLoop
+        The loop to watch
+    interval: float
+        Seconds between heartbeats
+    threshold: float
+        How many seconds late the heartbeat has to be to count as a stall
+    keep: int
+        How many recent stalls to keep
+    on_lag: typing.Optional[typing.Callable[[float], None]]
+        Called on the loop with every heartbeat's lag, in seconds
+    on_stall: typing.Optional[typing.Callable[[Stall], None]]
+        Called on the loop with each stall once it's over
+
+    Attributes
+    ----------
+    stalls: typing.Deque[Stall]
+        The most recent stalls, oldest first
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        interval: float = 0.1,
+        threshold: float = 0.25,
+        keep: int = 20,
+        on_lag: typing.Callable[[float], None] = None,
+        on_stall: typing.Callable[[Stall], None] = None,
+    ):
+        self.loop = loop
+        self.interval = interval
+        self.threshold = threshold
+        self.on_lag = on_lag
+        self.on_stall = on_stall
+        self.stalls: typing.Deque[Stall] = collections.deque(maxlen=keep)
+        # shared with the thread
+        self.lock = threading.Lock()
+        self.last_beat = time.monotonic()
+        self.stalled: typing.Optional[Stall] = None
+        self.loop_thread: typing.Optional[int] = None
+        self.stopped = threading.Event()
+        self.due = 0.0
+        self.handle: typing.Optional[asyncio.TimerHandle] = None
+        self.thread: typing.Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the heartbeat and the watching thread"""
+        self.stopped.clear()
+        self.due = self.loop.time()
+        # the first heartbeat notes which thread the loop runs in
+        self.handle = self.loop.call_soon(self.beat)
+        self.thread = threading.Thread(
+            target=self.watch, name="loop watchdog", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+
+    def beat(self):
+        """The heartbeat, run on the loop"""
+        now = self.loop.time()
+        lag = max(now - self.due, 0.0)
+        with self.lock:
+            self.loop_thread = threading.get_ident()
+            self.last_beat = time.monotonic()
+            stall, self.stalled = self.stalled, None
+        if stall is not None:
+            stall.seconds = lag
+            if self.on_stall is not None:
+                self.on_stall(stall)
+        if self.on_lag is not None:
+            self.on_lag(lag)
+        self.due = now + self.interval
+        self.handle = self.loop.call_at(self.due, self.beat)
+
+    def watch(self):
+        """Check on the heartbeat until stopped, in the watchdog's thread"""
+        while not self.stopped.wait(self.interval):
+            with self.lock:
+                late = time.monotonic() - self.last_beat - self.interval
+                if late < self.threshold or self.stalled is not None:
+                    continue
+                frame = sys._current_frames().get(self.loop_thread)
+                stack = "".join(traceback.format_stack(frame)) if frame else ""
+                # frames keep their locals alive
+                del frame
+                self.stalled = Stall(time.time(), stack)
+                self.stalls.append(self.stalled)
+
+    def format(self, count: int = 5, depth: int = 6) -> str:
+        """The last `count` stalls, with the innermost `depth` frames of each stack"""
+        reports = []
+        for stall in list(self.stalls)[-count:]:
+            seconds = (
+                "still stuck" if stall.seconds is None else f"{stall.seconds:.3f}s"
+            )
+            when = time.strftime("%H:%M:%S", time.localtime(stall.when))
+            # two lines per frame: where it is, then the line itself
+            innermost = -2 * depth
+            lines = stall.stack.rstrip().splitlines()[innermost:]
+            reports.append(f"{when}, {seconds}:\n" + "\n".join(lines))
+        return "\n\n".join(reports) or "No stalls."
@@ -0,0 +1,46 @@
+import json
+import os
+import tempfile
+import unittest
+
+from data.content import ContentStore
+
+QUIZ = {
+    "type": "quiz",
+    "title": "Rivers",
+    "questions": [{"text": "Longest?", "options": ["Nile", "Thames"], "correct": 0}],
+}
+
+
+class VanishingStore(ContentStore):
+    """Lists a file that's deleted before the scan gets to it"""
+
+    def content_files(self):
+        yield from super().content_files()
+        yield os.path.join(self.directory, "deleted.json")
+
+
+class ContentStoreTest(unittest.TestCase):
+    def test_file_deleted_during_scan(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "rivers.json"), "w") as file:
+                json.dump(QUIZ, file)
+            store = VanishingStore(directory, [], [])
+            catalogue = store.load()
+            self.assertEqual(list(catalogue.quizzes), ["Rivers"])
+            self.assertEqual(store.errors, {})
+
+    def test_deleted_file_is_dropped(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "rivers.json")
+            with open(path, "w") as file:
+                json.dump(QUIZ, file)
+            store = ContentStore(directory, [], [])
+            store.load()
+            os.remove(path)
+            self.assertEqual(store.scan(), (0, 1))
+            self.assertEqual(store.build_catalogue().quizzes, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import asyncio
+import time
+import unittest
+from types import SimpleNamespace
+
+from lib.edits import EditScheduler, FEEDBACK, COSMETIC
+
+
+def make_message(message_id: int, channel_id: int = 1):
+    return SimpleNamespace(id=message_id, channel=SimpleNamespace(id=channel_id))
+
+
+class EditSchedulerTest(unittest.TestCase):
+    def test_cosmetic_edits_not_held_in_quiet_channels(self):
+        async def run():
+            sent = []
+
+            async def send(message, fields):
+                sent.append(fields["content"])
+                await asyncio.sleep(0.01)
+
+            scheduler = EditScheduler(send, cosmetic_interval=10.0)
+            start = time.monotonic()
+            # three paginators in one channel, flipped at once
+            await asyncio.gather(
+                *(
+                    scheduler.submit(
+                        make_message(page), COSMETIC, content=f"page {page}"
+                    )
+                    for page in range(3)
+                )
+            )
+            self.assertEqual(sent, ["page 0", "page 1", "page 2"])
+            self.assertLess(time.monotonic() - start, 1.0)
+
+        asyncio.run(run())
+
+    def test_cosmetic_edits_spaced_in_busy_channels(self):
+        async def run():
+            scheduler = EditScheduler(
+                lambda message, fields: asyncio.sleep(0), cosmetic_interval=10.0
+            )
+            await scheduler.submit(make_message(1), FEEDBACK, content="question")
+            first = scheduler.submit(make_message(2), COSMETIC, content="page 1")
+            second = scheduler.submit(make_message(3), COSMETIC, content="page 2")
+            await first
+            await asyncio.sleep(0.05)
+            self.assertFalse(second.done())
+            # feedback still goes straight through
+            await asyncio.wait_for(
+                scheduler.submit(make_message(1), FEEDBACK, content="answer"), 1.0
+            )
+            scheduler.workers[1].cancel()
+
+        asyncio.run(run())
+
+    def test_cancelled_worker_cancels_waiters(self):
+        async def run():
+            async def send(message, fields):
+                await asyncio.sleep(10)
+
+            scheduler = EditScheduler(send)
+            in_flight = scheduler.submit(make_message(1), FEEDBACK, content="a")
+            queued = scheduler.submit(make_message(2), FEEDBACK, content="b")
+            await asyncio.sleep(0.01)
+            scheduler.workers[1].cancel()
+            await asyncio.sleep(0.01)
+            self.assertTrue(in_flight.cancelled())
+            self.assertTrue(queued.cancelled())
+            self.assertEqual(scheduler.pending, {})
+            self.assertEqual(scheduler.workers, {})
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+import discord
+
+from lib.paginator import Paginator
+from lib.reactions import get_router
+
+NEXT = "\N{BLACK RIGHT-POINTING TRIANGLE}"
+STOP = "\N{BLACK SQUARE FOR STOP}"
+
+
+class FakeMessage:
+    def __init__(self, channel, **fields):
+        self.id = 1000 + len(channel.sent)
+        self.channel = channel
+        self.fields = fields
+        self.edits = []
+        self.reactions = []
+
+    async def edit(self, **fields):
+        self.edits.append(fields)
+        self.fields.update(fields)
+
+    async def add_reaction(self, emoji):
+        self.reactions.append(emoji)
+
+    async def remove_reaction(self, emoji, user):
+        pass
+
+    async def clear_reactions(self):
+        self.reactions.clear()
+
+
+class FakeChannel:
+    id = 10
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, **fields):
+        message = FakeMessage(self, **fields)
+        self.sent.append(message)
+        return message
+
+
+class Numbers(Paginator):
+    async def prepare_embed(self, page: int):
+        self.embed = discord.Embed(title=f"Page {page + 1}")
+
+
+async def until(predicate, attempts: int = 200):
+    for _ in range(attempts):
+        if predicate():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("timed out waiting")
+
+
+class PaginateTest(unittest.TestCase):
+    def test_flip_and_stop(self):
+        asyncio.run(self.flip_and_stop())
+
+    async def flip_and_stop(self):
+        loop = asyncio.get_event_loop()
+        bot = SimpleNamespace(loop=loop, add_listener=lambda *args: None)
+        author = SimpleNamespace(id=1)
+        channel = FakeChannel()
+        ctx = SimpleNamespace(
+            author=author, channel=channel, message=None, guild=None, me=None
+        )
+        paginator = Numbers(bot, ctx, [[1], [2], [3]])
+        paginator_task = loop.create_task(paginator.paginate())
+
+        router = get_router(bot)
+        await until(lambda: len(router) == 1)
+        message = channel.sent[0]
+        self.assertEqual(message.fields["embed"].title, "Page 1")
+        self.assertEqual(bot.session_manager.counts()["pages"], 1)
+
+        def react(emoji):
+            reaction = SimpleNamespace(emoji=emoji, message=message)
+            self.assertTrue(router.dispatch(reaction, author))
+
+        react(NEXT)
+        await until(lambda: message.fields["embed"].title == "Page 2")
+        self.assertEqual(paginator.current_page, 1)
+
+        react(STOP)
+        await asyncio.wait_for(paginator_task, 5)
+        self.assertEqual(message.fields["content"], paginator.stopped_text)
+        self.assertIsNone(message.fields["embed"])
+        # the listener and the session are gone once it's stopped
+        self.assertEqual(len(router), 0)
+        self.assertEqual(bot.session_manager.counts()["total"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+
+import discord
+
+from data.render import EmbedCache
+
+
+def build() -> discord.Embed:
+    embed = discord.Embed(title="Question", colour=0x123456)
+    embed.add_field(name="A", value="First option")
+    embed.set_footer(text="Question 1 of 2")
+    embed.set_thumbnail(url="https://example.com/thumbnail.png")
+    return embed
+
+
+class EmbedCacheTest(unittest.TestCase):
+    def test_editing_an_embed_leaves_the_cache_alone(self):
+        cache = EmbedCache()
+        embed = cache.render("question", build)
+        embed.add_field(name="B", value="Second option")
+        embed.set_field_at(0, name="A", value="Changed")
+        embed.set_footer(text="Changed")
+        embed.set_thumbnail(url="https://example.com/changed.png")
+
+        again = cache.render("question", build)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(again.to_dict(), build().to_dict())
+
+    def test_patch(self):
+        cache = EmbedCache()
+        embed = cache.render("question", build, title="Patched")
+        self.assertEqual(embed.title, "Patched")
+        self.assertEqual(cache.render("question", build).title, "Question")
+
+
+if __name__ == "__main__":
+    unittest.main()
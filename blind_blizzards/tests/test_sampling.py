@@ -0,0 +1,36 @@
+import unittest
+
+from discord.ext import commands
+
+from lib.sampling import sampling_options
+
+
+class SamplingOptionsTest(unittest.TestCase):
+    def test_no_options(self):
+        self.assertEqual(
+            sampling_options("2020 review"), ("2020 review", None, "uniform")
+        )
+
+    def test_options(self):
+        self.assertEqual(
+            sampling_options("weighted thoughts length:5 sample:Weighted"),
+            ("weighted thoughts", 5, "weighted"),
+        )
+
+    def test_option_names_as_title_words(self):
+        self.assertEqual(
+            sampling_options("Sample questions"), ("Sample questions", None, "uniform")
+        )
+        self.assertEqual(
+            sampling_options("Length of rivers length:5"),
+            ("Length of rivers", 5, "uniform"),
+        )
+
+    def test_bad_values(self):
+        for text in ("quiz length:0", "quiz length:", "quiz sample:nope", "sample:"):
+            with self.subTest(text=text), self.assertRaises(commands.BadArgument):
+                sampling_options(text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+from lib.sessions import SessionManager, SessionLimitReached
+
+
+def make_context(user_id: int):
+    return SimpleNamespace(author=SimpleNamespace(id=user_id), guild=None)
+
+
+class SessionManagerTest(unittest.TestCase):
+    def test_queued_requests_keep_to_the_user_limit(self):
+        async def run():
+            manager = SessionManager(per_user=1, total=2, queue_timeout=1.0)
+            done = asyncio.Event()
+
+            async def session(user_id: int, until: asyncio.Event):
+                async with manager.session(make_context(user_id), "quiz"):
+                    await until.wait()
+
+            # two other users fill the bot, so both of user 3's requests wait
+            others_done = asyncio.Event()
+            others = [
+                asyncio.ensure_future(session(user_id, others_done))
+                for user_id in (1, 2)
+            ]
+            await asyncio.sleep(0)
+            requests = [asyncio.ensure_future(session(3, done)) for _ in range(2)]
+            await asyncio.sleep(0.01)
+            self.assertEqual(manager.queued, 2)
+
+            # room for both at once, but user 3 may only have one
+            others_done.set()
+            await asyncio.gather(*others)
+            await asyncio.sleep(0.01)
+            self.assertEqual(manager.by_user[3], 1)
+
+            done.set()
+            outcomes = await asyncio.gather(*requests, return_exceptions=True)
+            refused = [o for o in outcomes if isinstance(o, SessionLimitReached)]
+            self.assertEqual(len(refused), 1)
+
+        asyncio.run(run())
+
+    def test_cancel_all_of_some_kinds(self):
+        async def run():
+            manager = SessionManager()
+            forever = asyncio.Event()
+
+            async def session(kind: str):
+                async with manager.session(make_context(1), kind, capped=False):
+                    await forever.wait()
+
+            tasks = {
+                kind: asyncio.ensure_future(session(kind)) for kind in ("quiz", "help")
+            }
+            await asyncio.sleep(0)
+            manager.cancel_all(["quiz"])
+            await asyncio.sleep(0)
+            self.assertTrue(tasks["quiz"].cancelled())
+            self.assertFalse(tasks["help"].done())
+            self.assertEqual(manager.counts(), {"help": 1, "total": 1, "queued": 0})
+
+            manager.cancel_all()
+            await asyncio.sleep(0)
+            self.assertTrue(tasks["help"].cancelled())
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()